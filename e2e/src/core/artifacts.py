@@ -7,6 +7,8 @@ from typing import Optional
 
 from playwright.sync_api import Page
 
+from src.core.run_profile import get_run_profile
+
 
 @dataclass
 class Artifacts:
@@ -23,11 +25,16 @@ class Artifacts:
         return self.out_dir / filename
 
     def save_debug(self, page: Page, prefix: str) -> None:
+        prof = get_run_profile()
+        if prof.artifacts == "off":
+            return
         # スクショ
         try:
-            page.screenshot(path=str(self.path(f"{prefix}.png")), full_page=True)
+            page.screenshot(path=str(self.path(f"{prefix}.png")), full_page=prof.full_page)
         except Exception:
             pass
+        if prof.artifacts != "full":
+            return
         # HTML
         try:
             html = page.content()
@@ -0,0 +1,352 @@
+# e2e/src/core/asset_check.py
+"""
+結果画面の画像アセット検証（ページで読み込まずに、まとめて取得して確認する）
+
+  - URL 収集 : eval_on_selector_all 1回で全 img の src を取る
+  - 取得     : 別スレッドの async Playwright（APIRequestContext）で並行取得（上限付き）
+  - 確認     : status / content-type / ヘッダから読んだ画像サイズ（PNG/JPEG/GIF/WebP）
+  - キャッシュ: ETag / Last-Modified をディスクに保存し、次回は条件付きリクエスト（304 なら前回結果を使う）
+"""
+from __future__ import annotations
+
+import asyncio
+import atexit
+import json
+import os
+import struct
+import threading
+import time
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from playwright.sync_api import Page
+
+from src.core import run_profile as RP
+from src.core.env import env_int, truthy
+from src.core.run_history import get_history_dir
+
+# 結果画面の画像（カード / サムネ / 結果詳細 / 説明・リンクのリッチテキスト画像）
+RESULT_IMAGE_SELECTORS = (
+    "img.chakra-image[alt^='結果']",
+    "img.richEditorTheme__image",
+)
+
+_COLLECT_JS = """
+els => els.map(e => {
+  const s = e.currentSrc || e.getAttribute('src') || '';
+  try { return s ? new URL(s, location.href).href : ''; } catch (_) { return s; }
+})
+"""
+
+
+def asset_check_enabled(lead_params: Dict[str, Any] | None) -> bool:
+    """
+    lead_params.asset_check → E2E_ASSET_CHECK の順。既定は無効
+    （画像ごとにリクエストが増えるので、確認したい run / シナリオだけで有効にする）
+    """
+    params = lead_params or {}
+    v = params.get("asset_check")
+    if v is None:
+        v = os.getenv("E2E_ASSET_CHECK", "false")
+    if isinstance(v, bool):
+        return v
+    return truthy(v)
+
+
+def collect_image_urls(page: Page, selectors: Sequence[str] = RESULT_IMAGE_SELECTORS) -> List[str]:
+    urls = page.eval_on_selector_all(", ".join(selectors), _COLLECT_JS)
+    return [u for u in dict.fromkeys(urls) if u and not u.startswith("data:")]
+
+
+# ---------------- 画像サイズ（ヘッダだけ読む） ----------------
+def image_dimensions(data: bytes) -> Optional[Tuple[str, int, int]]:
+    """
+    戻り値: (format, width, height)。未対応/壊れていれば None
+    """
+    if len(data) >= 24 and data[:8] == b"\x89PNG\r\n\x1a\n" and data[12:16] == b"IHDR":
+        w, h = struct.unpack(">II", data[16:24])
+        return ("png", w, h)
+
+    if len(data) >= 10 and data[:6] in (b"GIF87a", b"GIF89a"):
+        w, h = struct.unpack("<HH", data[6:10])
+        return ("gif", w, h)
+
+    if len(data) >= 30 and data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        chunk = data[12:16]
+        if chunk == b"VP8 ":
+            w, h = struct.unpack("<HH", data[26:30])
+            return ("webp", w & 0x3FFF, h & 0x3FFF)
+        if chunk == b"VP8L" and len(data) >= 25:
+            b = data[21:25]
+            w = 1 + (((b[1] & 0x3F) << 8) | b[0])
+            h = 1 + (((b[3] & 0x0F) << 10) | (b[2] << 2) | ((b[1] & 0xC0) >> 6))
+            return ("webp", w, h)
+        if chunk == b"VP8X":
+            w = 1 + int.from_bytes(data[24:27], "little")
+            h = 1 + int.from_bytes(data[27:30], "little")
+            return ("webp", w, h)
+        return None
+
+    if len(data) >= 4 and data[:2] == b"\xff\xd8":
+        i = 2
+        while i + 9 < len(data):
+            if data[i] != 0xFF:
+                i += 1
+                continue
+            marker = data[i + 1]
+            if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+                i += 2
+                continue
+            seg_len = struct.unpack(">H", data[i + 2:i + 4])[0]
+            # SOF0..SOF15（DHT/JPG/DAC を除く）
+            if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                h, w = struct.unpack(">HH", data[i + 5:i + 9])
+                return ("jpeg", w, h)
+            i += 2 + seg_len
+        return None
+
+    return None
+
+
+# ---------------- 結果 / キャッシュ ----------------
+@dataclass
+class AssetResult:
+    url: str
+    status: int
+    content_type: str = ""
+    width: int = 0
+    height: int = 0
+    etag: str = ""
+    last_modified: str = ""
+    cached: bool = False
+    error: str = ""
+
+    @property
+    def ok(self) -> bool:
+        if self.error:
+            return False
+        if not (200 <= self.status < 300 or self.status == 304):
+            return False
+        if not self.content_type.startswith("image/"):
+            return False
+        if self.content_type.startswith("image/svg"):
+            return True
+        return self.width > 0 and self.height > 0
+
+
+class AssetCache:
+    """url → 前回の検証結果（asset_cache.json）"""
+
+    def __init__(self, path=None):
+        self.path = path or (get_history_dir() / "asset_cache.json")
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        if self.path.exists():
+            try:
+                self.entries = json.loads(self.path.read_text(encoding="utf-8"))
+            except Exception:
+                self.entries = {}
+
+    def get(self, url: str) -> Optional[AssetResult]:
+        d = self.entries.get(url)
+        if not d:
+            return None
+        return AssetResult(**{k: v for k, v in d.items() if k in AssetResult.__dataclass_fields__})
+
+    def put(self, r: AssetResult) -> None:
+        if not r.ok or not (r.etag or r.last_modified):
+            return
+        with self._lock:
+            d = asdict(r)
+            d["cached"] = False
+            d["checked_at"] = int(time.time())
+            self.entries[r.url] = d
+
+    def save(self) -> None:
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.entries, ensure_ascii=False, indent=2), encoding="utf-8")
+        tmp.replace(self.path)
+
+
+# ---------------- 並行取得（別スレッドの async Playwright） ----------------
+class _AsyncFetcher:
+    """
+    sync API はリクエストを順番にしか投げられないので、
+    専用スレッドで async Playwright を1回だけ起動し、asyncio.gather で並行に取る。
+    """
+
+    def __init__(self):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        self._pw = None
+        self._req = None
+        self._start_lock = asyncio.Lock()
+
+    def _run(self, coro, timeout: float | None = None):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(timeout)
+
+    async def _ensure(self):
+        async with self._start_lock:
+            if self._req is None:
+                from playwright.async_api import async_playwright
+
+                self._pw = await async_playwright().start()
+                self._req = await self._pw.request.new_context()
+        return self._req
+
+    async def _fetch_one(self, sem, url: str, cached: Optional[AssetResult], timeout_ms: int) -> AssetResult:
+        async with sem:
+            req = await self._ensure()
+            headers = {}
+            if cached is not None:
+                if cached.etag:
+                    headers["If-None-Match"] = cached.etag
+                if cached.last_modified:
+                    headers["If-Modified-Since"] = cached.last_modified
+            try:
+                r = await req.get(url, headers=headers, timeout=timeout_ms, max_redirects=5)
+            except Exception as e:
+                return AssetResult(url=url, status=0, error=type(e).__name__)
+
+            h = r.headers
+            if r.status == 304 and cached is not None:
+                hit = AssetResult(**{**asdict(cached), "status": 304, "cached": True})
+                await r.dispose()
+                return hit
+
+            res = AssetResult(
+                url=url,
+                status=r.status,
+                content_type=(h.get("content-type") or "").split(";")[0].strip().lower(),
+                etag=h.get("etag") or "",
+                last_modified=h.get("last-modified") or "",
+            )
+            if 200 <= r.status < 300 and res.content_type.startswith("image/") and not res.content_type.startswith("image/svg"):
+                try:
+                    dims = image_dimensions(await r.body())
+                except Exception:
+                    dims = None
+                if dims is None:
+                    res.error = "undecodable"
+                else:
+                    _, res.width, res.height = dims
+            await r.dispose()
+            return res
+
+    async def _fetch_all(self, urls, cache: AssetCache, concurrency: int, timeout_ms: int):
+        sem = asyncio.Semaphore(concurrency)
+        return await asyncio.gather(*(self._fetch_one(sem, u, cache.get(u), timeout_ms) for u in urls))
+
+    def fetch_all(self, urls: Sequence[str], cache: AssetCache, concurrency: int, timeout_ms: int) -> List[AssetResult]:
+        return list(self._run(self._fetch_all(list(urls), cache, concurrency, timeout_ms)))
+
+    async def _body_one(self, sem, url: str, timeout_ms: int) -> Optional[bytes]:
+        async with sem:
+            req = await self._ensure()
+            try:
+                r = await req.get(url, timeout=timeout_ms, max_redirects=5)
+                body = await r.body() if r.ok else None
+                await r.dispose()
+                return body
+            except Exception:
+                return None
+
+    async def _bodies(self, urls, concurrency: int, timeout_ms: int):
+        sem = asyncio.Semaphore(concurrency)
+        return await asyncio.gather(*(self._body_one(sem, u, timeout_ms) for u in urls))
+
+    def fetch_bodies(self, urls: Sequence[str], concurrency: int, timeout_ms: int) -> List[Optional[bytes]]:
+        return list(self._run(self._bodies(list(urls), concurrency, timeout_ms)))
+
+    async def _status_one(self, sem, url: str, timeout_ms: int) -> int:
+        async with sem:
+            req = await self._ensure()
+            try:
+                r = await req.head(url, timeout=timeout_ms, max_redirects=10)
+                status = r.status
+                await r.dispose()
+                if status in (403, 405) or status >= 500:
+                    # HEAD を受け付けないサイトがある
+                    r = await req.get(url, timeout=timeout_ms, max_redirects=10)
+                    status = r.status
+                    await r.dispose()
+                return status
+            except Exception:
+                return 0
+
+    async def _statuses(self, urls, concurrency: int, timeout_ms: int):
+        sem = asyncio.Semaphore(concurrency)
+        return await asyncio.gather(*(self._status_one(sem, u, timeout_ms) for u in urls))
+
+    def fetch_statuses(self, urls: Sequence[str], concurrency: int, timeout_ms: int) -> List[int]:
+        return list(self._run(self._statuses(list(urls), concurrency, timeout_ms)))
+
+    def close(self) -> None:
+        async def _close():
+            if self._req is not None:
+                await self._req.dispose()
+            if self._pw is not None:
+                await self._pw.stop()
+
+        try:
+            self._run(_close(), timeout=10)
+        except Exception:
+            pass
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+_FETCHER: Optional[_AsyncFetcher] = None
+_CACHE: Optional[AssetCache] = None
+
+
+def _fetcher() -> _AsyncFetcher:
+    global _FETCHER
+    if _FETCHER is None:
+        _FETCHER = _AsyncFetcher()
+        atexit.register(_FETCHER.close)
+    return _FETCHER
+
+
+def _cache() -> AssetCache:
+    global _CACHE
+    if _CACHE is None:
+        _CACHE = AssetCache()
+    return _CACHE
+
+
+def validate_assets(urls: Sequence[str], concurrency: int | None = None) -> List[AssetResult]:
+    """
+    画像URLをまとめて検証する（未変更の CDN アセットは 304 の条件付きリクエスト1回）
+    """
+    urls = list(dict.fromkeys(urls))
+    if not urls:
+        return []
+    cap = max(1, concurrency or env_int("E2E_ASSET_CHECK_CONCURRENCY", 8))
+    cache = _cache()
+    results = _fetcher().fetch_all(urls, cache, cap, RP.timeout_ms("action"))
+    for r in results:
+        cache.put(r)
+    try:
+        cache.save()
+    except Exception:
+        pass
+    return results
+
+
+def fetch_bodies(urls: Sequence[str], concurrency: int | None = None) -> Dict[str, Optional[bytes]]:
+    """画像本体をまとめて取得（取れなかったものは None）"""
+    urls = list(dict.fromkeys(u for u in urls if u))
+    if not urls:
+        return {}
+    cap = max(1, concurrency or env_int("E2E_ASSET_CHECK_CONCURRENCY", 8))
+    return dict(zip(urls, _fetcher().fetch_bodies(urls, cap, RP.timeout_ms("action"))))
+
+
+def fetch_statuses(urls: Sequence[str], concurrency: int | None = None) -> Dict[str, int]:
+    """HEAD（だめなら GET）のステータスをまとめて取得（取れなかったものは 0）"""
+    urls = list(dict.fromkeys(u for u in urls if u))
+    if not urls:
+        return {}
+    cap = max(1, concurrency or env_int("E2E_ASSET_CHECK_CONCURRENCY", 8))
+    return dict(zip(urls, _fetcher().fetch_statuses(urls, cap, RP.timeout_ms("action"))))
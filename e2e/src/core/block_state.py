@@ -0,0 +1,95 @@
+# e2e/src/core/block_state.py
+"""
+結果詳細ブロックのボタン状態（今すぐつかう / 使用済み）をまとめて取る
+
+  - snapshot() : evaluate_all 1回で全ブロックの状態を取る
+  - diff()     : 前後のスナップショットで状態が変わったブロックの番号
+ボタンはブロック自身 → 親(1段) → 親(2段) の順で探す（従来の locator 探索と同じ）。
+"""
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import List
+
+from playwright.sync_api import Locator, TimeoutError as PlaywrightTimeoutError
+
+_STATES_JS = """
+(blocks, a) => blocks.map(b => {
+  const scopes = [b, b.parentElement, b.parentElement && b.parentElement.parentElement];
+  const find = text => {
+    const want = text.toLowerCase();
+    for (let lv = 0; lv < scopes.length; lv++) {
+      const s = scopes[lv];
+      if (!s) continue;
+      const hit = Array.from(s.querySelectorAll("button, [role='button']"))
+        .find(e => (e.textContent || '').toLowerCase().includes(want));
+      if (hit) return [lv, hit];
+    }
+    return [-1, null];
+  };
+  const disabled = e => !!e && (e.disabled || e.getAttribute('aria-disabled') === 'true' || !!e.closest('fieldset:disabled'));
+  const [useLevel, use] = find(a.useText);
+  const [usedLevel, used] = find(a.usedText);
+  return { useLevel, usedLevel, usedDisabled: disabled(used) };
+})
+"""
+
+_LEVEL_XPATH = ("", "xpath=..", "xpath=../..")
+
+
+@dataclass(frozen=True)
+class BlockState:
+    use_level: int       # 「今すぐつかう」が見つかった段（0=ブロック, 1=親, 2=親の親, -1=無し）
+    used_level: int      # 「使用済み」が見つかった段
+    used_disabled: bool
+
+    @property
+    def usable(self) -> bool:
+        return self.use_level >= 0
+
+    @property
+    def used(self) -> bool:
+        return self.used_level >= 0
+
+
+class BlockStateTracker:
+    """
+    detail_blocks（1件=1結果のブロック locator）の状態を、1往復で撮って差分で判定する
+    """
+
+    def __init__(self, blocks: Locator, use_text: str = "今すぐつかう", used_text: str = "使用済み"):
+        self.blocks = blocks
+        self.use_text = use_text
+        self.used_text = used_text
+
+    def snapshot(self) -> List[BlockState]:
+        raw = self.blocks.evaluate_all(_STATES_JS, {"useText": self.use_text, "usedText": self.used_text})
+        return [BlockState(r["useLevel"], r["usedLevel"], bool(r["usedDisabled"])) for r in raw]
+
+    def use_button(self, i: int, state: BlockState) -> Locator:
+        """snapshot で見つかった段の「今すぐつかう」（count で探し直さない）"""
+        base = self.blocks.nth(i)
+        if state.use_level > 0:
+            base = base.locator(_LEVEL_XPATH[state.use_level])
+        return base.locator(
+            f"button:has-text('{self.use_text}'), [role='button']:has-text('{self.use_text}')"
+        ).first
+
+    def wait_until(self, i: int, pred, timeout_ms: int) -> List[BlockState]:
+        """i 番目のブロックが pred を満たすまで撮り直す（満たさなければ PlaywrightTimeoutError）"""
+        end = time.time() + timeout_ms / 1000
+        while True:
+            states = self.snapshot()
+            if i < len(states) and pred(states[i]):
+                return states
+            if time.time() >= end:
+                raise PlaywrightTimeoutError(f"block {i} state not reached")
+            time.sleep(0.1)
+
+
+def diff(before: List[BlockState], after: List[BlockState]) -> List[int]:
+    """状態が変わったブロックの番号（件数が違えば全件）"""
+    if len(before) != len(after):
+        return list(range(max(len(before), len(after))))
+    return [i for i, (b, a) in enumerate(zip(before, after)) if b != a]
@@ -0,0 +1,329 @@
+# e2e/src/core/browser_server.py
+"""
+ローカル用の常駐ブラウザ（pytest セッション間で共有）
+
+  python -m src.core.browser_server start   # 起動（起動済みなら何もしない）
+  python -m src.core.browser_server status  # 状態確認
+  python -m src.core.browser_server stop    # 停止
+
+Python版 Playwright には launch_server が無いので、
+Chromium を --remote-debugging-port 付きで常駐させ、各セッションは connect_over_cdp で繋ぐ。
+  - health    : /json/version が返るか
+  - context上限: lease の枠（slot0〜N-1.lease を O_EXCL で作る）で制限。中身は持ち主の pid
+  - idle停止   : lease が無い状態が E2E_BROWSER_SERVER_IDLE_SEC 続いたら自動終了
+  - 起動スイッチ: Playwright の launch() と同じもの（ポップアップブロック無効など）
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+# Playwright の launch() が付けるスイッチと同じもの（playwright 1.50 の chromiumSwitches）
+#   CDP 直起動だと付かないので、ポップアップブロック（SNS fast の一括クリック）や
+#   裏タブのタイマー間引きがローカル起動と違ってしまう
+PLAYWRIGHT_CHROMIUM_SWITCHES = (
+    "--disable-field-trial-config",
+    "--disable-background-networking",
+    "--disable-background-timer-throttling",
+    "--disable-backgrounding-occluded-windows",
+    "--disable-back-forward-cache",
+    "--disable-breakpad",
+    "--disable-client-side-phishing-detection",
+    "--disable-component-extensions-with-background-pages",
+    "--disable-component-update",
+    "--no-default-browser-check",
+    "--disable-default-apps",
+    "--disable-dev-shm-usage",
+    "--disable-extensions",
+    "--disable-features=ImprovedCookieControls,LazyFrameLoading,GlobalMediaControls,DestroyProfileOnBrowserClose,"
+    "MediaRouter,DialMediaRouteProvider,AcceptCHFrame,AutoExpandDetailsElement,"
+    "CertificateTransparencyComponentUpdater,AvoidUnnecessaryBeforeUnloadCheckSync,Translate,HttpsUpgrades,"
+    "PaintHolding,ThirdPartyStoragePartitioning,LensOverlay,PlzDedicatedWorker",
+    "--allow-pre-commit-input",
+    "--disable-hang-monitor",
+    "--disable-ipc-flooding-protection",
+    "--disable-popup-blocking",
+    "--disable-prompt-on-repost",
+    "--disable-renderer-backgrounding",
+    "--force-color-profile=srgb",
+    "--metrics-recording-only",
+    "--no-first-run",
+    "--enable-automation",
+    "--password-store=basic",
+    "--use-mock-keychain",
+    "--no-service-autorun",
+    "--export-tagged-pdf",
+    "--disable-search-engine-choice-screen",
+    "--unsafely-disable-devtools-self-xss-warnings",
+)
+# headless のとき Playwright が足すもの
+PLAYWRIGHT_HEADLESS_SWITCHES = (
+    "--hide-scrollbars",
+    "--mute-audio",
+    "--blink-settings=primaryHoverType=2,availableHoverTypes=2,primaryPointerType=4,availablePointerTypes=4",
+)
+
+
+def browser_server_enabled() -> bool:
+    v = (os.getenv("E2E_BROWSER_SERVER") or "").strip().lower()
+    return v in ("1", "true", "yes", "y", "on")
+
+
+def _env_truthy(name: str) -> bool:
+    return (os.getenv(name) or "").strip().lower() in ("1", "true", "yes", "y", "on")
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@dataclass
+class ServerState:
+    pid: int          # 管理プロセス（serve）
+    browser_pid: int  # Chromium
+    port: int
+
+    @property
+    def endpoint(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+
+class BrowserServerManager:
+    def __init__(self, state_dir: Path | None = None):
+        default_dir = Path(tempfile.gettempdir()) / "croissant-e2e-browser"
+        self.state_dir = state_dir or Path(os.getenv("E2E_BROWSER_SERVER_DIR", str(default_dir)))
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        self.state_path = self.state_dir / "state.json"
+        self.lease_dir = self.state_dir / "leases"
+        self.lease_dir.mkdir(parents=True, exist_ok=True)
+        self.max_contexts = int(os.getenv("E2E_BROWSER_SERVER_MAX_CONTEXTS", "4") or 4)
+        self.idle_sec = float(os.getenv("E2E_BROWSER_SERVER_IDLE_SEC", "900") or 900)
+
+    # ---------------- state ----------------
+    def read_state(self) -> Optional[ServerState]:
+        if not self.state_path.exists():
+            return None
+        try:
+            d = json.loads(self.state_path.read_text(encoding="utf-8"))
+            return ServerState(pid=int(d["pid"]), browser_pid=int(d["browser_pid"]), port=int(d["port"]))
+        except Exception:
+            return None
+
+    def _write_state(self, st: ServerState) -> None:
+        tmp = self.state_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(st.__dict__), encoding="utf-8")
+        tmp.replace(self.state_path)
+
+    def health(self, st: Optional[ServerState] = None, timeout_sec: float = 1.0) -> bool:
+        st = st or self.read_state()
+        if st is None or not _pid_alive(st.browser_pid):
+            return False
+        try:
+            with urllib.request.urlopen(f"{st.endpoint}/json/version", timeout=timeout_sec) as r:
+                return r.status == 200
+        except Exception:
+            return False
+
+    # ---------------- client ----------------
+    def ensure_started(self, timeout_sec: float = 30.0) -> str:
+        """
+        常駐ブラウザの CDP エンドポイントを返す（無ければ起動して待つ）
+        """
+        st = self.read_state()
+        if st is not None and self.health(st):
+            return st.endpoint
+
+        e2e_root = Path(__file__).resolve().parents[2]
+        subprocess.Popen(
+            [sys.executable, "-m", "src.core.browser_server", "serve"],
+            cwd=str(e2e_root),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+
+        end = time.time() + timeout_sec
+        while time.time() < end:
+            st = self.read_state()
+            if st is not None and self.health(st, timeout_sec=0.5):
+                return st.endpoint
+            time.sleep(0.1)
+        raise RuntimeError("browser server did not become healthy")
+
+    def _live_leases(self) -> list[Path]:
+        out = []
+        for f in self.lease_dir.glob("*.lease"):
+            try:
+                text = f.read_text(encoding="utf-8").strip()
+                # 作った直後（pid 書き込み前）は生きている扱い
+                pid = int(text) if text else (os.getpid() if time.time() - f.stat().st_mtime < 10 else -1)
+            except (OSError, ValueError):
+                pid = -1
+            if _pid_alive(pid):
+                out.append(f)
+            else:
+                # 落ちたセッションの lease は掃除
+                try:
+                    f.unlink()
+                except Exception:
+                    pass
+        return out
+
+    def acquire_lease(self) -> Optional[Path]:
+        """
+        context 上限内なら lease を取る（上限なら None → 呼び出し側はローカル起動にフォールバック）
+        枠ファイルを O_EXCL で作るので、同時に取りに来ても上限を超えない
+        """
+        self._live_leases()  # 落ちたセッションの枠を空ける
+        for i in range(self.max_contexts):
+            f = self.lease_dir / f"slot{i}.lease"
+            try:
+                fd = os.open(f, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                continue
+            with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                fh.write(str(os.getpid()))
+            return f
+        return None
+
+    def release_lease(self, lease: Optional[Path]) -> None:
+        if lease is None:
+            return
+        try:
+            lease.unlink()
+        except Exception:
+            pass
+
+    def stop(self) -> bool:
+        st = self.read_state()
+        if st is None:
+            return False
+        for pid in (st.pid, st.browser_pid):
+            if _pid_alive(pid):
+                try:
+                    os.kill(pid, signal.SIGTERM)
+                except Exception:
+                    pass
+        try:
+            self.state_path.unlink()
+        except Exception:
+            pass
+        return True
+
+    # ---------------- daemon ----------------
+    def _browser_executable(self) -> str:
+        exe = os.getenv("E2E_BROWSER_SERVER_EXECUTABLE")
+        if exe:
+            return exe
+        from playwright.sync_api import sync_playwright
+
+        with sync_playwright() as p:
+            return p.chromium.executable_path
+
+    def serve(self) -> None:
+        port = _free_port()
+        profile_dir = self.state_dir / "profile"
+        profile_dir.mkdir(parents=True, exist_ok=True)
+
+        args = [
+            self._browser_executable(),
+            *PLAYWRIGHT_CHROMIUM_SWITCHES,
+            f"--remote-debugging-port={port}",
+            "--remote-debugging-address=127.0.0.1",
+            f"--user-data-dir={profile_dir}",
+        ]
+        # 常駐なのでデフォルトは headless（PW_HEADLESS=false なら画面あり）
+        headless = _env_truthy("PW_HEADLESS") if os.getenv("PW_HEADLESS") is not None else True
+        if headless:
+            args += ["--headless=new", *PLAYWRIGHT_HEADLESS_SWITCHES]
+
+        chrome = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        st = ServerState(pid=os.getpid(), browser_pid=chrome.pid, port=port)
+        self._write_state(st)
+
+        def _shutdown(*_):
+            try:
+                chrome.terminate()
+                chrome.wait(timeout=10)
+            except Exception:
+                try:
+                    chrome.kill()
+                except Exception:
+                    pass
+            cur = self.read_state()
+            if cur is not None and cur.pid == os.getpid():
+                try:
+                    self.state_path.unlink()
+                except Exception:
+                    pass
+            sys.exit(0)
+
+        signal.signal(signal.SIGTERM, _shutdown)
+        signal.signal(signal.SIGINT, _shutdown)
+
+        last_active = time.time()
+        while True:
+            time.sleep(2.0)
+            if chrome.poll() is not None:
+                _shutdown()
+            if self._live_leases():
+                last_active = time.time()
+            elif time.time() - last_active > self.idle_sec:
+                _shutdown()
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description="croissant e2e: 常駐ブラウザ管理")
+    ap.add_argument("command", choices=["start", "stop", "status", "serve"])
+    ns = ap.parse_args(argv)
+
+    mgr = BrowserServerManager()
+    if ns.command == "serve":
+        mgr.serve()
+        return 0
+    if ns.command == "start":
+        print(mgr.ensure_started())
+        return 0
+    if ns.command == "stop":
+        print("stopped" if mgr.stop() else "not running")
+        return 0
+
+    st = mgr.read_state()
+    ok = mgr.health(st)
+    print(json.dumps({
+        "running": ok,
+        "endpoint": st.endpoint if st else None,
+        "leases": len(mgr._live_leases()),
+        "max_contexts": mgr.max_contexts,
+    }))
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
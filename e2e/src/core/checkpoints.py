@@ -0,0 +1,148 @@
+# e2e/src/core/checkpoints.py
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from playwright.sync_api import Page
+
+from src.core import run_profile as RP
+
+
+@dataclass
+class Checkpoint:
+    """
+    ステップ完了時点の状態。
+      - step          : 完了したステップ名
+      - url           : その時点のページURL
+      - storage_state : context.storage_state()（cookie + localStorage）
+      - outputs       : そのステップまでに得た値（card_results / details など）
+    """
+    step: str
+    url: str
+    storage_state: Dict[str, Any] = field(default_factory=dict)
+    outputs: Dict[str, Any] = field(default_factory=dict)
+
+
+class CheckpointRecorder:
+    """
+    フローのステップ境界で checkpoint を記録し、リトライ時の再開位置を決める。
+
+    記録はプロセス内（_MEMORY）に持ち、リトライ時の再開はそこから読む。
+    checkpoints.json（artifacts/<scenario_id>/）には確認用に
+      - current     : 実行中（= 失敗したらそのまま残る）のステップ
+      - checkpoints : 完了済みステップの step / url / outputs（古い順）
+    を書く。✅ storage_state（cookie 等）は artifacts に書かない（CI でアップロードされるため）
+    resume=False のときは前回分を破棄して新規に記録する。
+    """
+
+    def __init__(self, path: Path, resume: bool = False):
+        self.path = path
+        self.current: Optional[str] = None
+        self.checkpoints: List[Checkpoint] = []
+        if resume:
+            self._load()
+        else:
+            self._save()
+
+    def _load(self) -> None:
+        saved = _MEMORY.get(str(self.path))
+        if saved is None:
+            return
+        self.current = saved["current"]
+        self.checkpoints = list(saved["checkpoints"])
+
+    def _save(self) -> None:
+        _MEMORY[str(self.path)] = {"current": self.current, "checkpoints": list(self.checkpoints)}
+        data = {
+            "current": self.current,
+            "checkpoints": [{k: v for k, v in asdict(c).items() if k != "storage_state"} for c in self.checkpoints],
+        }
+        try:
+            self.path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        except Exception:
+            pass
+
+    def reset(self) -> None:
+        """前回分を破棄する（再開できない / 再開に失敗したとき。古い outputs を引き継がない）"""
+        self.current = None
+        self.checkpoints = []
+        self._save()
+
+    def begin(self, step: str) -> None:
+        self.current = step
+        self._save()
+
+    def commit(self, step: str, page: Page, **outputs: Any) -> None:
+        try:
+            state = page.context.storage_state()
+        except Exception:
+            state = {}
+        merged: Dict[str, Any] = dict(self.checkpoints[-1].outputs) if self.checkpoints else {}
+        merged.update(outputs)
+        self.checkpoints.append(Checkpoint(step=step, url=page.url, storage_state=state, outputs=merged))
+        self.current = None
+        self._save()
+
+    def resume_point(self, replayable_steps: Iterable[str], steps: Optional[List[str]] = None) -> Optional[Checkpoint]:
+        """
+        前回失敗したステップが「安全に再実行できる」ものなら、直前の checkpoint を返す。
+        それ以外（購入/今すぐつかう 等の副作用ありステップ）は None（最初からやり直し）。
+        steps（ステップの並び）を渡すと、checkpoint から失敗ステップまでの間に
+        記録の無い副作用ありステップ（抽選 等）を挟む場合も None にする。
+        """
+        if not self.current or not self.checkpoints:
+            return None
+        replayable = set(replayable_steps)
+        if self.current not in replayable:
+            return None
+        cp = self.checkpoints[-1]
+        if steps is not None:
+            if cp.step not in steps or self.current not in steps:
+                return None
+            between = steps[steps.index(cp.step) + 1 : steps.index(self.current) + 1]
+            if not between or any(s not in replayable for s in between):
+                return None
+        return cp
+
+
+# path → {current, checkpoints}（storage_state を含む。プロセス内のリトライでだけ使う）
+_MEMORY: Dict[str, Dict[str, Any]] = {}
+
+
+_RESTORE_LOCAL_STORAGE_JS = """
+(origins => {
+  try {
+    for (const o of origins) {
+      if (o.origin !== window.location.origin) continue;
+      for (const kv of (o.localStorage || [])) {
+        window.localStorage.setItem(kv.name, kv.value);
+      }
+    }
+  } catch (e) {}
+})
+"""
+
+
+def restore_checkpoint(page: Page, cp: Checkpoint, timeout_ms: Optional[int] = None) -> None:
+    """
+    checkpoint の storage_state を復元して、その時点のURLを開く。
+    localStorage は開いたページに1回だけ書いて読み込み直す
+    （init script にすると以降の遷移・やり直しでも古い値を書き戻してしまう）
+    """
+    if timeout_ms is None:
+        timeout_ms = RP.timeout_ms("nav")
+    state = cp.storage_state or {}
+
+    cookies = state.get("cookies") or []
+    if cookies:
+        page.context.add_cookies(cookies)
+
+    page.goto(cp.url, wait_until="domcontentloaded", timeout=timeout_ms)
+
+    origins = state.get("origins") or []
+    if origins:
+        page.evaluate(_RESTORE_LOCAL_STORAGE_JS, origins)
+        page.reload(wait_until="domcontentloaded", timeout=timeout_ms)
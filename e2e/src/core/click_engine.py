@@ -0,0 +1,184 @@
+# e2e/src/core/click_engine.py
+"""
+クリック / 遷移のフォールバック順を学習する
+
+  - 段階（tier）  : normal → force → js（DOM の el.click()）
+  - 候補          : 同じ操作で押す要素の候補（例：LINE 導線の img / 親 / 親の親 / テキスト…）
+  - 遷移モード    : popup（expect_popup）/ scan（押してからタブ/同一タブを探す）
+
+成功した tier / 候補 / モードを「シナリオ + 操作名」と「操作名」の両方で数えて
+click_history.json に保存し、次回は成功回数の多い順に試す。
+（既知の成功パスがリストの最後だと、前の候補のタイムアウトぶん毎回待たされるため）
+
+押せた = 成功 ではない（force / js は actionability を見ないので空振りでも押せる）。
+押せた tier / 候補は保留にしておき、呼び出し側が次の画面を確認してから confirm_click で確定する
+（ok=False なら減点して、次回は後ろに回す）。確定しなかったものは数えない。
+"""
+from __future__ import annotations
+
+import json
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from src.core import run_profile as RP
+from src.core.run_history import get_history_dir
+
+TIERS = ("normal", "force", "js")
+NAV_MODES = ("popup", "scan")
+
+# 実行中のシナリオ（runner が設定）。シナリオ別の学習キーに使う
+_SCOPE: Optional[str] = None
+
+# 操作名 → 確定待ちの (操作名, kind, option)
+_PENDING: Dict[str, List[Tuple[str, str, str]]] = {}
+
+
+def set_click_scope(scenario_id: Optional[str]) -> None:
+    global _SCOPE
+    _SCOPE = scenario_id
+
+
+class ClickHistory:
+    """
+    key → {option: 成功回数}（click_history.json）
+      key = "<操作名>#tier" / "<操作名>#candidate" / "<操作名>#nav"（シナリオ別は先頭に "<scenario_id>|"）
+    """
+
+    def __init__(self, path: Path | None = None):
+        self.path = path or (get_history_dir() / "click_history.json")
+        self.wins: Dict[str, Dict[str, int]] = {}
+        self._new: Dict[str, Dict[str, int]] = {}
+        if self.path.exists():
+            try:
+                self.wins = json.loads(self.path.read_text(encoding="utf-8")).get("wins") or {}
+            except Exception:
+                self.wins = {}
+
+    @staticmethod
+    def _keys(name: str, kind: str) -> List[str]:
+        base = f"{name}#{kind}"
+        return [f"{_SCOPE}|{base}", base] if _SCOPE else [base]
+
+    def order(self, name: str, kind: str, options: Sequence[str]) -> List[str]:
+        """シナリオ別の実績 → 操作名の実績 → 既定順 で並べる"""
+        opts = list(options)
+        for key in self._keys(name, kind):
+            counts = self.wins.get(key)
+            if counts:
+                return sorted(opts, key=lambda o: (-counts.get(o, 0), opts.index(o)))
+        return opts
+
+    def record(self, name: str, kind: str, option: str, delta: int = 1) -> None:
+        """delta=-1 で減点（押せたのに次の画面に進まなかった）"""
+        for key in self._keys(name, kind):
+            for d in (self.wins, self._new):
+                c = d.setdefault(key, {})
+                c[option] = c.get(option, 0) + delta
+
+    def save(self) -> None:
+        """他ワーカーの追記を消さないよう、保存直前に読み直してから今回分を足す"""
+        if not self._new:
+            return
+        merged: Dict[str, Dict[str, int]] = {}
+        if self.path.exists():
+            try:
+                merged = json.loads(self.path.read_text(encoding="utf-8")).get("wins") or {}
+            except Exception:
+                merged = {}
+        for key, counts in self._new.items():
+            m = merged.setdefault(key, {})
+            for o, n in counts.items():
+                m[o] = m.get(o, 0) + n
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"wins": merged}, ensure_ascii=False, indent=2), encoding="utf-8")
+        tmp.replace(self.path)
+        self.wins = merged
+        self._new.clear()
+
+
+@lru_cache(maxsize=1)
+def get_click_history() -> ClickHistory:
+    return ClickHistory()
+
+
+def _try_tier(locator, tier: str, timeout_ms: int) -> None:
+    if tier == "normal":
+        locator.first.click(timeout=timeout_ms)
+    elif tier == "force":
+        locator.first.click(timeout=timeout_ms, force=True)
+    else:
+        locator.first.evaluate("el => el.click()")
+
+
+def smart_click(
+    locator,
+    name: str | None = None,
+    timeout_ms: int | None = None,
+    state: str = "visible",
+) -> str:
+    """
+    normal → force → js の順で押し切る（name があれば学習した順）。
+    戻り値: 押せた tier。全部だめなら最後の例外を投げる。
+    name があれば押せた tier を保留にする（confirm_click で確定）
+    """
+    if timeout_ms is None:
+        timeout_ms = RP.timeout_ms("click")
+    locator.first.wait_for(state=state, timeout=timeout_ms)
+    try:
+        locator.first.scroll_into_view_if_needed(timeout=timeout_ms)
+    except Exception:
+        pass
+
+    history = get_click_history() if name else None
+    tiers = history.order(name, "tier", TIERS) if history else list(TIERS)
+    last: Exception | None = None
+    for tier in tiers:
+        try:
+            _try_tier(locator, tier, timeout_ms)
+        except Exception as e:
+            last = e
+            continue
+        if history:
+            _PENDING[name] = [(name, "tier", tier)]
+        return tier
+    raise last  # type: ignore[misc]
+
+
+def click_first(
+    name: str,
+    candidates: Sequence[Tuple[str, object]],
+    timeout_ms: int | None = None,
+    state: str = "visible",
+) -> Optional[str]:
+    """
+    候補 [(候補名, locator), ...] を学習した順に押し、最初に押せた候補名を返す（全部だめなら None）
+    押せた候補は保留にする（confirm_click(name, ok) で確定）
+    """
+    history = get_click_history()
+    by_name = dict(candidates)
+    for cand in history.order(name, "candidate", [c for c, _ in candidates]):
+        try:
+            smart_click(by_name[cand], name=f"{name}/{cand}", timeout_ms=timeout_ms, state=state)
+        except Exception:
+            continue
+        _PENDING[name] = _PENDING.pop(f"{name}/{cand}", []) + [(name, "candidate", cand)]
+        return cand
+    return None
+
+
+def confirm_click(name: str, ok: bool = True) -> None:
+    """
+    name の直前のクリックを確定する。ok=True で加点、False（次の画面に進まなかった）で減点
+    """
+    history = get_click_history()
+    for n, kind, option in _PENDING.pop(name, []):
+        history.record(n, kind, option, 1 if ok else -1)
+
+
+def nav_mode_order(name: str) -> List[str]:
+    return get_click_history().order(name, "nav", NAV_MODES)
+
+
+def record_nav_mode(name: str, mode: str) -> None:
+    get_click_history().record(name, "nav", mode)
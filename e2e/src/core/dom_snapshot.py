@@ -0,0 +1,162 @@
+# e2e/src/core/dom_snapshot.py
+"""
+画面のDOMスナップショット（存在 / 件数 / 文言チェックを1往復にまとめる）
+
+  - dom_snapshot(page, selectors) : evaluate 1回で
+        * テキストを持つ要素（正規化したテキスト / 表示中か / 押下可能か）
+        * 指定セレクタに当たる要素（属性 / テキスト / 表示中か / 押下可能か）
+    をまとめて取る
+  - 以降の判定は Python 側でスナップショットに対して行う（ページに問い合わせない）
+
+テキストの一致は get_by_text に合わせる：
+  - exact=True  : 空白を正規化した全文一致（大文字小文字を区別）
+  - exact=False : 空白を正規化した部分一致（大文字小文字を区別しない）
+  - 子孫にも一致する要素があれば、いちばん内側だけ数える（ラッパーは数えない）
+count() と同じく非表示の要素も数える（visible_only=True で表示中だけ）。
+
+スナップショットは撮った時点の画面なので、クリック等の操作後は撮り直す。
+"""
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+from playwright.sync_api import Page
+
+# テキストはこの長さで切って持つ（要素は落とさない。画面全体のラッパーで転送量が膨らむため）
+#   切った要素は全文一致しない / 部分一致は先頭 MAX_TEXT_LEN 文字の中だけ
+MAX_TEXT_LEN = 200
+
+_SNAPSHOT_JS = """
+(a) => {
+  const norm = s => (s || '').replace(/\\s+/g, ' ').trim();
+  const SKIP = new Set(['SCRIPT', 'STYLE', 'NOSCRIPT', 'TEMPLATE', 'HEAD']);
+  const visible = el => el.getClientRects().length > 0 && getComputedStyle(el).visibility !== 'hidden';
+  const enabled = el => {
+    const c = el.closest('button, input, select, textarea, option, fieldset');
+    if (c && c.disabled) return false;
+    return !el.closest('[aria-disabled="true"]');
+  };
+  const rec = (el, t) => ({
+    text: t.slice(0, a.maxLen), truncated: t.length > a.maxLen, visible: visible(el), enabled: enabled(el),
+  });
+
+  // 文書順なので祖先が先に入る。parent は持っている中でいちばん近い祖先の番号
+  const texts = [];
+  const index = new Map();
+  for (const el of document.querySelectorAll('body *')) {
+    if (SKIP.has(el.tagName)) continue;
+    const t = norm(el.textContent);
+    if (!t) continue;
+    // 子要素が同じテキストなら内側だけ持つ（get_by_text と同じ）
+    if (Array.from(el.children).some(c => norm(c.textContent) === t)) continue;
+    let p = el.parentElement;
+    while (p && !index.has(p)) p = p.parentElement;
+    const r = rec(el, t);
+    r.parent = p ? index.get(p) : -1;
+    index.set(el, texts.length);
+    texts.push(r);
+  }
+
+  const matches = {};
+  for (const sel of a.selectors) {
+    matches[sel] = Array.from(document.querySelectorAll(sel)).map(el => {
+      const r = rec(el, norm(el.textContent));
+      r.attrs = Object.fromEntries(Array.from(el.attributes).map(x => [x.name, x.value]));
+      return r;
+    });
+  }
+  return { url: location.href, texts, matches };
+}
+"""
+
+
+def _norm(s: str) -> str:
+    return re.sub(r"\s+", " ", s or "").strip()
+
+
+@dataclass
+class SnapElement:
+    text: str
+    visible: bool = True
+    enabled: bool = True
+    attrs: Dict[str, str] = field(default_factory=dict)
+    truncated: bool = False   # text を MAX_TEXT_LEN で切った
+    parent: int = -1          # texts の中でいちばん近い祖先の番号（無ければ -1）
+
+    def attr(self, name: str) -> Optional[str]:
+        return self.attrs.get(name)
+
+
+@dataclass
+class DomSnapshot:
+    url: str
+    texts: List[SnapElement]
+    matches: Dict[str, List[SnapElement]]
+
+    # ---------------- テキスト ----------------
+    def find_text(self, text: str, exact: bool = False, visible_only: bool = False) -> List[SnapElement]:
+        want = _norm(text)
+        if exact:
+            idx = [i for i, e in enumerate(self.texts) if e.text == want and not e.truncated]
+        else:
+            low = want.lower()
+            idx = [i for i, e in enumerate(self.texts) if low in e.text.lower()]
+        hit = [self.texts[i] for i in self._innermost(idx)]
+        if visible_only:
+            hit = [e for e in hit if e.visible]
+        return hit
+
+    def _innermost(self, idx: List[int]) -> List[int]:
+        """一致した要素のうち、子孫にも一致があるもの（祖先側）を除く"""
+        covered = set()
+        for i in idx:
+            p = self.texts[i].parent
+            while p >= 0 and p not in covered:
+                covered.add(p)
+                p = self.texts[p].parent
+        return [i for i in idx if i not in covered]
+
+    def text_count(self, text: str, exact: bool = False, visible_only: bool = False) -> int:
+        return len(self.find_text(text, exact=exact, visible_only=visible_only))
+
+    def has_text(self, text: str, exact: bool = False, visible_only: bool = False) -> bool:
+        return self.text_count(text, exact=exact, visible_only=visible_only) > 0
+
+    def missing_texts(self, texts: Sequence[str], exact: bool = False) -> List[str]:
+        return [t for t in texts if not self.has_text(t, exact=exact)]
+
+    # ---------------- セレクタ ----------------
+    def query(self, selector: str) -> List[SnapElement]:
+        if selector not in self.matches:
+            raise KeyError(f"selector not captured in snapshot: {selector}")
+        return self.matches[selector]
+
+    def count(self, selector: str, visible_only: bool = False) -> int:
+        els = self.query(selector)
+        return sum(1 for e in els if e.visible) if visible_only else len(els)
+
+
+def dom_snapshot(page: Page, selectors: Sequence[str] = ()) -> DomSnapshot:
+    """
+    今の画面を1回の evaluate で撮る。selectors は querySelectorAll に渡せる CSS のみ
+    （:has-text などの Playwright 拡張は不可）
+    """
+    raw = page.evaluate(_SNAPSHOT_JS, {"selectors": list(selectors), "maxLen": MAX_TEXT_LEN})
+
+    def _el(d) -> SnapElement:
+        return SnapElement(
+            text=d.get("text") or "",
+            visible=bool(d.get("visible")),
+            enabled=bool(d.get("enabled")),
+            attrs=d.get("attrs") or {},
+            truncated=bool(d.get("truncated")),
+            parent=int(d.get("parent", -1)),
+        )
+
+    return DomSnapshot(
+        url=raw.get("url") or "",
+        texts=[_el(d) for d in raw.get("texts") or []],
+        matches={k: [_el(d) for d in v] for k, v in (raw.get("matches") or {}).items()},
+    )
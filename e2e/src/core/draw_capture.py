@@ -0,0 +1,163 @@
+# e2e/src/core/draw_capture.py
+from __future__ import annotations
+
+import os
+import re
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse, urlunparse
+
+from playwright.sync_api import Page, Response
+
+from src.core.text import normalize_text
+
+# 抽選APIのURL（正規表現）。lead_params.draw_api_pattern / E2E_DRAW_API_PATTERN で上書き
+DEFAULT_DRAW_API_PATTERN = r"/(draw|draws|lottery|gacha)(/|\?|$)"
+
+# 結果1件を表す dict のキー候補（先に見つかったものを使う）
+DEFAULT_NAME_KEYS = ("name", "result_name", "resultName", "title")
+DEFAULT_IMAGE_KEYS = ("image_url", "imageUrl", "image", "img", "src", "thumbnail", "thumbnailUrl")
+
+
+def strip_query(url: str) -> str:
+    """CDN の署名/キャッシュ用クエリを無視して比較するため"""
+    p = urlparse(url or "")
+    return urlunparse((p.scheme, p.netloc, p.path, "", "", ""))
+
+
+def same_asset(a: str, b: str) -> bool:
+    return strip_query(a) == strip_query(b)
+
+
+def result_name(raw: str) -> str:
+    t = normalize_text(raw or "")
+    m = re.search(r"(結果[A-Z])", t)
+    return m.group(1) if m else t
+
+
+@dataclass(frozen=True)
+class DrawCaptureConfig:
+    pattern: str = DEFAULT_DRAW_API_PATTERN
+    name_keys: Tuple[str, ...] = DEFAULT_NAME_KEYS
+    image_keys: Tuple[str, ...] = DEFAULT_IMAGE_KEYS
+
+
+def draw_capture_config(lead_params: Dict[str, Any] | None) -> Optional[DrawCaptureConfig]:
+    """
+    lead_params.draw_source: network のときだけ設定を返す（既定は従来どおり card）
+      - draw_api_pattern : 抽選APIのURL（正規表現）
+      - draw_name_key    : 結果名のキー
+      - draw_image_key   : 画像URLのキー
+    """
+    params = lead_params or {}
+    source = (params.get("draw_source") or os.getenv("E2E_DRAW_SOURCE") or "card").strip().lower()
+    if source != "network":
+        return None
+    return draw_api_config(params)
+
+
+def draw_api_config(lead_params: Dict[str, Any] | None) -> DrawCaptureConfig:
+    """抽選APIの URL パターン / キー（draw_source に関係なく）"""
+    params = lead_params or {}
+    pattern = params.get("draw_api_pattern") or os.getenv("E2E_DRAW_API_PATTERN") or DEFAULT_DRAW_API_PATTERN
+    name_keys = (params["draw_name_key"],) if params.get("draw_name_key") else DEFAULT_NAME_KEYS
+    image_keys = (params["draw_image_key"],) if params.get("draw_image_key") else DEFAULT_IMAGE_KEYS
+    return DrawCaptureConfig(pattern=pattern, name_keys=tuple(name_keys), image_keys=tuple(image_keys))
+
+
+def _pick(d: Dict[str, Any], keys: Tuple[str, ...]) -> Optional[str]:
+    for k in keys:
+        v = d.get(k)
+        if isinstance(v, str) and v.strip():
+            return v.strip()
+    return None
+
+
+def find_result_list(payload: Any, cfg: DrawCaptureConfig, draw_count: int | None = None) -> Optional[List[Dict[str, Any]]]:
+    """
+    JSON を総当たりで辿って「名前と画像を持つ dict の配列」を探す（payload 内の配列そのものを返す）。
+    draw_count 件ちょうどの配列を優先（無ければ最初に見つかったもの）。
+    """
+    found: List[List[Dict[str, Any]]] = []
+
+    def _walk(node: Any) -> None:
+        if isinstance(node, list):
+            if node and all(
+                isinstance(x, dict) and _pick(x, cfg.name_keys) and _pick(x, cfg.image_keys) for x in node
+            ):
+                found.append(node)
+            for x in node:
+                _walk(x)
+        elif isinstance(node, dict):
+            for v in node.values():
+                _walk(v)
+
+    _walk(payload)
+    if not found:
+        return None
+    if draw_count is not None:
+        for items in found:
+            if len(items) == draw_count:
+                return items
+    return found[0]
+
+
+def find_results(payload: Any, cfg: DrawCaptureConfig, draw_count: int | None = None) -> Optional[List[Dict[str, str]]]:
+    """
+    戻り値は card_results と同じ形: [{"src": ..., "name": ...}]
+    """
+    items = find_result_list(payload, cfg, draw_count)
+    if items is None:
+        return None
+    return [{"src": _pick(x, cfg.image_keys), "name": result_name(_pick(x, cfg.name_keys))} for x in items]
+
+
+class DrawCapture:
+    """
+    抽選APIのレスポンスを page.on("response") で拾う。
+    ハンドラでは Response を溜めるだけにして、JSON の解釈は results() 側でやる。
+    """
+
+    def __init__(self, page: Page, cfg: DrawCaptureConfig):
+        self.page = page
+        self.cfg = cfg
+        self._re = re.compile(cfg.pattern)
+        self._responses: List[Response] = []
+
+    def _on_response(self, resp: Response) -> None:
+        if resp.request.method not in ("GET", "POST"):
+            return
+        if not self._re.search(resp.url):
+            return
+        if "json" not in (resp.headers.get("content-type") or ""):
+            return
+        self._responses.append(resp)
+
+    def attach(self) -> "DrawCapture":
+        self.page.on("response", self._on_response)
+        return self
+
+    def detach(self) -> None:
+        try:
+            self.page.remove_listener("response", self._on_response)
+        except Exception:
+            pass
+
+    def results(self, draw_count: int, timeout_ms: int) -> Optional[List[Dict[str, str]]]:
+        end = time.time() + timeout_ms / 1000.0
+        seen = 0
+        while True:
+            for resp in self._responses[seen:]:
+                seen += 1
+                try:
+                    payload = resp.json()
+                except Exception:
+                    continue
+                items = find_results(payload, self.cfg, draw_count)
+                if items is not None and len(items) == draw_count:
+                    return items
+            if time.time() >= end:
+                return None
+            # イベント処理を回すため Playwright 側で待つ
+            self.page.wait_for_timeout(100)
@@ -0,0 +1,204 @@
+# e2e/src/core/draw_forcing.py
+from __future__ import annotations
+
+import copy
+import json
+import re
+from typing import Any, Dict, List, Optional, Sequence
+
+from playwright.sync_api import Page, Route
+
+from src.core.draw_capture import (
+    DrawCaptureConfig,
+    draw_api_config,
+    find_result_list,
+    result_name,
+)
+from src.core.run_history import get_history_dir
+
+# 結果名の既定（lead_params.result_names で上書き）
+DEFAULT_RESULT_NAMES = ("結果A", "結果B", "結果C")
+
+
+def normalize_result_name(v: Any) -> str:
+    """'A' / 'a' / '結果A' → '結果A'"""
+    t = str(v or "").strip()
+    if re.fullmatch(r"[A-Za-z]", t):
+        return f"結果{t.upper()}"
+    return result_name(t)
+
+
+def forced_results_for(lead_params: Dict[str, Any] | None) -> Optional[List[str]]:
+    params = lead_params or {}
+    raw = params.get("forced_results")
+    if not raw:
+        return None
+    return [normalize_result_name(x) for x in raw]
+
+
+def covering_sequences(result_names: Sequence[str], draw_count: int) -> List[List[str]]:
+    """
+    全結果 × 全位置 を網羅する最小の並び。
+    各位置に k 種類すべてを出すには k 本必要で、巡回シフトで k 本ちょうどに収まる。
+      例) [A, B, C], draw_count=4 → ABCA / BCAB / CABC
+    """
+    names = list(result_names)
+    k = len(names)
+    if k == 0 or draw_count <= 0:
+        return []
+    return [[names[(i + j) % k] for i in range(draw_count)] for j in range(k)]
+
+
+class DrawCatalogue:
+    """
+    これまでの抽選レスポンスで見た「結果名 → 1件分の dict」。
+    差し替え時に、そのレスポンスに無い結果の見本として使う（draw_catalogue.json）。
+    """
+
+    def __init__(self, path=None):
+        self.path = path or (get_history_dir() / "draw_catalogue.json")
+        self.items: Dict[str, Dict[str, Any]] = {}
+        if self.path.exists():
+            try:
+                self.items = json.loads(self.path.read_text(encoding="utf-8"))
+            except Exception:
+                self.items = {}
+
+    def learn(self, items: List[Dict[str, Any]], cfg: DrawCaptureConfig) -> None:
+        changed = False
+        for x in items:
+            nm = next((x[k] for k in cfg.name_keys if isinstance(x.get(k), str)), None)
+            if not nm:
+                continue
+            key = result_name(nm)
+            if key not in self.items:
+                self.items[key] = copy.deepcopy(x)
+                changed = True
+        if changed:
+            try:
+                self.path.write_text(json.dumps(self.items, ensure_ascii=False, indent=2), encoding="utf-8")
+            except Exception:
+                pass
+
+
+class DrawForcer:
+    """
+    抽選APIを page.route で横取りし、結果の並びを forced に差し替える。
+      1) 本物のレスポンスを route.fetch() で取る
+      2) 結果配列の各要素を、指定結果の見本（同レスポンス内 → カタログ → forced_result_images）で置き換える
+      3) route.fulfill で返す
+    見本が用意できない結果があれば差し替えずにそのまま返し、error に理由を残す。
+    パターンに掛かっても結果配列を含まないレスポンス（一覧取得など）は素通しにして数えるだけ。
+    判定は applied を優先する（一度でも差し替えられていれば、それ以前の素通しは失敗にしない）。
+
+    ※ 差し替えた結果の ID 等はサーバーの抽選結果と一致しない（カタログの見本は別ユーザーの ID）。
+       forced のシナリオでは「今すぐつかう」（サーバー側の使用処理）は行わない。
+    """
+
+    def __init__(
+        self,
+        forced: List[str],
+        cfg: DrawCaptureConfig,
+        images: Dict[str, str] | None = None,
+        catalogue: DrawCatalogue | None = None,
+    ):
+        self.forced = forced
+        self.cfg = cfg
+        self.images = {normalize_result_name(k): v for k, v in (images or {}).items()}
+        self.catalogue = catalogue or DrawCatalogue()
+        self.applied = False
+        self.error: Optional[str] = None
+        self.skipped = 0
+        self._page: Optional[Page] = None
+        self._re = re.compile(cfg.pattern)
+
+    @classmethod
+    def for_scenario(cls, lead_params: Dict[str, Any] | None) -> Optional["DrawForcer"]:
+        forced = forced_results_for(lead_params)
+        if forced is None:
+            return None
+        params = lead_params or {}
+        return cls(forced, draw_api_config(params), images=params.get("forced_result_images"))
+
+    def _template_for(self, name: str, seen: Dict[str, Dict[str, Any]], base: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if name in seen:
+            return copy.deepcopy(seen[name])
+        if name in self.catalogue.items:
+            return copy.deepcopy(self.catalogue.items[name])
+        if name in self.images:
+            t = copy.deepcopy(base)
+            for k in self.cfg.name_keys:
+                if k in t:
+                    t[k] = name
+                    break
+            for k in self.cfg.image_keys:
+                if k in t:
+                    t[k] = self.images[name]
+                    break
+            return t
+        return None
+
+    def _handle(self, route: Route) -> None:
+        # ページ本体（/gacha/... など）はパターンに掛かっても触らない
+        if route.request.resource_type not in ("xhr", "fetch"):
+            route.fallback()
+            return
+        try:
+            resp = route.fetch()
+        except Exception:
+            route.fallback()
+            return
+        # ここから先は取得済みのレスポンスを返す（fallback するとリクエストが二重に飛ぶ）
+        try:
+            payload = resp.json()
+        except Exception:
+            self.skipped += 1
+            route.fulfill(response=resp)
+            return
+
+        items = find_result_list(payload, self.cfg, len(self.forced))
+        if items is None or len(items) != len(self.forced):
+            self.skipped += 1
+            route.fulfill(response=resp)
+            return
+
+        self.catalogue.learn(items, self.cfg)
+        seen = {}
+        for x in items:
+            nm = next((x[k] for k in self.cfg.name_keys if isinstance(x.get(k), str)), "")
+            seen.setdefault(result_name(nm), x)
+
+        replaced = []
+        for name in self.forced:
+            t = self._template_for(name, seen, items[0])
+            if t is None:
+                self.error = f"no_template_for_{name}"
+                route.fulfill(response=resp)
+                return
+            replaced.append(t)
+
+        items[:] = replaced
+        self.applied = True
+        route.fulfill(response=resp, json=payload)
+
+    def failure(self) -> Optional[str]:
+        """差し替えが一度も効いていなければ理由（効いていれば None）"""
+        if self.applied:
+            return None
+        if self.error:
+            return self.error
+        return "draw_result_list_not_found" if self.skipped else "results_not_applied"
+
+    def attach(self, page: Page) -> "DrawForcer":
+        self._page = page
+        page.route(self._re, self._handle)
+        return self
+
+    def detach(self) -> None:
+        if self._page is None:
+            return
+        try:
+            self._page.unroute(self._re, self._handle)
+        except Exception:
+            pass
+        self._page = None
@@ -0,0 +1,35 @@
+# e2e/src/core/env.py
+"""
+環境変数の読み取り（未設定・空・不正なら default）
+"""
+from __future__ import annotations
+
+import os
+from typing import Any
+
+
+def truthy(v: Any) -> bool:
+    """"1" / "true" / "yes" / "y" / "on"（大文字小文字・前後空白は無視）"""
+    return str(v or "").strip().lower() in ("1", "true", "yes", "y", "on")
+
+
+def env_truthy(name: str, default: bool = False) -> bool:
+    v = os.getenv(name)
+    if v is None or not v.strip():
+        return default
+    return truthy(v)
+
+
+def env_int(name: str, default: int) -> int:
+    """数値の環境変数（未設定・空・不正なら default）"""
+    try:
+        return int(os.getenv(name, str(default)) or default)
+    except ValueError:
+        return default
+
+
+def env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)) or default)
+    except ValueError:
+        return default
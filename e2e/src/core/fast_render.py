@@ -0,0 +1,125 @@
+# e2e/src/core/fast_render.py
+from __future__ import annotations
+
+import json
+import os
+import weakref
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from playwright.sync_api import Page
+
+from src.core.run_profile import get_run_profile
+from src.core.types import Scenario
+
+# CSS transition / animation を全部ゼロにする（カードめくり・ドット・トースト・Chakra/MUIモーダル）
+NO_MOTION_CSS = """
+*, *::before, *::after {
+  transition-duration: 0s !important;
+  transition-delay: 0s !important;
+  animation-duration: 0s !important;
+  animation-delay: 0s !important;
+  animation-iteration-count: 1 !important;
+  scroll-behavior: auto !important;
+}
+"""
+
+# 以降のナビゲーションでも、DOM ができた時点で同じスタイルを入れる
+_NO_MOTION_INIT_JS = """
+(() => {
+  const css = %s;
+  const inject = () => {
+    if (document.getElementById('__e2e_no_motion')) return;
+    const st = document.createElement('style');
+    st.id = '__e2e_no_motion';
+    st.textContent = css;
+    (document.head || document.documentElement).appendChild(st);
+  };
+  if (document.readyState === 'loading') {
+    document.addEventListener('DOMContentLoaded', inject, { once: true });
+  } else {
+    inject();
+  }
+})();
+"""
+
+# 仮想時計で先送りする量（setTimeout 駆動の演出をまとめて消化する）
+DEFAULT_FAST_FORWARD_MS = 2000
+
+
+def _truthy(v: Any) -> bool:
+    if isinstance(v, bool):
+        return v
+    return str(v or "").strip().lower() in ("1", "true", "yes", "y", "on")
+
+
+@dataclass(frozen=True)
+class FastRenderOptions:
+    clock: bool = False
+    fast_forward_ms: int = DEFAULT_FAST_FORWARD_MS
+
+
+def fast_render_for(sc: Scenario) -> Optional[FastRenderOptions]:
+    """
+    fast-render を使うか（使うならオプションを返す）
+      - lead_params.fast_render: false / true / {clock, fast_forward_ms}
+      - 未指定なら E2E_FAST_RENDER、さらに未指定なら実行プロファイル（fast は有効）
+      - 仮想時計は lead_params.fast_render.clock または E2E_FAST_RENDER_CLOCK
+    """
+    params = sc.lead_params if isinstance(sc.lead_params, dict) else {}
+    conf: Any = params.get("fast_render")
+
+    if conf is None:
+        env = os.getenv("E2E_FAST_RENDER")
+        enabled = _truthy(env) if env is not None else get_run_profile().fast_render
+        if not enabled:
+            return None
+        conf = {}
+    elif not isinstance(conf, dict):
+        if not _truthy(conf):
+            return None
+        conf = {}
+
+    clock = conf.get("clock")
+    if clock is None:
+        clock = _truthy(os.getenv("E2E_FAST_RENDER_CLOCK"))
+    return FastRenderOptions(
+        clock=bool(clock),
+        fast_forward_ms=int(conf.get("fast_forward_ms", DEFAULT_FAST_FORWARD_MS)),
+    )
+
+
+_ACTIVE: "weakref.WeakKeyDictionary[Page, FastRenderOptions]" = weakref.WeakKeyDictionary()
+
+
+def apply_fast_render(page: Page, opts: FastRenderOptions) -> None:
+    """
+    prefers-reduced-motion + transition/animation ゼロ（+ 任意で仮想時計）をページに入れる
+    """
+    page.emulate_media(reduced_motion="reduce")
+    page.add_init_script(_NO_MOTION_INIT_JS % json.dumps(NO_MOTION_CSS))
+    # 既に開いているドキュメントにも入れる（about:blank なら失敗してよい）
+    try:
+        if page.url and page.url != "about:blank":
+            page.add_style_tag(content=NO_MOTION_CSS)
+    except Exception:
+        pass
+    if opts.clock:
+        # 時間は普通に進む。演出待ちの箇所で fast_forward する
+        page.clock.install()
+    _ACTIVE[page] = opts
+
+
+def fast_render_active(page: Page) -> bool:
+    return page in _ACTIVE
+
+
+def fast_forward(page: Page) -> None:
+    """仮想時計が入っていれば、演出用のタイマーを先送りして即時に消化する"""
+    opts = _ACTIVE.get(page)
+    if opts is None or not opts.clock:
+        return
+    try:
+        page.clock.fast_forward(opts.fast_forward_ms)
+    except Exception:
+        pass
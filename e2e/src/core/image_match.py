@@ -0,0 +1,175 @@
+# e2e/src/core/image_match.py
+"""
+画像の中身での一致判定（perceptual hash / pHash）
+
+  - 取得した画像（またはスクショ）を 32x32 グレースケールにして積む（N, 32, 32）
+  - DCT を行列積でまとめて計算（D @ X @ D.T）
+  - 左上 8x8 の低周波成分を中央値で2値化 → 64bit
+  - ハミング距離は XOR + popcount を行列でまとめて計算
+  - URL ごとのハッシュは phash_cache.json にキャッシュ
+
+CDN のリサイズ版（URL違い）でも同じ画像なら距離が小さくなる。
+"""
+from __future__ import annotations
+
+import io
+import json
+import os
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from PIL import Image
+
+from src.core.asset_check import fetch_bodies
+from src.core.env import env_int
+from src.core.run_history import get_history_dir
+
+HASH_SIZE = 8
+IMG_SIZE = 32
+
+# 同一画像とみなすハミング距離の上限（64bit中）
+DEFAULT_THRESHOLD = 10
+
+
+def image_match_mode(lead_params: Dict | None) -> str:
+    """
+    lead_params.image_match / E2E_IMAGE_MATCH
+      - src     : src 文字列で比較（既定）
+      - content : 画像の中身（pHash）で比較
+    """
+    params = lead_params or {}
+    mode = (params.get("image_match") or os.getenv("E2E_IMAGE_MATCH") or "src").strip().lower()
+    if mode not in ("src", "content"):
+        raise ValueError(f"Unknown image_match: {mode}")
+    return mode
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    m = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    m[0, :] = np.sqrt(1.0 / n)
+    return m.astype(np.float32)
+
+
+_DCT = _dct_matrix(IMG_SIZE)
+
+
+def _to_gray(data: bytes) -> np.ndarray:
+    with Image.open(io.BytesIO(data)) as im:
+        im = im.convert("L").resize((IMG_SIZE, IMG_SIZE), Image.Resampling.BILINEAR)
+        return np.asarray(im, dtype=np.float32)
+
+
+def phash_batch(images: np.ndarray) -> np.ndarray:
+    """
+    images: (N, 32, 32) float32 → (N,) uint64
+    """
+    if images.size == 0:
+        return np.zeros((0,), dtype=np.uint64)
+    coeffs = _DCT @ images @ _DCT.T                      # (N, 32, 32)
+    low = coeffs[:, :HASH_SIZE, :HASH_SIZE].reshape(len(images), -1)
+    med = np.median(low[:, 1:], axis=1, keepdims=True)   # DC は除いて中央値
+    bits = (low > med).astype(np.uint8)                  # (N, 64)
+    packed = np.packbits(bits, axis=1)                   # (N, 8)
+    return packed.view(">u8").reshape(-1).astype(np.uint64)
+
+
+def _popcount(x: np.ndarray) -> np.ndarray:
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(x).astype(np.int32)
+    b = x.view(np.uint8).reshape(*x.shape, 8)
+    return np.unpackbits(b, axis=-1).sum(axis=-1).astype(np.int32)
+
+
+def hamming_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """(N,) x (M,) → (N, M) のハミング距離"""
+    return _popcount(np.bitwise_xor(a[:, None], b[None, :]))
+
+
+class PHashCache:
+    """url → pHash（16進）。phash_cache.json"""
+
+    def __init__(self, path=None):
+        self.path = path or (get_history_dir() / "phash_cache.json")
+        self.hashes: Dict[str, int] = {}
+        self._dirty = False
+        if self.path.exists():
+            try:
+                self.hashes = {k: int(v, 16) for k, v in json.loads(self.path.read_text(encoding="utf-8")).items()}
+            except Exception:
+                self.hashes = {}
+
+    def put(self, url: str, h: int) -> None:
+        self.hashes[url] = h
+        self._dirty = True
+
+    def save(self) -> None:
+        if not self._dirty:
+            return
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({k: f"{v:016x}" for k, v in self.hashes.items()}, indent=2), encoding="utf-8")
+        tmp.replace(self.path)
+        self._dirty = False
+
+
+_CACHE: Optional[PHashCache] = None
+
+
+def _cache() -> PHashCache:
+    global _CACHE
+    if _CACHE is None:
+        _CACHE = PHashCache()
+    return _CACHE
+
+
+def hash_bytes(datas: Sequence[bytes]) -> List[Optional[int]]:
+    """画像バイト列（取得 or スクショ）をまとめてハッシュ化。デコードできないものは None"""
+    idx, arrs = [], []
+    for i, d in enumerate(datas):
+        try:
+            arrs.append(_to_gray(d))
+            idx.append(i)
+        except Exception:
+            continue
+    out: List[Optional[int]] = [None] * len(datas)
+    if arrs:
+        for i, h in zip(idx, phash_batch(np.stack(arrs))):
+            out[i] = int(h)
+    return out
+
+
+def hash_urls(urls: Sequence[str]) -> Dict[str, Optional[int]]:
+    """URL ごとのハッシュ（キャッシュに無いものだけ並行取得してまとめて計算）"""
+    cache = _cache()
+    uniq = list(dict.fromkeys(u for u in urls if u))
+    out: Dict[str, Optional[int]] = {u: cache.hashes.get(u) for u in uniq}
+    missing = [u for u in uniq if out[u] is None]
+    if missing:
+        bodies = fetch_bodies(missing)
+        keys = [u for u in missing if bodies.get(u)]
+        for u, h in zip(keys, hash_bytes([bodies[u] for u in keys])):
+            out[u] = h
+            if h is not None:
+                cache.put(u, h)
+        try:
+            cache.save()
+        except Exception:
+            pass
+    return out
+
+
+def content_match(a: Sequence[str], b: Sequence[str], threshold: int | None = None) -> List[bool]:
+    """
+    a[i] と b[i] が同じ画像か（位置ごと）。取得/デコードできないものは False
+    """
+    th = threshold if threshold is not None else env_int("E2E_PHASH_THRESHOLD", DEFAULT_THRESHOLD)
+    hashes = hash_urls(list(a) + list(b))
+    n = min(len(a), len(b))
+    ok = [hashes.get(a[i]) is not None and hashes.get(b[i]) is not None for i in range(n)]
+    if not any(ok):
+        return [False] * n
+    ha = np.array([hashes.get(a[i]) or 0 for i in range(n)], dtype=np.uint64)
+    hb = np.array([hashes.get(b[i]) or 0 for i in range(n)], dtype=np.uint64)
+    dist = _popcount(ha ^ hb)  # 位置ごとなので対角だけ（N×N は作らない）
+    return [bool(ok[i] and dist[i] <= th) for i in range(n)]
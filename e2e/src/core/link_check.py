@@ -0,0 +1,129 @@
+# e2e/src/core/link_check.py
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+from playwright.sync_api import Locator, Page
+
+from src.core import run_profile as RP
+from src.core.asset_check import fetch_statuses
+from src.core.env import env_int
+
+
+def link_check_mode(lead_params: Dict[str, Any] | None) -> str:
+    """
+    lead_params.link_check / E2E_LINK_CHECK
+      - click   : 新規タブで開くことを確認（既定）
+      - request : APIRequestContext で到達性だけ確認（クリックしない）
+      - both    : 両方
+    """
+    params = lead_params or {}
+    mode = (params.get("link_check") or os.getenv("E2E_LINK_CHECK") or "click").strip().lower()
+    if mode not in ("click", "request", "both"):
+        raise ValueError(f"Unknown link_check: {mode}")
+    return mode
+
+
+def url_matches(href: str, cur: str) -> bool:
+    """従来の判定と同じ（href を含む or href で始まる）"""
+    if not href:
+        return True
+    return (href in cur) or cur.startswith(href)
+
+
+@dataclass
+class LinkTarget:
+    key: str            # 失敗時の save_debug タグ用
+    locator: Locator
+    href: str
+
+
+@dataclass
+class LinkResult:
+    key: str
+    href: str
+    ok: bool
+    url: str = ""
+    error: str = ""
+
+
+def _click(locator: Locator, timeout_ms: int) -> None:
+    try:
+        locator.click(timeout=timeout_ms)
+    except Exception:
+        locator.click(timeout=timeout_ms, force=True)
+
+
+def open_links_in_new_tabs(
+    page: Page,
+    targets: Sequence[LinkTarget],
+    concurrency: int | None = None,
+    check_url: bool = True,
+) -> List[LinkResult]:
+    """
+    リンクを押して「新規タブで開く」ことを確認する。
+      - 上限 concurrency 件ずつまとめて押し、各タブの遷移が commit した時点で判定（読み込み完了は待たない）
+      - 同じバッチのタブは並行して遷移するので、待ち時間は合計ではなく最大ぶんになる
+    """
+    cap = max(1, concurrency or env_int("E2E_LINK_CHECK_CONCURRENCY", 4))
+    click_ms = RP.timeout_ms("click")
+    commit_ms = RP.timeout_ms("action")
+    results: List[LinkResult] = []
+
+    for start in range(0, len(targets), cap):
+        batch = targets[start:start + cap]
+        opened: List[tuple[LinkTarget, Optional[Page]]] = []
+
+        # 1) まとめて押す（ポップアップが出た時点で次へ）
+        for t in batch:
+            try:
+                with page.context.expect_page(timeout=click_ms) as pg:
+                    _click(t.locator, click_ms)
+                opened.append((t, pg.value))
+            except Exception:
+                opened.append((t, None))
+
+        # 2) 各タブの遷移 commit を待つ
+        for t, newp in opened:
+            if newp is None:
+                results.append(LinkResult(t.key, t.href, ok=False, error="popup_not_opened"))
+                continue
+            try:
+                if check_url and t.href:
+                    newp.wait_for_url(lambda u, h=t.href: url_matches(h, u), wait_until="commit", timeout=commit_ms)
+                else:
+                    newp.wait_for_load_state("commit", timeout=commit_ms)
+                results.append(LinkResult(t.key, t.href, ok=True, url=newp.url or ""))
+            except Exception:
+                cur = newp.url or ""
+                ok = (not check_url) or url_matches(t.href, cur)
+                results.append(LinkResult(t.key, t.href, ok=ok, url=cur, error="" if ok else "url_mismatch"))
+
+        # 3) 閉じる
+        for _, newp in opened:
+            if newp is None:
+                continue
+            try:
+                newp.close()
+            except Exception:
+                pass
+
+    return results
+
+
+# 実行中（プロセス内）のキャッシュ：url → (ok, status)
+_REACH_CACHE: Dict[str, tuple[bool, int]] = {}
+
+
+def check_reachability(urls: Sequence[str]) -> Dict[str, tuple[bool, int]]:
+    """
+    HEAD（だめなら GET）して到達性を見る。同じURLは1実行で1回だけ。
+    ※ 画像アセット検証と同じ別スレッドの async Playwright で、上限付きで並行に投げる
+      （ブラウザの描画/タブは使わない）
+    """
+    pending = [u for u in dict.fromkeys(u for u in urls if u) if u not in _REACH_CACHE]
+    for url, status in fetch_statuses(pending).items():
+        _REACH_CACHE[url] = (0 < status < 400, status)
+    return {u: _REACH_CACHE[u] for u in dict.fromkeys(u for u in urls if u)}
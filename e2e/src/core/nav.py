@@ -5,60 +5,59 @@ from typing import Iterable, Optional
 
 from playwright.sync_api import Page, TimeoutError as PlaywrightTimeoutError
 
+from src.core import run_profile as RP
+from src.core.click_engine import confirm_click, nav_mode_order, record_nav_mode, smart_click
+
 
 def is_domain_in(url: str, domains: Iterable[str]) -> bool:
     u = (url or "").lower()
     return any(d.lower() in u for d in domains)
 
 
-def safe_click(locator, timeout_ms: int = 15000) -> None:
+def safe_click(locator, timeout_ms: int | None = None, name: str | None = None) -> None:
     """
-    clickが詰まる場合に備えて押し切る。
+    clickが詰まる場合に備えて押し切る（timeout_ms 省略時は click 段階）。
+    name を渡すと、押せた段階（normal / force / js）を保留にする。
+    次の画面を確認したら confirm_click(name, ok) で確定する（確定した段階から次回は試す）
     """
-    locator.first.wait_for(timeout=timeout_ms)
-    try:
-        locator.first.scroll_into_view_if_needed(timeout=timeout_ms)
-    except Exception:
-        pass
-
-    try:
-        locator.first.click(timeout=timeout_ms)
-        return
-    except Exception:
-        pass
-
-    try:
-        locator.first.click(timeout=timeout_ms, force=True)
-        return
-    except Exception:
-        pass
+    smart_click(locator, name=name, timeout_ms=timeout_ms)
 
-    locator.first.evaluate("el => el.click()")
 
-
-def click_and_get_external_page(current_page: Page, trigger_locator, external_domains: list[str], timeout_sec: float = 12.0) -> Page:
+def click_and_get_external_page(
+    current_page: Page,
+    trigger_locator,
+    external_domains: list[str],
+    timeout_sec: float = 12.0,
+    name: str = "nav.external",
+) -> Page:
     """
     クリック後に popup / 新規タブ / 同一タブ遷移 のいずれでも
     external_domainsに合致するページが取れれば返す。
+    前回までに popup で取れなかった操作は、popup 待ち（3秒）を飛ばして探索から始める。
     """
     ctx = current_page.context
     before_pages = set(ctx.pages)
 
-    # popup狙い
-    try:
-        with current_page.expect_popup(timeout=3000) as pop:
-            safe_click(trigger_locator, timeout_ms=15000)
-        p = pop.value
+    if nav_mode_order(name)[0] == "popup":
+        # popup狙い
         try:
-            p.bring_to_front()
+            with current_page.expect_popup(timeout=3000) as pop:
+                safe_click(trigger_locator, timeout_ms=RP.timeout_ms("click"), name=name)
+            p = pop.value
+            try:
+                p.bring_to_front()
+            except Exception:
+                pass
+            if is_domain_in(p.url, external_domains):
+                record_nav_mode(name, "popup")
+                confirm_click(name)
+                return p
+            # popup取れたがドメイン違いなら後続探索へ
         except Exception:
-            pass
-        if is_domain_in(p.url, external_domains):
-            return p
-        # popup取れたがドメイン違いなら後続探索へ
-    except Exception:
-        # popup出ないケース
-        safe_click(trigger_locator, timeout_ms=15000)
+            # popup出ないケース
+            safe_click(trigger_locator, timeout_ms=RP.timeout_ms("click"), name=name)
+    else:
+        safe_click(trigger_locator, timeout_ms=RP.timeout_ms("click"), name=name)
 
     end = time.time() + timeout_sec
     while time.time() < end:
@@ -69,17 +68,24 @@ def click_and_get_external_page(current_page: Page, trigger_locator, external_do
                     p.bring_to_front()
                 except Exception:
                     pass
+                record_nav_mode(name, "scan")
+                confirm_click(name)
                 return p
         # 同一タブ遷移
         if is_domain_in(current_page.url, external_domains):
+            record_nav_mode(name, "scan")
+            confirm_click(name)
             return current_page
         time.sleep(0.2)
 
     # 最後に全探索
     for p in list(ctx.pages):
         if is_domain_in(p.url, external_domains):
+            confirm_click(name)
             return p
 
+    # 押せたが遷移しなかった段階は減点
+    confirm_click(name, ok=False)
     return current_page
 
 
@@ -0,0 +1,57 @@
+# e2e/src/core/paid_price.py
+"""
+課金ガチャの価格表（lead_params.paid_price_table）
+
+    paid_price_table:
+      unit_price: 500        # 1回あたりの税抜価格（円）
+      tax_rate: 0.1          # 消費税率
+      tax_rounding: floor    # floor / round / ceil
+      price_count: 1         # 確認画面の初期表示がどの回数ぶんの金額か
+      allowed_counts: [1, 5] # 購入できる回数（select の選択肢と一致すること。省略時は見ない）
+
+未指定なら従来どおり 500円 / 50円 / 550円（1回ぶん）を確認する。
+"""
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+_ROUNDING = {
+    "floor": math.floor,
+    "ceil": math.ceil,
+    "round": lambda v: int(math.floor(v + 0.5)),
+}
+
+
+@dataclass(frozen=True)
+class PaidPriceTable:
+    unit_price: int = 500
+    tax_rate: float = 0.1
+    tax_rounding: str = "floor"
+    price_count: int = 1
+    allowed_counts: Optional[Tuple[int, ...]] = None
+
+    @classmethod
+    def from_params(cls, lead_params: Dict[str, Any] | None) -> "PaidPriceTable":
+        conf = (lead_params or {}).get("paid_price_table") or {}
+        if not isinstance(conf, dict):
+            raise ValueError("paid_price_table must be a mapping")
+        rounding = str(conf.get("tax_rounding", "floor")).strip().lower()
+        if rounding not in _ROUNDING:
+            raise ValueError(f"Unknown tax_rounding: {rounding}")
+        allowed = conf.get("allowed_counts")
+        return cls(
+            unit_price=int(conf.get("unit_price", 500)),
+            tax_rate=float(conf.get("tax_rate", 0.1)),
+            tax_rounding=rounding,
+            price_count=int(conf.get("price_count", 1)),
+            allowed_counts=tuple(int(x) for x in allowed) if allowed else None,
+        )
+
+    def amounts(self, count: int | None = None) -> Tuple[int, int, int]:
+        """(購入価格, 消費税, 支払い金額)"""
+        price = self.unit_price * (count if count is not None else self.price_count)
+        # 0.1 × 550 などの浮動小数誤差で切り捨てがずれないよう、先に丸めておく
+        tax = int(_ROUNDING[self.tax_rounding](round(price * self.tax_rate, 6)))
+        return price, tax, price + tax
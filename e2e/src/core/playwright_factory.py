@@ -6,6 +6,8 @@ from typing import Optional
 
 from playwright.sync_api import sync_playwright, Browser, BrowserContext, Playwright
 
+from src.core.run_profile import apply_context_timeouts, resolve_headless, resolve_slow_mo, start_tracing
+
 
 @dataclass
 class PWContextBundle:
@@ -14,23 +16,17 @@ class PWContextBundle:
     context: BrowserContext
 
 
-def _env_true(name: str) -> bool:
-    v = (os.getenv(name) or "").strip().lower()
-    return v in ("1", "true", "yes", "y", "on")
-
-
 def create_context() -> PWContextBundle:
     """
     まずは安定性優先：persistent profileは使わず、毎回新規context。
     LINEなどログイン必要になったら storage_state / persistent を検討。
     """
-    is_ci = _env_true("CI")
-    headless = _env_true("PW_HEADLESS") if os.getenv("PW_HEADLESS") else is_ci
+    headless = resolve_headless()
     channel = os.getenv("PW_CHANNEL")  # "chrome" 等（任意）
 
     pw = sync_playwright().start()
 
-    launch_kwargs = {"headless": headless}
+    launch_kwargs = {"headless": headless, "slow_mo": resolve_slow_mo()}
     if channel:
         launch_kwargs["channel"] = channel
 
@@ -39,12 +35,11 @@ def create_context() -> PWContextBundle:
     # 必要なら viewport や locale 等をここで統一
     context = browser.new_context()
 
-    # タイムアウト統一
-    context.set_default_timeout(30000)
-    context.set_default_navigation_timeout(45000)
+    # タイムアウト統一（E2E_RUN_PROFILE）
+    apply_context_timeouts(context)
 
-    # trace開始（stopはテスト側で）
-    context.tracing.start(screenshots=True, snapshots=True, sources=True)
+    # trace開始（stopはテスト側で。プロファイルが off なら開始しない）
+    start_tracing(context)
 
     return PWContextBundle(playwright=pw, browser=browser, context=context)
 
@@ -0,0 +1,229 @@
+# e2e/src/core/profile_manager.py
+"""
+ブラウザプロファイルのテンプレート化（golden → RAM上のクローン）
+
+  python -m src.core.profile_manager warm [--headed]   # golden を作る/温める
+  python -m src.core.profile_manager clean             # RAM上のクローンを全削除
+
+- golden : キャッシュ温め済み・同意cookie済み・（任意で）ログイン済みのプロファイル
+- staged : golden を RAM ディレクトリへ1回だけコピーしたもの（golden 更新時のみ作り直し）
+- clone  : ワーカー/シナリオごとのプロファイル。staged から作る
+           1) cp --reflink=always（btrfs/xfs 等：コピーオンライト）
+           2) だめなら普通のコピー（RAM 上なので十分速い）
+           ※ hardlink は使わない。Chromium はキャッシュの index / エントリをその場で書き換えるので、
+             同じ inode を共有すると1ワーカーの書き込みで staged と他のクローンが壊れる
+
+golden の更新は warm が書く印（.e2e_golden_stamp）で判定する（clone のたびにツリーを歩かない）。
+"""
+from __future__ import annotations
+
+import argparse
+import atexit
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional
+
+from src.core import run_profile as RP
+
+# 起動中プロファイルのロック類（コピーしない）
+_SKIP_NAMES = {"SingletonLock", "SingletonSocket", "SingletonCookie", "lockfile", "LOCK"}
+
+# golden を温めたときに warm_golden が書く印（中身は作成時刻）
+_STAMP_NAME = ".e2e_golden_stamp"
+
+
+def profile_template_enabled() -> bool:
+    v = (os.getenv("E2E_PROFILE_TEMPLATE") or "").strip().lower()
+    return v in ("1", "true", "yes", "y", "on")
+
+
+def _default_ram_dir() -> Path:
+    shm = Path("/dev/shm")
+    base = shm if shm.is_dir() and os.access(shm, os.W_OK) else Path(tempfile.gettempdir())
+    return base / "croissant-e2e-profiles"
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+def _tree_mtime(root: Path) -> int:
+    latest = 0
+    for dirpath, _, files in os.walk(root):
+        for f in files:
+            try:
+                latest = max(latest, int(os.stat(os.path.join(dirpath, f)).st_mtime))
+            except OSError:
+                pass
+    return latest
+
+
+def _copy_tree_cow(src: Path, dst: Path) -> str:
+    """
+    src → dst を複製する。戻り値は使った方式（"reflink" / "copy"）
+    """
+    try:
+        r = subprocess.run(
+            ["cp", "-a", "--reflink=always", str(src), str(dst)],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        if r.returncode == 0:
+            for name in _SKIP_NAMES:
+                for p in dst.rglob(name):
+                    try:
+                        p.unlink()
+                    except OSError:
+                        pass
+            return "reflink"
+    except FileNotFoundError:
+        pass
+    shutil.rmtree(dst, ignore_errors=True)
+    shutil.copytree(src, dst, ignore=shutil.ignore_patterns(*_SKIP_NAMES), symlinks=True, dirs_exist_ok=True)
+    return "copy"
+
+
+class ProfileManager:
+    def __init__(self, golden_dir: Path | None = None, ram_dir: Path | None = None):
+        self.golden_dir = golden_dir or Path(
+            os.path.expanduser(os.getenv("E2E_GOLDEN_PROFILE_DIR", "~/playwright-profile-golden"))
+        )
+        self.ram_dir = ram_dir or Path(os.getenv("E2E_PROFILE_RAM_DIR", str(_default_ram_dir())))
+        self.ram_dir.mkdir(parents=True, exist_ok=True)
+        self._clones: List[Path] = []
+        self._stamp: Optional[int] = None
+        atexit.register(self.cleanup)
+
+    def has_golden(self) -> bool:
+        return self.golden_dir.is_dir() and any(self.golden_dir.iterdir())
+
+    def _golden_stamp(self) -> int:
+        """warm の印があればそれ、無ければツリーの更新時刻（このプロセスで1回だけ歩く）"""
+        try:
+            return int((self.golden_dir / _STAMP_NAME).read_text(encoding="utf-8").strip())
+        except (OSError, ValueError):
+            pass
+        if self._stamp is None:
+            self._stamp = _tree_mtime(self.golden_dir)
+        return self._stamp
+
+    def _staged_golden(self) -> Path:
+        """
+        golden を RAM 上に1回だけ展開（golden を温め直したら作り直す）
+        """
+        stamp = self._golden_stamp()
+        staged = self.ram_dir / f"golden_{stamp}"
+        if staged.is_dir():
+            return staged
+
+        tmp = self.ram_dir / f".golden_{stamp}_{os.getpid()}"
+        shutil.rmtree(tmp, ignore_errors=True)
+        shutil.copytree(self.golden_dir, tmp, ignore=shutil.ignore_patterns(*_SKIP_NAMES), symlinks=True)
+        try:
+            tmp.rename(staged)
+        except OSError:
+            # 他ワーカーが先に作った
+            shutil.rmtree(tmp, ignore_errors=True)
+
+        for old in self.ram_dir.glob("golden_*"):
+            if old != staged:
+                shutil.rmtree(old, ignore_errors=True)
+        return staged
+
+    def clone(self, name: str) -> Path:
+        """
+        ワーカー/シナリオ用のプロファイルを作る（終了時に自動削除）
+        """
+        self.cleanup_stale()
+        dst = self.ram_dir / f"clone_{os.getpid()}_{name}"
+        shutil.rmtree(dst, ignore_errors=True)
+        if self.has_golden():
+            _copy_tree_cow(self._staged_golden(), dst)
+        else:
+            dst.mkdir(parents=True, exist_ok=True)
+        self._clones.append(dst)
+        return dst
+
+    def cleanup(self) -> None:
+        for d in self._clones:
+            shutil.rmtree(d, ignore_errors=True)
+        self._clones.clear()
+
+    def cleanup_stale(self) -> None:
+        """落ちたプロセスが残したクローンを掃除"""
+        for d in self.ram_dir.glob("clone_*"):
+            try:
+                pid = int(d.name.split("_")[1])
+            except (IndexError, ValueError):
+                continue
+            if not _pid_alive(pid):
+                shutil.rmtree(d, ignore_errors=True)
+
+
+def warm_golden(
+    launch_persistent: Callable[[Path], object],
+    golden_dir: Path,
+    urls: Iterable[str],
+    wait_for_manual_login: Optional[Callable[[], None]] = None,
+) -> None:
+    """
+    golden プロファイルを温める（キャッシュ・同意cookie）。
+    wait_for_manual_login を渡すと、閉じる前に手動ログイン（LINE等）の時間を取る。
+    """
+    golden_dir.mkdir(parents=True, exist_ok=True)
+    ctx = launch_persistent(golden_dir)
+    try:
+        page = ctx.new_page()
+        for u in urls:
+            try:
+                page.goto(u, wait_until="load", timeout=RP.timeout_ms("nav"))
+            except Exception:
+                pass
+        if wait_for_manual_login is not None:
+            wait_for_manual_login()
+    finally:
+        ctx.close()
+    # クローン側はこの印だけ見て staged を作り直す
+    (golden_dir / _STAMP_NAME).write_text(str(int(time.time())), encoding="utf-8")
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description="croissant e2e: プロファイルテンプレート管理")
+    ap.add_argument("command", choices=["warm", "clean"])
+    ap.add_argument("--headed", action="store_true", help="画面ありで開き、手動ログイン後に Enter で保存")
+    ns = ap.parse_args(argv)
+
+    mgr = ProfileManager()
+    if ns.command == "clean":
+        shutil.rmtree(mgr.ram_dir, ignore_errors=True)
+        print(f"removed {mgr.ram_dir}")
+        return 0
+
+    from playwright.sync_api import sync_playwright
+
+    from src.core.scenario_loader import load_scenarios
+
+    urls = list(dict.fromkeys(sc.url for sc in load_scenarios()))
+    with sync_playwright() as p:
+        def _launch(d: Path):
+            return p.chromium.launch_persistent_context(user_data_dir=str(d), headless=not ns.headed)
+
+        manual = (lambda: input("ログイン等が終わったら Enter: ")) if ns.headed else None
+        warm_golden(_launch, mgr.golden_dir, urls, wait_for_manual_login=manual)
+    print(f"golden profile: {mgr.golden_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
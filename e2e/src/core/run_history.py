@@ -0,0 +1,172 @@
+# e2e/src/core/run_history.py
+from __future__ import annotations
+
+import json
+import math
+import os
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from src.core.env import env_float, env_int
+
+# 直近何回分の結果でフレーク率を出すか
+RECENT_WINDOW = 20
+
+
+def get_history_dir() -> Path:
+    """
+    実行履歴の保存先。CIでは actions/cache 等で run 間に持ち越す想定。
+    """
+    base = Path(os.getenv("E2E_HISTORY_DIR", ".e2e_history"))
+    base.mkdir(parents=True, exist_ok=True)
+    return base
+
+
+@dataclass
+class ScenarioStats:
+    """
+    outcome:
+      - "pass"  : 1回目で成功
+      - "flaky" : 失敗 → リトライで成功
+      - "fail"  : リトライ込みで失敗
+    """
+    recent: List[str] = field(default_factory=list)
+    total_runs: int = 0
+    total_reruns: int = 0
+    rerun_sec: float = 0.0
+
+    def add(self, outcome: str, reruns: int, rerun_sec: float) -> None:
+        self.recent = (self.recent + [outcome])[-RECENT_WINDOW:]
+        self.total_runs += 1
+        self.total_reruns += reruns
+        self.rerun_sec = round(self.rerun_sec + rerun_sec, 3)
+
+    @property
+    def flake_rate(self) -> float:
+        if not self.recent:
+            return 0.0
+        return self.recent.count("flaky") / len(self.recent)
+
+
+class RunHistory:
+    """
+    シナリオごとの実行履歴（run_history.json）。
+    リトライ回数の予算と quarantine 判定はここから決める。
+    record() はメモリに足すだけで、書き込みは save()（セッション終了時に1回）
+    """
+
+    def __init__(self, path: Path | None = None):
+        self.path = path or (get_history_dir() / "run_history.json")
+        self.stats: Dict[str, ScenarioStats] = self._load()
+        # 前回 save() 以降に record した分（保存時に読み直した履歴へ足す）
+        self._new: List[Tuple[str, str, int, float]] = []
+
+    def _load(self) -> Dict[str, ScenarioStats]:
+        stats: Dict[str, ScenarioStats] = {}
+        if not self.path.exists():
+            return stats
+        try:
+            raw = json.loads(self.path.read_text(encoding="utf-8"))
+        except Exception:
+            # 壊れていたら履歴なし扱い（テストは止めない）
+            return stats
+        for sid, d in (raw or {}).items():
+            if isinstance(d, dict):
+                stats[sid] = ScenarioStats(
+                    recent=[str(x) for x in d.get("recent", [])][-RECENT_WINDOW:],
+                    total_runs=int(d.get("total_runs", 0) or 0),
+                    total_reruns=int(d.get("total_reruns", 0) or 0),
+                    rerun_sec=float(d.get("rerun_sec", 0.0) or 0.0),
+                )
+        return stats
+
+    def save(self) -> None:
+        """他ワーカーの保存を消さないよう、保存直前に読み直してから今回分を足す"""
+        if not self._new:
+            return
+        merged = self._load()
+        for sid, outcome, reruns, rerun_sec in self._new:
+            merged.setdefault(sid, ScenarioStats()).add(outcome, reruns, rerun_sec)
+        data = {sid: asdict(st) for sid, st in sorted(merged.items())}
+        # 一時ファイルはプロセスごと（同時に保存しても互いの途中の内容を置き換えない）
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+        tmp.replace(self.path)
+        self.stats = merged
+        self._new.clear()
+
+    def get(self, scenario_id: str) -> ScenarioStats:
+        return self.stats.setdefault(scenario_id, ScenarioStats())
+
+    def record(self, scenario_id: str, outcome: str, reruns: int = 0, rerun_sec: float = 0.0) -> None:
+        self.get(scenario_id).add(outcome, reruns, rerun_sec)
+        self._new.append((scenario_id, outcome, reruns, rerun_sec))
+
+    def retry_budget(self, scenario_id: str) -> int:
+        """
+        フレーク率からリトライ回数を決める。
+          - 履歴が少ない   : 1回（様子見）
+          - フレーク実績なし : 0回（素直に落とす＝本物の不具合の可能性が高い）
+          - それ以外        : ceil(rate * 5) 回（E2E_MAX_RETRIES で上限）
+        """
+        max_retries = env_int("E2E_MAX_RETRIES", 2)
+        min_runs = env_int("E2E_HISTORY_MIN_RUNS", 3)
+
+        st = self.stats.get(scenario_id)
+        if st is None or len(st.recent) < min_runs:
+            return min(1, max_retries)
+
+        rate = st.flake_rate
+        if rate <= 0.0:
+            return 0
+        return min(max_retries, max(1, math.ceil(rate * 5)))
+
+    def is_quarantined(self, scenario_id: str) -> bool:
+        """
+        慢性的にフレークしているシナリオは quarantine レーン（非ブロッキング）に回す。
+        """
+        threshold = env_float("E2E_QUARANTINE_FLAKE_RATE", 0.3)
+        min_runs = env_int("E2E_QUARANTINE_MIN_RUNS", 5)
+
+        st = self.stats.get(scenario_id)
+        if st is None or len(st.recent) < min_runs:
+            return False
+        return st.flake_rate >= threshold
+
+
+@dataclass
+class RerunReport:
+    """
+    1回の pytest 実行内でのリトライコスト集計（ターミナル要約 + json 出力用）
+    """
+    entries: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+
+    def add(self, scenario_id: str, outcome: str, attempts: int, first_sec: float, rerun_sec: float) -> None:
+        self.entries[scenario_id] = {
+            "outcome": outcome,
+            "attempts": attempts,
+            "first_sec": round(first_sec, 3),
+            "rerun_sec": round(rerun_sec, 3),
+        }
+
+    @property
+    def total_reruns(self) -> int:
+        return sum(max(0, e["attempts"] - 1) for e in self.entries.values())
+
+    @property
+    def total_rerun_sec(self) -> float:
+        return round(sum(e["rerun_sec"] for e in self.entries.values()), 3)
+
+    @property
+    def total_first_sec(self) -> float:
+        return round(sum(e["first_sec"] for e in self.entries.values()), 3)
+
+    def write(self, path: Path) -> None:
+        data = {
+            "total_reruns": self.total_reruns,
+            "total_rerun_sec": self.total_rerun_sec,
+            "total_first_sec": self.total_first_sec,
+            "scenarios": self.entries,
+        }
+        path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
@@ -0,0 +1,198 @@
+# e2e/src/core/run_profile.py
+from __future__ import annotations
+
+import os
+import time
+import weakref
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, Optional
+
+# タイムアウトの段階（ms）
+#   nav     : page.goto / 画面遷移
+#   screen  : 大きな画面の表示待ち（購入確認・カード・結果詳細・モーダル本体など）
+#   element : 入力欄・ボタン等の表示/操作
+#   action  : トップ/設問/リンク先の読み込み・使用済み反映など
+#   click   : クリック・ポップアップ・小さなモーダル
+#   short   : 候補を順に試すときの1候補あたり
+#   brief   : 「出ていれば進む」系の確認
+#   long    : LINE ログインから戻るまで等の長いポーリング
+#   default : context.set_default_timeout（個別指定の無い操作）
+CI_TIMEOUTS: Dict[str, int] = {
+    "default": 30000,
+    "nav": 45000,
+    "screen": 45000,
+    "element": 25000,
+    "action": 20000,
+    "click": 15000,
+    "short": 12000,
+    "brief": 7000,
+    "long": 90000,
+}
+
+
+@dataclass(frozen=True)
+class RunProfile:
+    """
+    速度に関わる振る舞いを1か所にまとめたもの（E2E_RUN_PROFILE で選択、1回だけ解決）
+
+      - demo_wait_sec : _demo_wait の既定秒数に掛ける倍率（0 なら待たない）
+      - slow_ms       : 今すぐつかうフローの見やすさ用の待ち
+      - settle_ms     : 見やすさ/反映待ちの小さな待ち（送信直後など）
+      - timeouts      : 段階ごとのタイムアウト（ms）
+      - tracing       : "full"（screenshots+snapshots+sources）/ "light"（snapshotsのみ）/ "off"
+      - artifacts     : "full"（png+html）/ "screenshot" / "off"
+      - fast_render   : アニメーション無効化（src.core.fast_render）を既定で使うか
+    """
+    name: str
+    demo_wait_sec: float = 0.0
+    slow_ms: int = 0
+    settle_ms: int = 0
+    timeouts: Dict[str, int] = field(default_factory=lambda: dict(CI_TIMEOUTS))
+    headless: Optional[bool] = None
+    slow_mo: int = 0
+    tracing: str = "full"
+    artifacts: str = "full"
+    full_page: bool = True
+    fast_render: bool = False
+
+    def timeout(self, tier: str) -> int:
+        return int(self.timeouts.get(tier, CI_TIMEOUTS[tier]))
+
+    def tracing_options(self) -> Optional[Dict[str, bool]]:
+        if self.tracing == "off":
+            return None
+        if self.tracing == "light":
+            return {"screenshots": False, "snapshots": True, "sources": False}
+        return {"screenshots": True, "snapshots": True, "sources": True}
+
+
+PROFILES: Dict[str, RunProfile] = {
+    # 最速：見た目用の待ちゼロ・タイムアウト短め・trace なし
+    "fast": RunProfile(
+        name="fast",
+        timeouts={
+            "default": 10000,
+            "nav": 20000,
+            "screen": 15000,
+            "element": 10000,
+            "action": 8000,
+            "click": 5000,
+            "short": 5000,
+            "brief": 3000,
+            "long": 45000,
+        },
+        headless=True,
+        tracing="off",
+        artifacts="screenshot",
+        full_page=False,
+        fast_render=True,
+    ),
+    # CI：これまでの CI=true と同じ挙動
+    "ci": RunProfile(name="ci", slow_ms=400, settle_ms=300, headless=True),
+    # ローカル目視：これまでのローカル既定と同じ挙動
+    "demo": RunProfile(name="demo", demo_wait_sec=1.0, slow_ms=400, settle_ms=300),
+    # デバッグ：画面あり・ゆっくり・タイムアウト長め
+    "debug": RunProfile(
+        name="debug",
+        demo_wait_sec=1.0,
+        slow_ms=800,
+        settle_ms=300,
+        timeouts={k: v * 2 for k, v in CI_TIMEOUTS.items()},
+        headless=False,
+        slow_mo=200,
+    ),
+}
+
+
+def _is_ci() -> bool:
+    return (os.getenv("CI", "") or "").lower() == "true"
+
+
+@lru_cache(maxsize=1)
+def get_run_profile() -> RunProfile:
+    name = (os.getenv("E2E_RUN_PROFILE") or "").strip().lower()
+    if not name:
+        name = "ci" if _is_ci() else "demo"
+    if name not in PROFILES:
+        raise ValueError(f"Unknown E2E_RUN_PROFILE: {name} (choices: {', '.join(PROFILES)})")
+    return PROFILES[name]
+
+
+def timeout_ms(tier: str) -> int:
+    return get_run_profile().timeout(tier)
+
+
+def timeout_sec(tier: str) -> float:
+    return get_run_profile().timeout(tier) / 1000.0
+
+
+def demo_wait(sec_default: float = 0.8) -> None:
+    """ローカル目視用の待ち（demo/debug のみ。PW_DEMO_WAIT で秒数を上書き）"""
+    scale = get_run_profile().demo_wait_sec
+    if scale <= 0:
+        return
+    sec = float(os.getenv("PW_DEMO_WAIT", str(sec_default * scale)) or str(sec_default * scale))
+    if sec > 0:
+        time.sleep(sec)
+
+
+def settle_ms() -> int:
+    return get_run_profile().settle_ms
+
+
+def pause(sec: float) -> None:
+    """見やすさ用の小休止（settle_ms=0 のプロファイルでは待たない）"""
+    if get_run_profile().settle_ms > 0 and sec > 0:
+        time.sleep(sec)
+
+
+def resolve_headless() -> bool:
+    """PW_HEADLESS > プロファイル > CI"""
+    if os.getenv("PW_HEADLESS") is not None:
+        return (os.getenv("PW_HEADLESS") or "").strip().lower() in ("1", "true", "yes", "y", "on")
+    prof = get_run_profile()
+    return prof.headless if prof.headless is not None else _is_ci()
+
+
+def resolve_slow_mo() -> int:
+    """PW_SLOWMO_MS > プロファイル"""
+    v = os.getenv("PW_SLOWMO_MS")
+    return int(v) if v else get_run_profile().slow_mo
+
+
+def apply_context_timeouts(context) -> None:
+    """PW_TIMEOUT_MS / PW_NAV_TIMEOUT_MS > プロファイル"""
+    context.set_default_timeout(int(os.getenv("PW_TIMEOUT_MS") or timeout_ms("default")))
+    context.set_default_navigation_timeout(int(os.getenv("PW_NAV_TIMEOUT_MS") or timeout_ms("nav")))
+
+
+# trace 記録中の context（次シナリオの先読みで開始した trace を、そのシナリオ側で引き継ぐため）
+_TRACING: "weakref.WeakSet" = weakref.WeakSet()
+
+
+def start_tracing(context) -> bool:
+    """
+    プロファイルの tracing 設定で trace を開始（off なら何もしない）。
+    既に start_tracing 済みならそれを引き継いで True
+    """
+    opts = get_run_profile().tracing_options()
+    if opts is None:
+        return False
+    if context in _TRACING:
+        return True
+    try:
+        context.tracing.start(**opts)
+        _TRACING.add(context)
+        return True
+    except Exception:
+        return False
+
+
+def stop_tracing(context, path: Optional[str] = None) -> None:
+    """start_tracing で始めた trace を止めて保存（path が無ければ破棄）"""
+    _TRACING.discard(context)
+    try:
+        context.tracing.stop(path=path)
+    except Exception:
+        pass
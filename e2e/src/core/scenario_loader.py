@@ -6,6 +6,8 @@ from typing import List, Any, Dict
 import yaml
 
 from .types import Scenario
+from .draw_forcing import DEFAULT_RESULT_NAMES, covering_sequences, normalize_result_name
+from .paid_price import PaidPriceTable
 
 
 def load_scenarios(path: str | Path = "scenarios/scenarios.yaml") -> List[Scenario]:
@@ -21,10 +23,46 @@ def load_scenarios(path: str | Path = "scenarios/scenarios.yaml") -> List[Scenar
     for row in raw:
         if not isinstance(row, dict):
             raise ValueError("Each scenario must be a dict")
-        out.append(_to_scenario(row))
+        out.extend(_to_scenario(r) for r in _expand_forced_matrix(row))
     return out
 
 
+def _expand_forced_matrix(d: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    lead_params.forced_results_matrix: cover
+      → 全結果 × 全位置 を網羅する forced_results の並びごとにシナリオを展開する
+        （id は <id>__cover1, <id>__cover2, ...）
+    結果名は lead_params.result_names（既定 結果A/B/C）
+    """
+    params = d.get("lead_params")
+    if not isinstance(params, dict) or params.get("forced_results_matrix") is None:
+        return [d]
+    mode = str(params["forced_results_matrix"]).strip().lower()
+    if mode != "cover":
+        raise ValueError(f"Unknown forced_results_matrix '{mode}': {d.get('id')}")
+    if d.get("draw_count") is None:
+        raise ValueError(f"forced_results_matrix requires draw_count: {d.get('id')}")
+
+    names = [normalize_result_name(x) for x in (params.get("result_names") or DEFAULT_RESULT_NAMES)]
+    out = []
+    for i, seq in enumerate(covering_sequences(names, int(d["draw_count"])), start=1):
+        p = {k: v for k, v in params.items() if k != "forced_results_matrix"}
+        p["forced_results"] = seq
+        out.append({**d, "id": f"{d['id']}__cover{i}", "name": f"{d['name']} [{'/'.join(seq)}]", "lead_params": p})
+    return out
+
+
+def _check_answer_paths(sid: Any, params: Dict[str, Any]) -> None:
+    """診断の answer_paths（all / answers の list）の書き間違いは実行前に落とす"""
+    paths = params["answer_paths"]
+    if paths == "all":
+        if not isinstance(params.get("answer_points"), dict):
+            raise ValueError(f"answer_paths: all requires answer_points: {sid}")
+        return
+    if not isinstance(paths, list) or not all(isinstance(x, dict) for x in paths):
+        raise ValueError(f"answer_paths must be 'all' or a list of answers: {sid}")
+
+
 def _to_scenario(d: Dict[str, Any]) -> Scenario:
     required = ["id", "content_type", "name", "url", "lead_type"]
     for k in required:
@@ -34,6 +72,11 @@ def _to_scenario(d: Dict[str, Any]) -> Scenario:
     lead_params = d.get("lead_params")
     if lead_params is not None and not isinstance(lead_params, dict):
         raise ValueError(f"lead_params must be dict: {d.get('id')}")
+    if lead_params and lead_params.get("paid_price_table") is not None:
+        # 価格表の書き間違いは実行前に落とす
+        PaidPriceTable.from_params(lead_params)
+    if lead_params and lead_params.get("answer_paths") is not None:
+        _check_answer_paths(d.get("id"), lead_params)
 
     return Scenario(
         id=str(d["id"]),
@@ -43,4 +86,5 @@ def _to_scenario(d: Dict[str, Any]) -> Scenario:
         lead_type=str(d["lead_type"]),
         draw_count=int(d["draw_count"]) if d.get("draw_count") is not None else None,
         lead_params=lead_params,
+        quarantine=bool(d.get("quarantine", False)),
     )
@@ -0,0 +1,257 @@
+# e2e/src/core/screen_watcher.py
+"""
+コンテキスト全体の画面状態ウォッチャー
+
+  - context.expose_binding で Python 側の受け口を全ページに生やす
+  - 状態レポーター（init script）が MutationObserver で DOM 変化を見て、
+    画面の種類が変わった瞬間だけ binding 経由で送ってくる
+  - Python 側はページごとの最新状態を持つだけ（ページに問い合わせない）
+  - ✅ 監視するのは watching() の間だけ。init script は context から外せないので、
+    読み込み時に ARMED_BINDING で監視中か聞き、監視中でなければ observer を付けない
+    （抜けるときは開いているページの observer も外す）
+
+LINE ログイン後の戻り先のように「どのタブに・いつ出るか分からない画面」を、
+全タブ × 全判定を回す総当たりではなく、描画された時点で拾うために使う。
+"""
+from __future__ import annotations
+
+import json
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional, Sequence, Tuple
+
+from playwright.sync_api import BrowserContext, Page, TimeoutError as PlaywrightTimeoutError
+
+from src.core import run_profile as RP
+
+BINDING_NAME = "__e2eReportScreen"
+ARMED_BINDING = "__e2eScreenArmed"
+
+# 画面の種類（優先順）
+DRAW_COUNT = "draw_count"              # 一括：抽選回数指定（1〜10）
+SINGLE_START = "single_start"          # 単発：抽選スタートだけ
+PURCHASE_CONFIRM = "purchase_confirm"  # 課金：購入内容の確認
+MEMBER_LOGIN = "member_login"          # 課金：会員ログイン
+NONE = "none"
+
+SCREEN_PRIORITY = (DRAW_COUNT, SINGLE_START, PURCHASE_CONFIRM, MEMBER_LOGIN)
+
+# 判定に使う文言 / セレクタ（line_lead の従来判定と同じ）
+_MARKS = {
+    "drawCountText": "1",
+    "singleStartText": "抽選スタート",
+    "purchaseTitle": "購入内容の確認",
+    "purchaseSelect": "[data-scope='select'] select",
+    "purchaseButton": "ガチャを購入する",
+    "memberTitle": "会員登録済みの方はこちら",
+    "memberEmail": "input[name='email']",
+    "memberPassword": "input[name='password']",
+    "memberButton": "ログイン",
+}
+
+_REPORTER_JS = """
+(() => {
+  if (window.__e2eWatch) return;
+  const M = %s;
+  const binding = %s;
+  const armed = %s;
+
+  const visible = el => !!el && el.getClientRects().length > 0
+    && getComputedStyle(el).visibility !== 'hidden';
+
+  // 見えているテキストノード（前後空白除去）の集合
+  const texts = () => {
+    const out = new Set();
+    const w = document.createTreeWalker(document.body, NodeFilter.SHOW_TEXT);
+    for (let n = w.nextNode(); n; n = w.nextNode()) {
+      const t = (n.nodeValue || '').trim();
+      if (t && t.length <= 40 && visible(n.parentElement)) out.add(t);
+    }
+    return out;
+  };
+  const button = name => Array.from(document.querySelectorAll('button, [role=button]'))
+    .some(b => (b.textContent || '').includes(name) && visible(b));
+
+  const classify = () => {
+    if (!document.body) return 'none';
+    const t = texts();
+    if (t.has(M.drawCountText)) return 'draw_count';
+    if (t.has(M.singleStartText)) return 'single_start';
+    if (t.has(M.purchaseTitle) && document.querySelector(M.purchaseSelect) && button(M.purchaseButton)) {
+      return 'purchase_confirm';
+    }
+    if (t.has(M.memberTitle) && document.querySelector(M.memberEmail)
+        && document.querySelector(M.memberPassword) && button(M.memberButton)) {
+      return 'member_login';
+    }
+    return 'none';
+  };
+
+  let last = null;
+  let pending = false;
+  const report = () => {
+    pending = false;
+    let s = 'none';
+    try { s = classify(); } catch (_) {}
+    if (s === last) return;
+    last = s;
+    try { window[binding](s); } catch (_) {}
+  };
+  // 変化はまとめて1フレームに1回だけ判定する
+  const schedule = () => {
+    if (pending) return;
+    pending = true;
+    (window.requestAnimationFrame || setTimeout)(report);
+  };
+
+  let observer = null;
+  const observe = () => {
+    if (observer) return;
+    observer = new MutationObserver(schedule);
+    observer.observe(document.documentElement, {
+      subtree: true, childList: true, characterData: true,
+      attributes: true, attributeFilter: ['class', 'style', 'hidden', 'aria-hidden'],
+    });
+    last = null;
+    report();
+  };
+  const start = () => {
+    if (document.readyState === 'loading') {
+      document.addEventListener('DOMContentLoaded', observe, { once: true });
+    } else {
+      observe();
+    }
+  };
+  const stop = () => {
+    if (observer) observer.disconnect();
+    observer = null;
+  };
+  window.__e2eWatch = { start, stop };
+
+  // 監視中のときだけ始める（監視外のページには observer を付けない）
+  try {
+    Promise.resolve(window[armed]()).then(on => { if (on) start(); }).catch(() => {});
+  } catch (_) {}
+})();
+""" % (json.dumps(_MARKS, ensure_ascii=False), json.dumps(BINDING_NAME), json.dumps(ARMED_BINDING))
+
+_START_JS = "() => { if (window.__e2eWatch) window.__e2eWatch.start(); }"
+_STOP_JS = "() => { if (window.__e2eWatch) window.__e2eWatch.stop(); }"
+
+
+class ScreenWatcher:
+    """
+    context 内の全ページ（今開いているもの + 以降開くもの）の画面状態を受け取る。
+    受け取るのは watching() の間だけ
+    """
+
+    def __init__(self, context: BrowserContext):
+        self.context = context
+        self.armed = False
+        self.states: "weakref.WeakKeyDictionary[Page, str]" = weakref.WeakKeyDictionary()
+        self.changed_at: "weakref.WeakKeyDictionary[Page, float]" = weakref.WeakKeyDictionary()
+        context.expose_binding(BINDING_NAME, self._on_report)
+        context.expose_binding(ARMED_BINDING, lambda source: self.armed)
+        context.add_init_script(_REPORTER_JS)
+
+    def _each_page(self, js: str) -> None:
+        for p in list(self.context.pages):
+            try:
+                if not p.is_closed() and p.url and p.url != "about:blank":
+                    p.evaluate(js)
+            except Exception:
+                pass
+
+    @contextmanager
+    def watching(self) -> Iterator["ScreenWatcher"]:
+        """
+        この間だけ各ページで画面の変化を監視する（抜けたら observer を外す）。
+        init script は次のドキュメントからなので、今開いているページにも入れて始める
+        """
+        if self.armed:
+            # 入れ子は外側に任せる
+            yield self
+            return
+        self.armed = True
+        self.states.clear()
+        self._each_page(_REPORTER_JS)
+        self._each_page(_START_JS)
+        try:
+            yield self
+        finally:
+            self.armed = False
+            self._each_page(_STOP_JS)
+
+    def _on_report(self, source: Dict, state: str) -> None:
+        if not self.armed:
+            return
+        page = source.get("page")
+        frame = source.get("frame")
+        if page is None or (frame is not None and frame != page.main_frame):
+            return
+        self.states[page] = state
+        self.changed_at[page] = time.time()
+
+    def state_of(self, page: Page) -> str:
+        return self.states.get(page, NONE)
+
+    def _pump(self, ms: int) -> None:
+        """binding の呼び出しを受け取るため、Playwright のイベント処理を回す"""
+        for p in list(self.context.pages):
+            if not p.is_closed():
+                try:
+                    p.wait_for_timeout(ms)
+                    return
+                except Exception:
+                    continue
+        time.sleep(ms / 1000)
+
+    def find(
+        self,
+        screens: Sequence[str] = SCREEN_PRIORITY,
+        exclude: Callable[[Page], bool] | None = None,
+    ) -> Optional[Tuple[Page, str]]:
+        """今わかっている状態から、screens の優先順で最初に当たるページを返す"""
+        pages = [
+            p for p in list(self.context.pages)
+            if not p.is_closed() and not (exclude and exclude(p))
+        ]
+        for screen in screens:
+            for p in pages:
+                if self.states.get(p) == screen:
+                    return p, screen
+        return None
+
+    def wait_for_screen(
+        self,
+        screens: Sequence[str] = SCREEN_PRIORITY,
+        timeout_ms: int | None = None,
+        exclude: Callable[[Page], bool] | None = None,
+    ) -> Tuple[Page, str]:
+        """
+        screens のどれかが描画されるまで待つ。状態はページから push されるので、
+        ここではイベント処理を回して手元の状態を見るだけ（watching() の中で呼ぶ）。
+        """
+        if timeout_ms is None:
+            timeout_ms = RP.timeout_ms("default")
+        end = time.time() + timeout_ms / 1000
+        while True:
+            hit = self.find(screens, exclude)
+            if hit is not None:
+                return hit
+            if time.time() >= end:
+                raise PlaywrightTimeoutError(f"screen not reported: {list(screens)}")
+            self._pump(50)
+
+
+_WATCHERS: "weakref.WeakKeyDictionary[BrowserContext, ScreenWatcher]" = weakref.WeakKeyDictionary()
+
+
+def get_screen_watcher(context: BrowserContext) -> ScreenWatcher:
+    """context ごとに1つ（binding は同じ名前で2回登録できない）"""
+    w = _WATCHERS.get(context)
+    if w is None:
+        w = ScreenWatcher(context)
+        _WATCHERS[context] = w
+    return w
@@ -0,0 +1,115 @@
+# e2e/src/core/state_reset.py
+from __future__ import annotations
+
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+from playwright.sync_api import Page
+
+from src.core.types import Scenario
+
+# HTTPキャッシュは対象外（= 残す）。Storage.clearDataForOrigin の storageTypes
+DEFAULT_STORAGE_TYPES = (
+    "cookies",
+    "local_storage",
+    "indexeddb",
+    "websql",
+    "file_systems",
+    "service_workers",
+    "cache_storage",
+)
+
+# ログインを残したいオリジン（cookie だけ消さない）
+DEFAULT_KEEP_LOGIN_ORIGINS = ("https://access.line.me",)
+
+
+def _truthy(v: str | None) -> bool:
+    return (v or "").strip().lower() in ("1", "true", "yes", "y", "on")
+
+
+def _csv(v: str | None) -> Tuple[str, ...]:
+    return tuple(x.strip() for x in (v or "").split(",") if x.strip())
+
+
+def _origin_of(url: str) -> str:
+    p = urlparse(url)
+    return f"{p.scheme}://{p.netloc}"
+
+
+@dataclass(frozen=True)
+class ResetPolicy:
+    origins: Tuple[str, ...]
+    keep_login_origins: Tuple[str, ...]
+    storage_types: Tuple[str, ...]
+
+
+def reset_policy_for(sc: Scenario) -> Optional[ResetPolicy]:
+    """
+    シナリオ開始前に消すストレージの方針。
+      - lead_params.state_reset: false        → 何もしない
+      - lead_params.state_reset: true / 未指定 → E2E_STATE_RESET=true のときだけ既定値で実行
+      - lead_params.state_reset: {origins, keep_logins, types} → その内容で実行
+
+    既定値:
+      origins     = シナリオURLのオリジン + E2E_RESET_EXTRA_ORIGINS
+      keep_logins = E2E_RESET_KEEP_LOGIN_ORIGINS（未指定なら LINE ログイン）
+    """
+    params = sc.lead_params if isinstance(sc.lead_params, dict) else {}
+    conf: Any = params.get("state_reset")
+
+    if conf is False:
+        return None
+    if conf is None or conf is True:
+        if conf is None and not _truthy(os.getenv("E2E_STATE_RESET")):
+            return None
+        conf = {}
+    if not isinstance(conf, dict):
+        return None
+
+    origins = [_origin_of(sc.url)]
+    origins += list(conf.get("origins") or _csv(os.getenv("E2E_RESET_EXTRA_ORIGINS")))
+
+    keep_env = os.getenv("E2E_RESET_KEEP_LOGIN_ORIGINS")
+    keep = conf.get("keep_logins")
+    if keep is None:
+        keep = _csv(keep_env) if keep_env is not None else DEFAULT_KEEP_LOGIN_ORIGINS
+
+    types = conf.get("types") or DEFAULT_STORAGE_TYPES
+
+    return ResetPolicy(
+        origins=tuple(dict.fromkeys(o.rstrip("/") for o in origins)),
+        keep_login_origins=tuple(o.rstrip("/") for o in keep),
+        storage_types=tuple(types),
+    )
+
+
+def reset_origin_state(page: Page, policy: ResetPolicy) -> Dict[str, Any]:
+    """
+    CDP（Storage.clearDataForOrigin）でオリジン単位にストレージを消す。
+    プロファイル作り直し/ブラウザ再起動なしで、シナリオ間の状態持ち越しを断つ。
+    戻り値: {"elapsed_ms": ..., "cleared": {origin: storageTypes}}
+    """
+    t0 = time.perf_counter()
+    cleared: Dict[str, str] = {}
+
+    cdp = page.context.new_cdp_session(page)
+    try:
+        for origin in policy.origins:
+            types = list(policy.storage_types)
+            if origin in policy.keep_login_origins:
+                types = [t for t in types if t != "cookies"]
+            if not types:
+                continue
+            storage_types = ",".join(types)
+            cdp.send("Storage.clearDataForOrigin", {"origin": origin, "storageTypes": storage_types})
+            cleared[origin] = storage_types
+    finally:
+        try:
+            cdp.detach()
+        except Exception:
+            pass
+
+    return {"elapsed_ms": round((time.perf_counter() - t0) * 1000, 1), "cleared": cleared}
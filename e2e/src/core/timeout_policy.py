@@ -0,0 +1,158 @@
+# e2e/src/core/timeout_policy.py
+from __future__ import annotations
+
+import json
+import math
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+from src.core.env import env_float, env_int, env_truthy
+from src.core.run_history import get_history_dir
+from src.core.run_profile import timeout_ms
+
+# 待ちごとに保持するサンプル数（ms）
+SAMPLE_WINDOW = 200
+
+# 予算のこの割合を超えた待ちは「ギリギリ」として報告する
+NEAR_BUDGET_RATIO = 0.8
+
+# 学習しない段階（ページ遷移は環境の混み具合で桁が変わるので、常にプロファイルの上限）
+FIXED_TIERS = ("nav",)
+
+
+def adaptive_timeouts_enabled() -> bool:
+    return env_truthy("E2E_ADAPTIVE_TIMEOUTS")
+
+
+def _percentile(values: List[float], q: float) -> float:
+    s = sorted(values)
+    if not s:
+        return 0.0
+    k = min(len(s) - 1, max(0, math.ceil(q * len(s)) - 1))
+    return s[k]
+
+
+@dataclass
+class NearMiss:
+    name: str
+    elapsed_ms: float
+    budget_ms: int
+    timed_out: bool
+
+
+class TimeoutPolicy:
+    """
+    名前付きの待ちごとに、記録したレイテンシ分布からタイムアウトを決める。
+      budget = clamp(p99 × factor, floor, ceiling)
+        - ceiling : 実行プロファイルの段階（tier）のタイムアウト
+        - floor   : E2E_TIMEOUT_FLOOR_MS（既定 3000）
+        - factor  : E2E_TIMEOUT_FACTOR（既定 3.0）
+      サンプルが E2E_TIMEOUT_MIN_SAMPLES（既定 20）未満なら ceiling のまま。
+      nav 段階（FIXED_TIERS）は学習しない。
+
+    タイムアウトした待ちも「予算ぶんかかった」として（打ち切りサンプル）記録する。
+    予算がきつすぎると p99 が予算まで上がり、次回は factor 倍に広がる
+    （記録しないと、遅い日に一度きつくなった予算が二度と戻らない）。
+
+    ✅ 壊れたセレクタは学習済みの予算で早く落ちる
+    ✅ 遅い日でも p99 × factor を超えない限り落ちない／超えて落ちた分は次回の予算に入る
+    """
+
+    def __init__(self, path: Path | None = None):
+        self.path = path or (get_history_dir() / "wait_latency.json")
+        self.samples: Dict[str, List[float]] = {}
+        self._new: Dict[str, List[float]] = {}
+        self.near_misses: List[NearMiss] = []
+        self.factor = env_float("E2E_TIMEOUT_FACTOR", 3.0)
+        self.floor_ms = env_int("E2E_TIMEOUT_FLOOR_MS", 3000)
+        self.min_samples = env_int("E2E_TIMEOUT_MIN_SAMPLES", 20)
+        self.enabled = adaptive_timeouts_enabled()
+        self._load()
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        try:
+            raw = json.loads(self.path.read_text(encoding="utf-8"))
+        except Exception:
+            return
+        for name, vals in (raw.get("waits") or {}).items():
+            self.samples[name] = [float(v) for v in vals][-SAMPLE_WINDOW:]
+
+    def save(self) -> None:
+        """
+        他ワーカーの追記を消さないよう、保存直前に読み直してから今回分を足す
+        """
+        if not self._new:
+            return
+        merged: Dict[str, List[float]] = {}
+        if self.path.exists():
+            try:
+                raw = json.loads(self.path.read_text(encoding="utf-8"))
+                merged = {k: list(v) for k, v in (raw.get("waits") or {}).items()}
+            except Exception:
+                merged = {}
+        for name, vals in self._new.items():
+            merged[name] = (merged.get(name, []) + vals)[-SAMPLE_WINDOW:]
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"waits": merged}, ensure_ascii=False, indent=2), encoding="utf-8")
+        tmp.replace(self.path)
+        self.samples = merged
+        self._new.clear()
+
+    def budget(self, name: str, tier: str) -> int:
+        ceiling = timeout_ms(tier)
+        if not self.enabled or tier in FIXED_TIERS:
+            return ceiling
+        vals = self.samples.get(name) or []
+        if len(vals) < self.min_samples:
+            return ceiling
+        learned = int(_percentile(vals, 0.99) * self.factor)
+        return max(min(self.floor_ms, ceiling), min(learned, ceiling))
+
+    def record(self, name: str, elapsed_ms: float, budget_ms: int, timed_out: bool = False) -> None:
+        # タイムアウトは本当の所要時間が分からないので、予算の値で入れる（打ち切りサンプル）
+        v = round(max(elapsed_ms, budget_ms) if timed_out else elapsed_ms, 1)
+        self.samples.setdefault(name, []).append(v)
+        self._new.setdefault(name, []).append(v)
+        if timed_out or elapsed_ms >= budget_ms * NEAR_BUDGET_RATIO:
+            self.near_misses.append(NearMiss(name, round(elapsed_ms, 1), budget_ms, timed_out))
+
+    def write_report(self, path: Path) -> None:
+        path.write_text(
+            json.dumps([asdict(m) for m in self.near_misses], ensure_ascii=False, indent=2),
+            encoding="utf-8",
+        )
+
+
+@lru_cache(maxsize=1)
+def get_timeout_policy() -> TimeoutPolicy:
+    return TimeoutPolicy()
+
+
+@contextmanager
+def timed_wait(name: str, tier: str) -> Iterator[int]:
+    """
+    名前付きの待ち。予算（ms）を渡し、かかった時間を記録する。
+
+        with timed_wait("gacha.card", "screen") as t:
+            card.wait_for(timeout=t)
+
+    例外はそのまま投げ直す。タイムアウトは予算の値で記録し（次回の予算が広がる）報告にも残す。
+    それ以外の例外（待ちと関係ない失敗）は記録しない。
+    """
+    policy = get_timeout_policy()
+    budget = policy.budget(name, tier)
+    t0 = time.perf_counter()
+    try:
+        yield budget
+    except PlaywrightTimeoutError:
+        policy.record(name, (time.perf_counter() - t0) * 1000, budget, timed_out=True)
+        raise
+    policy.record(name, (time.perf_counter() - t0) * 1000, budget)
@@ -14,3 +14,5 @@ class Scenario:
     lead_type: LeadType
     draw_count: Optional[int] = None
     lead_params: Optional[Dict[str, Any]] = None
+    # true なら履歴に関係なく quarantine レーン（非ブロッキング）で実行
+    quarantine: bool = False
@@ -9,3 +9,22 @@ def wait_until_src_changes(locator, prev_src: str, timeout_sec: float = 15.0, in
             return True
         time.sleep(interval_sec)
     return False
+
+
+def wait_for_src_change(page, selector: str, prev_src: str, timeout_ms: int = 15000) -> bool:
+    """
+    ページ内で src の変化を待つ（ポーリング間隔なし。変わった瞬間に返る）
+    """
+    try:
+        page.wait_for_function(
+            """([sel, prev]) => {
+                const el = document.querySelector(sel);
+                const cur = ((el && el.getAttribute('src')) || '').trim();
+                return cur !== '' && cur !== prev;
+            }""",
+            arg=[selector, prev_src],
+            timeout=timeout_ms,
+        )
+        return True
+    except Exception:
+        return False
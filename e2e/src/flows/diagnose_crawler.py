@@ -0,0 +1,403 @@
+# e2e/src/flows/diagnose_crawler.py
+"""
+診断の分岐グラフを幅優先で調べる（branch_expected を手で書かない）
+
+  - 設問画面ごとに 設問文 / 選択肢 / 複数回答か を記録（回答の並びごとに1ノード）
+    --merge 指定時のみ、設問文・選択肢が同じ画面を1ノードにまとめて先を調べない
+    （同じ見た目でも前の回答で結果が変わる診断では枝を取りこぼすので、既定はまとめない）
+  - 次の枝へは最初からやり直さず、戻る で分かれ目まで巻き戻して進む
+    （結果確認前画面からは「回答選択に戻る」。巻き戻せなければ新しい userid で最初から）
+  - たどった回答の並び（プレフィックス）→ 着いた画面 はメモして二度と踏まない
+  - 複数回答の設問は 選択肢1つずつ を枝として調べる（選んだ組み合わせで分岐が変わる診断は対象外）
+  - 結果ボタンは押さない（before_result のリードや結果の消費は起きない）
+
+出力（graph JSON）:
+    {"url", "scenario_id", "root",
+     "nodes": {id: {depth, text, options, multi, prefix, next: {選択肢: ノードid | "end"}}},
+     "stats": {answers, backtracks, restarts, truncated}}
+    "end" は結果確認前画面。設問文は画面のテキストから推定（選択肢・見出し以外で最初のもの）
+
+使い方:
+    python -m src.flows.diagnose_crawler crawl <scenario_id | url> [--out graph.json] [--headed] [--merge]
+      → テストと同じ永続プロファイル（PW_PROFILE_DIR）で開く（LINE 等のログインが要るリードもそのまま通る）
+    python -m src.flows.diagnose_crawler generate graph.json [--split] [--out generated.yaml]
+      → 既定は answer_paths（1セッションで全経路）の1シナリオ、--split で経路ごとのシナリオ
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import yaml
+from playwright.sync_api import Page
+
+from src.core import run_profile as RP
+from src.core.artifacts import Artifacts
+from src.core.dom_snapshot import dom_snapshot
+from src.core.env import env_int
+from src.core.timeout_policy import timed_wait
+from src.core.types import Scenario
+from src.core.url import with_random_userid
+from src.flows.diagnose_flow import clear_checked, question_text, select_answer_single, wait_top
+from src.leads.lead_router import apply_lead
+from src.selectors import diagnose_selectors as D
+
+END = "end"
+
+# 1回の crawl で押す回答の上限（超えたら打ち切って途中までのグラフを出す）
+DEFAULT_MAX_ANSWERS = 500
+
+
+@dataclass
+class QuestionNode:
+    id: str
+    depth: int                       # 設問番号（1始まり）
+    text: str
+    options: List[str]
+    multi: bool
+    prefix: List[str]                # 最初に着いたときの回答の並び
+    next: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def signature(self) -> Tuple[Any, ...]:
+        return (self.depth, self.text, tuple(self.options), self.multi)
+
+
+@dataclass
+class BranchGraph:
+    url: str
+    scenario_id: Optional[str] = None
+    root: Optional[str] = None
+    nodes: Dict[str, QuestionNode] = field(default_factory=dict)
+    stats: Dict[str, int] = field(
+        default_factory=lambda: {"answers": 0, "backtracks": 0, "restarts": 0, "truncated": 0}
+    )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "scenario_id": self.scenario_id,
+            "root": self.root,
+            "nodes": {k: {kk: vv for kk, vv in asdict(n).items() if kk != "id"} for k, n in self.nodes.items()},
+            "stats": self.stats,
+        }
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "BranchGraph":
+        g = cls(url=d["url"], scenario_id=d.get("scenario_id"), root=d.get("root"))
+        g.nodes = {k: QuestionNode(id=k, **v) for k, v in (d.get("nodes") or {}).items()}
+        g.stats.update(d.get("stats") or {})
+        return g
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.to_dict(), ensure_ascii=False, indent=2), encoding="utf-8")
+
+    @classmethod
+    def load(cls, path: Path) -> "BranchGraph":
+        return cls.from_dict(json.loads(Path(path).read_text(encoding="utf-8")))
+
+    def paths(self) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """root から end までの全経路 → (answers, branch_expected)"""
+        out: List[Tuple[Dict[str, Any], Dict[str, Any]]] = []
+        if self.root is None:
+            return out
+        stack: List[Tuple[str, Dict[str, Any], Dict[str, Any]]] = [(self.root, {}, {})]
+        while stack:
+            nid, answers, branch = stack.pop()
+            node = self.nodes[nid]
+            key = f"q{node.depth}"
+            branch = dict(branch)
+            if node.text:
+                branch[f"{key}_text"] = node.text
+            if node.multi:
+                branch[f"{key}_multi"] = True
+            for o, to in reversed(list(node.next.items())):
+                a = {**answers, key: [o] if node.multi else o}
+                if to == END:
+                    out.append((a, branch))
+                elif to in self.nodes and self.nodes[to].depth > node.depth:
+                    stack.append((to, a, branch))
+        return out
+
+
+class DiagnoseCrawler:
+    """
+    1つのページで分岐グラフを幅優先にたどる（crawl() が BranchGraph を返す）
+    """
+
+    def __init__(
+        self,
+        sc: Scenario,
+        page: Page,
+        artifacts: Artifacts,
+        max_answers: int | None = None,
+        merge: bool = False,
+    ):
+        self.sc = sc
+        self.page = page
+        self.artifacts = artifacts
+        self.max_answers = max_answers or env_int("E2E_CRAWL_MAX_ANSWERS", DEFAULT_MAX_ANSWERS)
+        self.graph = BranchGraph(url=sc.url, scenario_id=sc.id)
+        self.memo: Dict[Tuple[str, ...], str] = {}        # 回答の並び → 着いたノードid / END
+        self.merge = merge
+        self._by_sig: Dict[Tuple[Any, ...], str] = {}    # merge=True のときだけ使う
+        self.pos: Optional[Tuple[str, ...]] = None        # 今いる画面の回答の並び（None = 不明）
+
+    # ---------------- 全体 ----------------
+    def crawl(self) -> BranchGraph:
+        self._restart()
+        root, _ = self._observe(())
+        self.graph.root = root
+        queue = deque([()])
+        while queue:
+            prefix = queue.popleft()
+            node = self.graph.nodes[self.memo[prefix]]
+            for o in node.options:
+                child = prefix + (o,)
+                if child in self.memo:
+                    continue
+                if self.graph.stats["answers"] >= self.max_answers:
+                    self.graph.stats["truncated"] = 1
+                    return self.graph
+                self._goto(prefix)
+                to, is_new = self._answer(node, o)
+                node.next[o] = to
+                if is_new:
+                    queue.append(child)
+        return self.graph
+
+    # ---------------- 画面 ----------------
+    def _observe(self, prefix: Tuple[str, ...]) -> Tuple[str, bool]:
+        """今の設問画面を読んでノードにする（merge=True なら同じ設問は既存のノード）。(id, 新規か)"""
+        snap = dom_snapshot(self.page, [D.ANSWER_LABEL_P_SELECTOR])
+        options = list(dict.fromkeys(e.text for e in snap.query(D.ANSWER_LABEL_P_SELECTOR) if e.visible and e.text))
+        multi = snap.has_text(D.MULTI_LABEL_TEXT, exact=True)
+        depth = len(prefix) + 1
+        text = question_text(snap, depth)
+        node = QuestionNode(
+            id=f"n{len(self.graph.nodes) + 1}", depth=depth, text=text,
+            options=options, multi=multi, prefix=list(prefix),
+        )
+        known = self._by_sig.get(node.signature) if self.merge else None
+        if known is not None:
+            self.memo[prefix] = known
+            return known, False
+        if not options:
+            self.artifacts.save_debug(self.page, f"diagnose_crawl_q{depth}_no_options")
+            raise RuntimeError(f"no options on question {depth}: {list(prefix)}")
+        self.graph.nodes[node.id] = node
+        self._by_sig[node.signature] = node.id
+        self.memo[prefix] = node.id
+        return node.id, True
+
+    def _wait_next(self, q_no: int) -> str:
+        """回答後に 次の設問（q_no + 1）か 結果確認前画面 が出るまで待つ"""
+        confirm = self.page.get_by_text(D.RESULT_CONFIRM_TEXT, exact=False)
+        with timed_wait("diagnose.crawl_next", "action") as t:
+            confirm.or_(self.page.get_by_text(str(q_no + 1), exact=True)).first.wait_for(timeout=t)
+        return END if confirm.count() > 0 else "question"
+
+    def _answer(self, node: QuestionNode, option: str) -> Tuple[str, bool]:
+        """node の設問で option を選び、着いた先を返す。(ノードid | END, 新規ノードか)"""
+        # 巻き戻した画面には前の選択が残っている（単一回答も同じ選択肢を押すと外れる）
+        clear_checked(self.page)
+        if not select_answer_single(self.page, self.artifacts, option):
+            raise RuntimeError(f"answer not selectable: q{node.depth} {option}")
+        if node.multi:
+            self.page.get_by_text(D.NEXT_BTN_TEXT, exact=True).click(timeout=RP.timeout_ms("action"))
+        self.graph.stats["answers"] += 1
+
+        child = (self.pos or ()) + (option,)
+        self.pos = child
+        if self._wait_next(node.depth) == END:
+            self.memo[child] = END
+            return END, False
+        return self._observe(child)
+
+    # ---------------- 移動 ----------------
+    def _goto(self, prefix: Tuple[str, ...]) -> None:
+        """prefix の設問画面へ。戻れるところまで戻って、残りは回答し直す"""
+        if self.pos == prefix:
+            return
+        cur = self.pos or ()
+        common = 0
+        while common < min(len(cur), len(prefix)) and cur[common] == prefix[common]:
+            common += 1
+        if not self._rewind(cur, common):
+            self._restart()
+            common = 0
+        for i in range(common, len(prefix)):
+            node = self.graph.nodes[self.memo[prefix[:i]]]
+            self.pos = prefix[:i]
+            self._answer(node, prefix[i])
+        self.pos = prefix
+
+    def _rewind(self, cur: Tuple[str, ...], depth: int) -> bool:
+        """cur の画面から depth 問回答済みの設問画面（= depth+1 問目）まで戻る"""
+        try:
+            steps = len(cur) - depth
+            if self.memo.get(cur) == END:
+                # 結果確認前画面 →「回答選択に戻る」で最後の設問（1つ戻ったのと同じ）
+                with timed_wait("diagnose.rewind", "nav") as t:
+                    self.page.get_by_text(D.BACK_TO_ANS_TEXT, exact=True).click(timeout=t)
+                steps -= 1
+            for _ in range(steps):
+                with timed_wait("diagnose.rewind", "nav") as t:
+                    self.page.go_back(wait_until="domcontentloaded", timeout=t)
+                self.graph.stats["backtracks"] += 1
+            with timed_wait("diagnose.question", "action") as t:
+                self.page.get_by_text(D.QUESTION_LABEL_TEXT, exact=True).wait_for(timeout=t)
+                self.page.get_by_text(str(depth + 1), exact=True).wait_for(timeout=t)
+        except Exception:
+            return False
+        self.pos = cur[:depth]
+        return True
+
+    def _restart(self) -> None:
+        """新しい userid でトップから Q1 まで（最初の1回は restarts に数えない）"""
+        if self.pos is not None:
+            self.graph.stats["restarts"] += 1
+        with timed_wait("diagnose.goto", "nav") as t:
+            self.page.goto(with_random_userid(self.sc.url), wait_until="domcontentloaded", timeout=t)
+        if not wait_top(self.page, self.artifacts):
+            raise RuntimeError("diagnose top not opened")
+        self.page.get_by_text(D.START_BTN_TEXT, exact=True).click()
+        self.page = apply_lead(self.sc, self.page, self.artifacts, phase="before_start")
+        with timed_wait("diagnose.question", "action") as t:
+            self.page.get_by_text(D.QUESTION_LABEL_TEXT, exact=True).wait_for(timeout=t)
+        self.pos = ()
+
+
+# ---------------- シナリオ生成 ----------------
+def generate_scenarios(graph: BranchGraph, base: Dict[str, Any] | None = None, split: bool = False) -> List[Dict[str, Any]]:
+    """
+    グラフの全経路からシナリオを作る。base は元シナリオ（url / lead_type / lead_params を引き継ぐ）
+      - 既定   : answer_paths に全経路を入れた1シナリオ（1セッションで回す）
+      - split : 経路ごとに answers + branch_expected のシナリオ
+    """
+    base = dict(base or {})
+    base_id = base.get("id") or graph.scenario_id or "diagnose_crawled"
+    base.setdefault("content_type", "diagnose")
+    base.setdefault("name", base_id)
+    base.setdefault("url", graph.url)
+    base.setdefault("lead_type", "none")
+    params = {
+        k: v for k, v in (base.get("lead_params") or {}).items()
+        if k not in ("answers", "branch_expected", "answer_paths")
+    }
+
+    paths = graph.paths()
+    if not split:
+        return [{
+            **base,
+            "id": f"{base_id}__crawled",
+            "name": f"{base['name']} [全{len(paths)}経路]",
+            "lead_params": {
+                **params,
+                "answer_paths": [{"answers": a, "branch_expected": b} for a, b in paths],
+            },
+        }]
+    return [
+        {
+            **base,
+            "id": f"{base_id}__path{i}",
+            "name": f"{base['name']} [{' → '.join(str(v) for v in a.values())}]",
+            "lead_params": {**params, "answers": a, "branch_expected": b},
+        }
+        for i, (a, b) in enumerate(paths, start=1)
+    ]
+
+
+def _scenario_for(target: str) -> Scenario:
+    if target.startswith("http"):
+        return Scenario(id="diagnose_crawl", content_type="diagnose", name=target, url=target, lead_type="none")
+    from src.core.scenario_loader import load_scenarios
+
+    for sc in load_scenarios():
+        if sc.id == target:
+            return sc
+    raise SystemExit(f"scenario not found: {target}")
+
+
+def _base_dict(sc: Scenario) -> Dict[str, Any]:
+    d = {k: v for k, v in asdict(sc).items() if v is not None}
+    d.pop("quarantine", None)
+    return d
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description="croissant e2e: 診断の分岐グラフ")
+    sub = ap.add_subparsers(dest="command", required=True)
+    c = sub.add_parser("crawl", help="分岐グラフを調べて JSON に保存")
+    c.add_argument("target", help="scenarios.yaml のシナリオ id、または診断の URL（リードなし）")
+    c.add_argument("--out", help="出力先（既定: ARTIFACT_DIR/diagnose_graph_<id>.json）")
+    c.add_argument("--headed", action="store_true")
+    c.add_argument("--merge", action="store_true", help="設問文・選択肢が同じ画面を1ノードにまとめる")
+    g = sub.add_parser("generate", help="グラフ JSON からシナリオ YAML を作る")
+    g.add_argument("graph")
+    g.add_argument("--split", action="store_true", help="経路ごとに1シナリオ")
+    g.add_argument("--out", help="出力先（既定: 標準出力）")
+    ns = ap.parse_args(argv)
+
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+    if ns.command == "generate":
+        graph = BranchGraph.load(Path(ns.graph))
+        base = None
+        if graph.scenario_id:
+            try:
+                base = _base_dict(_scenario_for(graph.scenario_id))
+            except SystemExit:
+                base = None
+        text = yaml.safe_dump(
+            generate_scenarios(graph, base, split=ns.split), allow_unicode=True, sort_keys=False
+        )
+        if ns.out:
+            Path(ns.out).write_text(text, encoding="utf-8")
+        else:
+            sys.stdout.write(text)
+        return 0
+
+    from playwright.sync_api import sync_playwright
+
+    sc = _scenario_for(ns.target)
+    base_dir = Path(os.getenv("ARTIFACT_DIR", "artifacts"))
+    out = Path(ns.out) if ns.out else base_dir / f"diagnose_graph_{sc.id}.json"
+    # ログイン状態（LINE 等）はテストと同じ永続プロファイルから使う
+    profile_dir = Path(os.path.expanduser(os.getenv("PW_PROFILE_DIR", "~/playwright-profile")))
+    profile_dir.mkdir(parents=True, exist_ok=True)
+    with sync_playwright() as p:
+        kwargs: Dict[str, Any] = {"user_data_dir": str(profile_dir), "headless": not ns.headed}
+        if os.getenv("PW_CHANNEL"):
+            kwargs["channel"] = os.getenv("PW_CHANNEL")
+        ctx = p.chromium.launch_persistent_context(**kwargs)
+        RP.apply_context_timeouts(ctx)
+        crawler = DiagnoseCrawler(
+            sc, ctx.new_page(), Artifacts(base_dir=base_dir, scenario_id=f"crawl_{sc.id}"), merge=ns.merge,
+        )
+        try:
+            crawler.crawl()
+        finally:
+            # 途中で落ちてもそこまでのグラフは残す
+            crawler.graph.save(out)
+            ctx.close()
+    st = crawler.graph.stats
+    print(
+        f"{out}: {len(crawler.graph.nodes)} questions / {len(crawler.graph.paths())} paths "
+        f"(answers={st['answers']} backtracks={st['backtracks']} restarts={st['restarts']}"
+        f"{' truncated' if st['truncated'] else ''})"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
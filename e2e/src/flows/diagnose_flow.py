@@ -1,11 +1,18 @@
 # e2e/src/flows/diagnose_flow.py
 from __future__ import annotations
-from typing import Dict, Any, List
+import json
+from typing import Dict, Any, List, Tuple
 from playwright.sync_api import Page, TimeoutError as PlaywrightTimeoutError
 
 from src.core.types import Scenario
 from src.core.artifacts import Artifacts
 from src.core.url import with_random_userid
+from src.core import run_profile as RP
+from src.core.timeout_policy import timed_wait
+from src.core.dom_snapshot import DomSnapshot, dom_snapshot
+from src.core.checkpoints import CheckpointRecorder
+from src.flows.prefix_tree import PrefixState, fork_url
+from src.flows.diagnose_scoring import natural_key, scoring_engine_for
 from src.leads.lead_router import apply_lead
 
 from src.selectors import diagnose_selectors as D
@@ -17,38 +24,71 @@ from src.flows.gacha_flow import (
     _assert_links_open_new_tab,
     _assert_use_flow_all_results,
     _assert_play_again_policy,
+    _assert_result_assets,
+    ck_begin,
+    ck_commit,
+    ck_done,
+    resume_from_checkpoint,
 )
 from src.selectors import gacha_selectors as GS
 
 
+DIAGNOSE_STEPS = ["start", "lead", "answers", "details", "links", "use_flow", "play_again"]
+
+
 def _get_params(sc: Scenario) -> Dict[str, Any]:
     return sc.lead_params if isinstance(sc.lead_params, dict) else {}
 
 
-def _wait_top(page: Page, artifacts: Artifacts) -> bool:
+def wait_top(page: Page, artifacts: Artifacts) -> bool:
+    """トップ（開始ボタン）が出るまで待つ"""
     try:
-        page.get_by_text(D.START_BTN_TEXT, exact=True).wait_for(timeout=20000)
+        with timed_wait("diagnose.top", "action") as t:
+            page.get_by_text(D.START_BTN_TEXT, exact=True).wait_for(timeout=t)
         return True
     except Exception:
         artifacts.save_debug(page, "diagnose_top_not_opened")
         return False
 
 
-def _assert_question_common(page: Page, artifacts: Artifacts, q_no: int) -> bool:
+def _assert_question_common(page: Page, artifacts: Artifacts, q_no: int) -> DomSnapshot | None:
+    """
+    設問画面の共通チェック。OK なら設問画面のスナップショットを返す（分岐チェック等で使い回す）
+    """
     try:
-        page.get_by_text(D.QUESTION_LABEL_TEXT, exact=True).wait_for(timeout=20000)
-        page.get_by_text(str(q_no), exact=True).wait_for(timeout=20000)
-        # 画像
-        if page.locator(D.QUESTION_IMAGE_SELECTOR).count() < 1:
-            artifacts.save_debug(page, f"diagnose_q{q_no}_image_missing")
-            return False
-        return True
+        with timed_wait("diagnose.question", "action") as t:
+            page.get_by_text(D.QUESTION_LABEL_TEXT, exact=True).wait_for(timeout=t)
+            page.get_by_text(str(q_no), exact=True).wait_for(timeout=t)
+        snap = dom_snapshot(page, [D.QUESTION_IMAGE_SELECTOR, D.ANSWER_LABEL_P_SELECTOR])
     except Exception:
         artifacts.save_debug(page, f"diagnose_q{q_no}_header_missing")
-        return False
+        return None
+    # 画像
+    if snap.count(D.QUESTION_IMAGE_SELECTOR) < 1:
+        artifacts.save_debug(page, f"diagnose_q{q_no}_image_missing")
+        return None
+    return snap
 
 
-def _select_answer_single(page: Page, artifacts: Artifacts, answer_text: str) -> bool:
+def question_text(snap: DomSnapshot, q_no: int) -> str:
+    """
+    設問文（選択肢・見出し以外で最初に見えているテキスト）。
+    snap は ANSWER_LABEL_P_SELECTOR 込みで撮ったもの
+    """
+    options = [e.text for e in snap.query(D.ANSWER_LABEL_P_SELECTOR) if e.visible and e.text]
+    skip = {D.QUESTION_LABEL_TEXT, D.MULTI_LABEL_TEXT, D.NEXT_BTN_TEXT, str(q_no), *options}
+    return next(
+        (
+            e.text for e in snap.texts
+            if e.visible and e.text not in skip and not e.text.isdigit()
+            and D.QUESTION_LABEL_TEXT not in e.text
+            and sum(o in e.text for o in options) < 2     # 選択肢をまとめた枠は除く
+        ),
+        "",
+    )
+
+
+def select_answer_single(page: Page, artifacts: Artifacts, answer_text: str) -> bool:
     """
     単一回答：ラベル内のテキストで選択（checkboxでもOK）
     """
@@ -58,7 +98,7 @@ def _select_answer_single(page: Page, artifacts: Artifacts, answer_text: str) ->
         if loc.count() < 1:
             artifacts.save_debug(page, f"diagnose_single_answer_not_found_{answer_text}")
             return False
-        loc.first.click(timeout=20000)
+        loc.first.click(timeout=RP.timeout_ms("action"))
         return True
     except Exception:
         artifacts.save_debug(page, f"diagnose_single_answer_click_failed_{answer_text}")
@@ -67,43 +107,41 @@ def _select_answer_single(page: Page, artifacts: Artifacts, answer_text: str) ->
 
 def _select_answer_multi(page: Page, artifacts: Artifacts, answers: List[str]) -> bool:
     for a in answers:
-        if not _select_answer_single(page, artifacts, a):
+        if not select_answer_single(page, artifacts, a):
             return False
     return True
 
 
 def _assert_multi_ui(page: Page, artifacts: Artifacts) -> bool:
     try:
-        page.get_by_text(D.MULTI_LABEL_TEXT, exact=True).wait_for(timeout=20000)
-        page.get_by_text(D.NEXT_BTN_TEXT, exact=True).wait_for(timeout=20000)
+        page.get_by_text(D.MULTI_LABEL_TEXT, exact=True).wait_for(timeout=RP.timeout_ms("action"))
+        page.get_by_text(D.NEXT_BTN_TEXT, exact=True).wait_for(timeout=RP.timeout_ms("action"))
         return True
     except Exception:
         artifacts.save_debug(page, "diagnose_multi_ui_missing")
         return False
 
 
-def _assert_branch(page: Page, artifacts: Artifacts, branch_expected: Dict[str, Any], step: str) -> bool:
+def _assert_branch(
+    page: Page, artifacts: Artifacts, snap: DomSnapshot, branch_expected: Dict[str, Any], step: str
+) -> bool:
     """
     branch_expected:
-      q2_text, q3_text, q3_multi
+      q2_text, q3_text, q3_multi（q<n>_text / q<n>_multi なら何問目でも）
+    snap: その設問画面のスナップショット（_assert_question_common の戻り値）
     """
     if not branch_expected:
         return True
 
     try:
-        if step == "q2" and branch_expected.get("q2_text"):
-            if page.get_by_text(branch_expected["q2_text"], exact=False).count() < 1:
-                artifacts.save_debug(page, "diagnose_branch_q2_mismatch")
-                return False
-
-        if step == "q3" and branch_expected.get("q3_text"):
-            if page.get_by_text(branch_expected["q3_text"], exact=False).count() < 1:
-                artifacts.save_debug(page, "diagnose_branch_q3_mismatch")
-                return False
+        text = branch_expected.get(f"{step}_text")
+        if text and not snap.has_text(text):
+            artifacts.save_debug(page, f"diagnose_branch_{step}_mismatch")
+            return False
 
-        if step == "q3" and branch_expected.get("q3_multi") is True:
-            if page.get_by_text(D.MULTI_LABEL_TEXT, exact=True).count() < 1:
-                artifacts.save_debug(page, "diagnose_branch_q3_should_be_multi")
+        if branch_expected.get(f"{step}_multi") is True:
+            if not snap.has_text(D.MULTI_LABEL_TEXT, exact=True):
+                artifacts.save_debug(page, f"diagnose_branch_{step}_should_be_multi")
                 return False
 
         return True
@@ -112,259 +150,383 @@ def _assert_branch(page: Page, artifacts: Artifacts, branch_expected: Dict[str,
         return False
 
 
-def _calc_total_points(params: Dict[str, Any]) -> int | None:
-    """
-    answer_points が入っている時だけ合計点を計算する。
-    入ってないなら None を返す（結果名の固定検証だけにする）
-    """
-    ap = params.get("answer_points")
-    ans = params.get("answers")
-    if not isinstance(ap, dict) or not isinstance(ans, dict):
-        return None
-
-    total = 0
+def _question_already_shown(page: Page, timeout_ms: int | None = None) -> bool:
+    """共有プレフィックスから分岐したとき、リードを通過済みで Q1 が出ているか"""
+    if timeout_ms is None:
+        timeout_ms = RP.timeout_ms("brief")
+    try:
+        page.get_by_text(D.QUESTION_LABEL_TEXT, exact=True).wait_for(timeout=timeout_ms)
+        return True
+    except Exception:
+        return False
 
-    # q1
-    q1 = ans.get("q1")
-    if isinstance(q1, str):
-        total += int(ap.get("q1", {}).get(q1, 0) or 0)
 
-    # q2
-    q2 = ans.get("q2")
-    if isinstance(q2, str):
-        total += int(ap.get("q2", {}).get(q2, 0) or 0)
+def _question_keys(answers: Dict[str, Any]) -> List[str]:
+    return sorted(answers, key=natural_key)
 
-    # q3
-    q3 = ans.get("q3")
-    if isinstance(q3, list):
-        for x in q3:
-            total += int(ap.get("q3", {}).get(x, 0) or 0)
-    elif isinstance(q3, str):
-        total += int(ap.get("q3", {}).get(q3, 0) or 0)
 
-    return total
+def clear_checked(page: Page) -> None:
+    """
+    巻き戻した設問に残っている選択を外す。
+    単一回答も、前と同じ選択肢を押すと外れてしまうので選ぶ前に外す
+    """
+    checked = page.locator("label:has(input:checked)")
+    for _ in range(checked.count()):
+        checked.first.click(timeout=RP.timeout_ms("action"))
 
 
-def _axis_expected_result(params: Dict[str, Any], total_points: int) -> str | None:
-    th = params.get("axis_thresholds")
-    if not isinstance(th, dict):
-        return None
+def _wait_result_confirm(page: Page, artifacts: Artifacts) -> bool:
+    try:
+        with timed_wait("diagnose.result_confirm", "element") as t:
+            page.get_by_text(D.RESULT_CONFIRM_TEXT, exact=False).wait_for(timeout=t)
+            page.get_by_text(D.RESULT_BTN_TEXT, exact=True).wait_for(timeout=t)
+            page.get_by_text(D.BACK_TO_ANS_TEXT, exact=True).wait_for(timeout=t)
+        return True
+    except Exception:
+        artifacts.save_debug(page, "diagnose_result_confirm_screen_missing")
+        return False
 
-    # 例: A:[0,5], B:[5,11], C:[12,999]
-    for name, rng in th.items():
-        if not isinstance(rng, list) or len(rng) != 2:
-            continue
-        lo, hi = int(rng[0]), int(rng[1])
-        if lo <= total_points <= hi:
-            return f"結果{name}"
-    return None
 
-def _calc_additive_points(params: Dict[str, Any]) -> Dict[str, int] | None:
+def _answer_from(
+    page: Page,
+    artifacts: Artifacts,
+    answers: Dict[str, Any],
+    start: int,
+    branch_expected: Dict[str, Any],
+    snap: DomSnapshot | None = None,
+    seen: Dict[int, str] | None = None,
+) -> bool:
     """
-    answer_points が {A:...,B:...,C:...} の辞書を返す形のとき、
-    A/B/C の合計点を作る。
+    start 番目（0始まり）の設問から最後まで回答し、結果確認前画面まで進める。
+    answers の値が list の設問は複数回答。snap は start の設問画面を撮り済みなら渡す。
+    seen を渡すと 設問番号 → 設問文 を記録する（巻き戻し先が同じ設問かの確認用）
     """
-    ap = params.get("answer_points")
-    ans = params.get("answers")
-    if not isinstance(ap, dict) or not isinstance(ans, dict):
-        return None
+    answers = answers or {}
+    keys = _question_keys(answers)
+    if not keys:
+        artifacts.save_debug(page, "diagnose_answers_q1_missing")
+        return False
+    for i in range(start, len(keys)):
+        key = keys[i]
+        if snap is None:
+            snap = _assert_question_common(page, artifacts, q_no=i + 1)
+            if snap is None:
+                return False
+        if not _assert_branch(page, artifacts, snap, branch_expected, step=key):
+            return False
+        if seen is not None:
+            seen[i + 1] = question_text(snap, i + 1)
+        snap = None
+
+        a = answers.get(key)
+        if isinstance(a, list):
+            # 複数回答
+            if not _assert_multi_ui(page, artifacts):
+                return False
+            clear_checked(page)
+            if not _select_answer_multi(page, artifacts, a):
+                return False
+            page.get_by_text(D.NEXT_BTN_TEXT, exact=True).click()
+        elif isinstance(a, str):
+            # 単一回答
+            clear_checked(page)
+            if not select_answer_single(page, artifacts, a):
+                return False
+        else:
+            artifacts.save_debug(page, f"diagnose_answers_{key}_missing")
+            return False
+
+    if seen is not None:
+        # この経路より先の設問は別経路のものなので残さない
+        for q in [q for q in seen if q > len(keys)]:
+            del seen[q]
 
-    total = {"A": 0, "B": 0, "C": 0}
-
-    def add_from(qkey: str, picked: str) -> None:
-        nonlocal total
-        m = ap.get(qkey, {})  # q1/q2/q3
-        rule = m.get(picked)
-        if not isinstance(rule, dict):
-            return
-        total["A"] += int(rule.get("A", 0) or 0)
-        total["B"] += int(rule.get("B", 0) or 0)
-        total["C"] += int(rule.get("C", 0) or 0)
-
-    # q1
-    q1 = ans.get("q1")
-    if isinstance(q1, str):
-        add_from("q1", q1)
-
-    # q2
-    q2 = ans.get("q2")
-    if isinstance(q2, str):
-        add_from("q2", q2)
-
-    # q3（複数）
-    q3 = ans.get("q3")
-    if isinstance(q3, list):
-        for x in q3:
-            if isinstance(x, str):
-                add_from("q3", x)
-    elif isinstance(q3, str):
-        add_from("q3", q3)
-
-    return total
-
-def _pick_additive_result(params: Dict[str, Any], total: Dict[str, int]) -> str:
+    # 結果確認前画面
+    return _wait_result_confirm(page, artifacts)
+
+
+def _answer_until_result(
+    sc: Scenario,
+    page: Page,
+    artifacts: Artifacts,
+    params: Dict[str, Any],
+    ckpt: CheckpointRecorder | None = None,
+    prefix: PrefixState | None = None,
+    start_url: str | None = None,
+    seen: Dict[int, str] | None = None,
+) -> Page | None:
     """
-    total={"A":..,"B":..,"C":..} から最大を選び、"結果A" などに変換する。
-    同点があれば tie_breaker の順で決める（無ければ A→B→C）。
+    トップ → Q1〜Q3 回答 → 結果確認前画面 → 「診断結果を確認する」押下まで。
+    失敗時は None（artifacts は保存済み）。seen は _answer_from と同じ
     """
-    tie = params.get("tie_breaker")
-    order = tie if isinstance(tie, list) and tie else ["A", "B", "C"]
 
-    maxv = max(total.values())
-    candidates = [k for k, v in total.items() if v == maxv]
-
-    for k in order:
-        if k in candidates:
-            return f"結果{k}"
-
-    # ここには基本来ないが保険
-    return f"結果{candidates[0]}"
-
-
-def run_diagnose(sc: Scenario, page: Page, artifacts: Artifacts) -> bool:
-    params = _get_params(sc)
-
-    # ✅ ① userid をランダム付与してアクセス
-    url = with_random_userid(sc.url)
-    page.goto(url, wait_until="domcontentloaded", timeout=45000)
+    # ✅ ① userid をランダム付与してアクセス（共有プレフィックスがあればそのURLから）
+    if start_url is not None:
+        # 前のシナリオ実行中に先読み済み（goto 不要）
+        url = start_url
+    else:
+        url = with_random_userid(fork_url(prefix.url, sc) if prefix is not None else sc.url)
+        with timed_wait("diagnose.goto", "nav") as t:
+            page.goto(url, wait_until="domcontentloaded", timeout=t)
 
     # トップ
-    if not _wait_top(page, artifacts):
-        return False
+    if not wait_top(page, artifacts):
+        return None
 
     # ✅ ② 診断を始める
     page.get_by_text(D.START_BTN_TEXT, exact=True).click()
 
     # ✅ lead timing: before_start の場合ここでリードが出る
-    page = apply_lead(sc, page, artifacts, phase="before_start")
+    if prefix is None or not _question_already_shown(page):
+        page = apply_lead(sc, page, artifacts, phase="before_start")
+    ck_commit(ckpt, "lead", page, url=url)
+    ck_begin(ckpt, "answers")
 
     # Q1表示
-    if not _assert_question_common(page, artifacts, q_no=1):
-        return False
-    if page.get_by_text("Q1", exact=False).count() < 1:
+    snap = _assert_question_common(page, artifacts, q_no=1)
+    if snap is None:
+        return None
+    if not snap.has_text("Q1"):
         artifacts.save_debug(page, "diagnose_q1_text_missing")
-        return False
+        return None
 
-    answers = params.get("answers", {})
-    branch_expected = params.get("branch_expected", {})
+    # ✅ ③ Q1 → 最後の設問 → 結果確認前画面
+    if not _answer_from(page, artifacts, params.get("answers", {}), 0, params.get("branch_expected", {}), snap=snap, seen=seen):
+        return None
 
-    # ✅ ③ Q1
-    q1 = answers.get("q1")
-    if not isinstance(q1, str):
-        artifacts.save_debug(page, "diagnose_answers_q1_missing")
-        return False
-    if not _select_answer_single(page, artifacts, q1):
-        return False
+    # ✅ lead timing: before_result の場合ここでリードが出る（結果ボタン押下時）
+    # 先にボタン押下 → 直後に apply_lead で吸収、の順にする
+    page.get_by_text(D.RESULT_BTN_TEXT, exact=True).click()
+    page = apply_lead(sc, page, artifacts, phase="before_result")
 
-    # Q2
-    if not _assert_question_common(page, artifacts, q_no=2):
-        return False
-    if not _assert_branch(page, artifacts, branch_expected, step="q2"):
-        return False
+    return page
 
-    q2 = answers.get("q2")
-    if not isinstance(q2, str):
-        artifacts.save_debug(page, "diagnose_answers_q2_missing")
-        return False
-    if not _select_answer_single(page, artifacts, q2):
-        return False
 
-    # Q3
-    if not _assert_question_common(page, artifacts, q_no=3):
-        return False
-    if not _assert_branch(page, artifacts, branch_expected, step="q3"):
-        return False
+def _verify_expected_result(page: Page, artifacts: Artifacts, params: Dict[str, Any], details: List[Dict[str, Any]]) -> bool:
+    # ✅ ポイント検証（可能な場合）：期待結果は全パターンを先に計算した表から引く
+    if not isinstance(params.get("answers"), dict):
+        return True
+    engine = scoring_engine_for(params)
+    if engine is None:
+        return True
 
-    q3 = answers.get("q3")
-    if isinstance(q3, list):
-        # 複数回答
-        if not _assert_multi_ui(page, artifacts):
-            return False
-        if not _select_answer_multi(page, artifacts, q3):
-            return False
-        page.get_by_text(D.NEXT_BTN_TEXT, exact=True).click()
-    elif isinstance(q3, str):
-        # 単一回答
-        if not _select_answer_single(page, artifacts, q3):
-            return False
-    else:
-        artifacts.save_debug(page, "diagnose_answers_q3_missing")
+    exp = engine.expected_result(params["answers"])
+    actual = details[0]["name"]
+    if exp and actual != exp:
+        tag = "axis" if engine.diagnose_type == "axis_point" else "additive"
+        artifacts.save_debug(page, f"diagnose_{tag}_result_mismatch_actual_{actual}_expected_{exp}")
         return False
 
-    # 結果確認前画面
+    return True
+
+
+def _answer_paths(params: Dict[str, Any]) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """
+    lead_params.answer_paths を (answers, branch_expected) の並びにする
+      - all         : 採点表（answer_points）の全回答パターン
+      - [{...}, ...] : answers そのもの、または {answers: {...}, branch_expected: {...}}
+    共通の先頭が長いもの同士が隣り合うよう、先頭の設問から順に並べ替える（重複は1回だけ）
+    """
+    raw = params.get("answer_paths")
+    if raw == "all":
+        engine = scoring_engine_for(params)
+        raw = engine.answer_paths() if engine is not None else []
+    out: Dict[Tuple[str, ...], Tuple[Dict[str, Any], Dict[str, Any]]] = {}
+    for item in raw or []:
+        if isinstance(item.get("answers"), dict):
+            answers, branch = item["answers"], item.get("branch_expected") or {}
+        else:
+            answers, branch = item, {}
+        key = tuple(json.dumps(answers[k], ensure_ascii=False) for k in _question_keys(answers))
+        out.setdefault(key, (answers, branch))
+    return [out[k] for k in sorted(out)]
+
+
+def _diverge_at(prev: Dict[str, Any], answers: Dict[str, Any]) -> int:
+    """前の回答と最初に違う設問の番号（0始まり）"""
+    keys = _question_keys(answers)
+    for i, k in enumerate(keys):
+        if prev.get(k) != answers.get(k):
+            return i
+    return len(keys)
+
+
+def _rewind_to_question(page: Page, n_answered: int, q_no: int, text: str | None = None) -> bool:
+    """
+    結果画面 → 結果確認前画面（戻る）→「回答選択に戻る」で最後の設問 → 戻るで q_no の設問まで。
+    text（前の経路で見た q_no の設問文）があれば、同じ設問に着いたかも確かめる
+    （分岐する診断では番号だけだと別の設問のことがある）。
+    着かなければ False（呼び出し側で最初からやり直す）
+    """
     try:
-        page.get_by_text(D.RESULT_CONFIRM_TEXT, exact=False).wait_for(timeout=25000)
-        page.get_by_text(D.RESULT_BTN_TEXT, exact=True).wait_for(timeout=25000)
-        page.get_by_text(D.BACK_TO_ANS_TEXT, exact=True).wait_for(timeout=25000)
+        with timed_wait("diagnose.rewind", "nav") as t:
+            page.go_back(wait_until="domcontentloaded", timeout=t)
+            page.get_by_text(D.BACK_TO_ANS_TEXT, exact=True).click(timeout=t)
+        for _ in range(n_answered - q_no):
+            with timed_wait("diagnose.rewind", "nav") as t:
+                page.go_back(wait_until="domcontentloaded", timeout=t)
+        with timed_wait("diagnose.question", "action") as t:
+            page.get_by_text(D.QUESTION_LABEL_TEXT, exact=True).wait_for(timeout=t)
+            page.get_by_text(str(q_no), exact=True).wait_for(timeout=t)
+        if text is not None and question_text(dom_snapshot(page, [D.ANSWER_LABEL_P_SELECTOR]), q_no) != text:
+            return False
+        return True
     except Exception:
-        artifacts.save_debug(page, "diagnose_result_confirm_screen_missing")
         return False
 
-    # ✅ lead timing: before_result の場合ここでリードが出る（結果ボタン押下時）
-    # 先にボタン押下 → 直後に apply_lead で吸収、の順にする
-    page.get_by_text(D.RESULT_BTN_TEXT, exact=True).click()
-    page = apply_lead(sc, page, artifacts, phase="before_result")
 
-    # ✅ 結果画面（ガチャ単発と同じ扱い）
+def _run_answer_paths(
+    sc: Scenario,
+    page: Page,
+    artifacts: Artifacts,
+    params: Dict[str, Any],
+    ckpt: CheckpointRecorder | None = None,
+    prefix: PrefixState | None = None,
+    start_url: str | None = None,
+) -> Tuple[Page, List[Dict[str, Any]]] | None:
+    """
+    answer_paths を1つのページで順に回答し、結果をそれぞれ期待結果の表と照合する。
+    2件目以降は前の回答と違う設問まで巻き戻して、そこから先だけ答え直す
+    （巻き戻せなければ新しい userid で最初から）。
+    before_result のリードは最初の1件だけ（同じ userid では再表示されない想定）。
+    最後の結果画面と結果詳細を返す（以降のリンク/今すぐつかう/もう一度あそぶはそこで見る）
+    """
+    paths = _answer_paths(params)
+    if not paths:
+        artifacts.save_debug(page, "diagnose_answer_paths_empty")
+        return None
+
+    engine = scoring_engine_for(params)
+    report: List[Dict[str, Any]] = []
+    asset_checked: set[str] = set()
+    prev: Dict[str, Any] | None = None
+    details: List[Dict[str, Any]] = []
+    # 前の経路で見た 設問番号 → 設問文
+    seen: Dict[int, str] = {}
+
+    for i, (answers, branch) in enumerate(paths):
+        p = {**params, "answers": answers, "branch_expected": branch}
+        rewound_to = None
+        if prev is not None:
+            d = _diverge_at(prev, answers)
+            if _rewind_to_question(page, len(_question_keys(prev)), d + 1, text=seen.get(d + 1)):
+                rewound_to = d + 1
+                if not _answer_from(page, artifacts, answers, d, branch, seen=seen):
+                    return None
+                page.get_by_text(D.RESULT_BTN_TEXT, exact=True).click()
+        if rewound_to is None:
+            res_page = _answer_until_result(
+                sc, page, artifacts, p,
+                ckpt=ckpt if prev is None else None,
+                prefix=prefix if prev is None else None,
+                start_url=start_url if prev is None else None,
+                seen=seen,
+            )
+            if res_page is None:
+                return None
+            page = res_page
+
+        try:
+            details = _extract_details_strict(page, draw_count=1)
+        except Exception:
+            artifacts.save_debug(page, f"diagnose_detail_rule_failed_path{i + 1}")
+            raise
+        if not _verify_expected_result(page, artifacts, p, details):
+            return None
+        # 画像は結果ごとに1回見れば十分
+        name = details[0]["name"]
+        if name not in asset_checked:
+            if not _assert_result_assets(page, artifacts, params):
+                return None
+            asset_checked.add(name)
+
+        report.append({
+            "answers": answers,
+            "result": name,
+            "expected": engine.expected_result(answers) if engine is not None else None,
+            "rewound_to": rewound_to,
+        })
+        prev = answers
+
     try:
-        details = _extract_details_strict(page, draw_count=1)
+        artifacts.path("diagnose_paths.json").write_text(
+            json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
     except Exception:
-        artifacts.save_debug(page, "diagnose_detail_rule_failed")
-        raise
-
-    # ✅ ポイント検証（可能な場合）
-    dtype = (params.get("diagnose_type") or "").lower()
-
-    if dtype == "axis_point":
-        total = _calc_total_points(params)  # 一軸の合計点
-        if total is not None:
-            exp = _axis_expected_result(params, total)
-            if exp and details[0]["name"] != exp:
-                artifacts.save_debug(
-                    page,
-                    f"diagnose_axis_result_mismatch_actual_{details[0]['name']}_expected_{exp}",
-                )
-                return False
+        pass
+    return page, details
+
+
+def run_diagnose(
+    sc: Scenario,
+    page: Page,
+    artifacts: Artifacts,
+    ckpt: CheckpointRecorder | None = None,
+    prefix: PrefixState | None = None,
+    start_url: str | None = None,
+) -> bool:
+    params = _get_params(sc)
 
-    elif dtype == "additive":
-        total = _calc_additive_points(params)  # 結果ごとの加算点（例: {"A":x,"B":y,"C":z} など）
-        if total is not None:
-            expected = _pick_additive_result(params, total)
-            if expected and details[0]["name"] != expected:
-                artifacts.save_debug(
-                    page,
-                    f"diagnose_additive_result_mismatch_actual_{details[0]['name']}_expected_{expected}",
-                )
-                return False
+    resume = resume_from_checkpoint(page, artifacts, ckpt, GS.DETAIL_BLOCK_SELECTOR_SINGLE, DIAGNOSE_STEPS)
 
-    if total is not None:
-        dtype = (params.get("diagnose_type") or "").lower()
-        if dtype == "axis_point":
-            exp = _axis_expected_result(params, total)
-            if exp and details[0]["name"] != exp:
-                artifacts.save_debug(page, f"diagnose_axis_result_mismatch_{details[0]['name']}_expected_{exp}")
+    if resume is None:
+        ck_begin(ckpt, "start")
+        if params.get("answer_paths"):
+            # ✅ 複数の回答パターンを1セッションで（結果の照合まで済ませて最後の結果画面を使う）
+            batch = _run_answer_paths(sc, page, artifacts, params, ckpt=ckpt, prefix=prefix, start_url=start_url)
+            if batch is None:
+                return False
+            page, details = batch
+            ck_begin(ckpt, "details")
+            ck_commit(ckpt, "details", page, details=details)
+        else:
+            res_page = _answer_until_result(sc, page, artifacts, params, ckpt=ckpt, prefix=prefix, start_url=start_url)
+            if res_page is None:
                 return False
+            page = res_page
 
-    # ✅ リンク（複数リンクを許容するなら「結果名が含まれてるものが1件以上」でOKにする、など調整可能）
-    try:
-        link_items = _extract_link_items_strict(page)
-    except PlaywrightTimeoutError:
-        artifacts.save_debug(page, "diagnose_link_rule_failed")
-        return False
+            # ✅ 結果画面（ガチャ単発と同じ扱い）
+            ck_begin(ckpt, "details")
+            try:
+                details = _extract_details_strict(page, draw_count=1)
+            except Exception:
+                artifacts.save_debug(page, "diagnose_detail_rule_failed")
+                raise
 
-    if not _assert_links_open_new_tab(page, artifacts, link_items):
-        return False
+            if not _verify_expected_result(page, artifacts, params, details):
+                return False
+            if not _assert_result_assets(page, artifacts, params):
+                return False
+            ck_commit(ckpt, "details", page, details=details)
+    else:
+        details = resume.outputs["details"]
+
+    if not ck_done(resume, DIAGNOSE_STEPS, "use_flow"):
+        # ✅ リンク（複数リンクを許容するなら「結果名が含まれてるものが1件以上」でOKにする、など調整可能）
+        ck_begin(ckpt, "links")
+        try:
+            link_items = _extract_link_items_strict(page)
+        except PlaywrightTimeoutError:
+            artifacts.save_debug(page, "diagnose_link_rule_failed")
+            return False
 
-    # 今すぐつかう（結果は1件想定）
-    detail_blocks = page.locator(GS.DETAIL_BLOCK_SELECTOR_SINGLE)
-    detail_names = [details[0]["name"]]
-    if not _assert_use_flow_all_results(page, artifacts, detail_blocks, detail_names, slow_ms=400):
-        artifacts.save_debug(page, "diagnose_use_flow_failed")
-        return False
+        if not _assert_links_open_new_tab(page, artifacts, link_items, params):
+            return False
+
+        # 今すぐつかう（結果は1件想定）
+        ck_begin(ckpt, "use_flow")
+        detail_blocks = page.locator(GS.DETAIL_BLOCK_SELECTOR_SINGLE)
+        detail_names = [details[0]["name"]]
+        if not _assert_use_flow_all_results(page, artifacts, detail_blocks, detail_names, slow_ms=RP.get_run_profile().slow_ms):
+            artifacts.save_debug(page, "diagnose_use_flow_failed")
+            return False
+        ck_commit(ckpt, "use_flow", page)
 
     # ✅ もう一度あそぶ → トップへ
+    ck_begin(ckpt, "play_again")
     if not _assert_play_again_policy(page, artifacts, sc.url, params):
         return False
+    ck_commit(ckpt, "play_again", page)
 
     # ✅ must_used（once）の場合：同一useridだと「ご利用済み」になるが、診断は毎回useridランダムで来てるのでここは任意
     return True
@@ -0,0 +1,268 @@
+# e2e/src/flows/diagnose_scoring.py
+"""
+診断の採点エンジン（設問数・複数回答・結果軸を問わない）
+
+  - 設問ごとに「選択肢 × 軸」の点数行列を作る（複数回答は選択肢の組み合わせ＝部分集合ごとの合計）
+  - 全設問の組み合わせをブロードキャストで一括合計し、全回答パターンの期待結果を先に計算しておく
+      * axis_point : 1軸の合計点を axis_thresholds の範囲で結果に変換（上から順に最初に入った範囲）
+      * additive   : 軸ごとの合計点の最大。同点は tie_breaker の順（無い軸は軸名順）
+  - 期待結果は表引き1回。到達できない結果 / 同点で決まるパターン / どの範囲にも入らない点数も分かる
+
+lead_params:
+    diagnose_type: axis_point | additive
+    answer_points: {q1: {A: 1, ...}, q2: {...}, ...}       # additive は {A: {A: 2, B: 0}, ...}
+    answers: {q1: A, q2: A1-A, q3: [A2-D, A2-E]}          # list の設問は複数回答
+    multi_questions: [q3]                                 # 任意（answers から推定）
+    multi_max_select: 3                                   # 任意：複数回答で選べる上限
+    axis_thresholds: {A: [0, 5], B: [6, 11], C: [12, 999]}
+    tie_breaker: [A, B, C]
+    result_names: [A, B, C]                               # 任意：到達確認の対象（既定は閾値/軸から）
+
+※ 組み合わせは answer_points に載っている選択肢の直積。分岐で出ない組み合わせも含む。
+"""
+from __future__ import annotations
+
+import itertools
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.core.env import env_int
+
+DIAGNOSE_TYPES = ("axis_point", "additive")
+
+# 組み合わせ数の上限（これを超える設定は列挙しない）
+DEFAULT_MAX_COMBOS = 1_000_000
+
+
+def natural_key(s: str):
+    return [int(t) if t.isdigit() else t for t in re.split(r"(\d+)", s)]
+
+
+def _result_name(axis: str) -> str:
+    return axis if str(axis).startswith("結果") else f"結果{axis}"
+
+
+@dataclass
+class Question:
+    key: str
+    options: List[str]
+    multi: bool
+    choices: List[Tuple[str, ...]]     # 1つの回答 = 選んだ選択肢のタプル
+    points: np.ndarray                 # (len(choices), n_axes)
+
+    def choice_index(self, answer: Any) -> Optional[int]:
+        picked = list(answer) if isinstance(answer, (list, tuple)) else [answer]
+        if not picked or any(p not in self.options for p in picked):
+            return None
+        want = tuple(sorted(set(picked), key=self.options.index))
+        try:
+            return self.choices.index(want)
+        except ValueError:
+            return None
+
+
+@dataclass
+class ScoringReport:
+    diagnose_type: str
+    combos: int
+    distribution: Dict[str, int]
+    unreachable: List[str]
+    tied: int = 0                      # additive：同点を tie_breaker で決めたパターン数
+    unmatched: int = 0                 # axis_point：どの範囲にも入らないパターン数
+    tied_by_result: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def ok(self) -> bool:
+        return not self.unreachable and self.unmatched == 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "diagnose_type": self.diagnose_type,
+            "combos": self.combos,
+            "distribution": self.distribution,
+            "unreachable": self.unreachable,
+            "tied": self.tied,
+            "tied_by_result": self.tied_by_result,
+            "unmatched": self.unmatched,
+        }
+
+
+class ScoringEngine:
+    def __init__(self, params: Dict[str, Any]):
+        self.diagnose_type = (params.get("diagnose_type") or "").strip().lower()
+        if self.diagnose_type not in DIAGNOSE_TYPES:
+            raise ValueError(f"Unknown diagnose_type: {self.diagnose_type}")
+        ap: Dict[str, Dict[str, Any]] = params["answer_points"]
+        answers: Dict[str, Any] = params.get("answers") or {}
+
+        # 軸
+        if self.diagnose_type == "axis_point":
+            self.axes = ["_"]
+        else:
+            seen: List[str] = []
+            for m in ap.values():
+                for rule in (m or {}).values():
+                    if isinstance(rule, dict):
+                        seen += [str(k) for k in rule if str(k) not in seen]
+            tie = [str(x) for x in (params.get("tie_breaker") or [])]
+            # tie_breaker に無い軸は軸名順（answer_points の書き順に依存させない）
+            self.axes = [a for a in tie if a in seen] + sorted(a for a in seen if a not in tie)
+        n_axes = len(self.axes)
+
+        # 設問
+        multi_keys = set(params.get("multi_questions") or [k for k, v in answers.items() if isinstance(v, list)])
+        max_select = params.get("multi_max_select")
+        self.questions: List[Question] = []
+        for key in sorted(ap, key=natural_key):
+            opts = [str(o) for o in (ap[key] or {})]
+            base = np.zeros((len(opts), n_axes), dtype=np.int64)
+            for i, o in enumerate(opts):
+                rule = ap[key][o]
+                if self.diagnose_type == "axis_point":
+                    base[i, 0] = int(rule or 0) if not isinstance(rule, dict) else 0
+                elif isinstance(rule, dict):
+                    for a, v in rule.items():
+                        base[i, self.axes.index(str(a))] = int(v or 0)
+            multi = key in multi_keys
+            if multi:
+                hi = len(opts) if max_select is None else min(len(opts), int(max_select))
+                choices = [c for r in range(1, hi + 1) for c in itertools.combinations(opts, r)]
+                # 部分集合のマスク (choices, options) @ 点数 (options, axes)
+                mask = np.array([[o in c for o in opts] for c in choices], dtype=np.int64).reshape(len(choices), len(opts))
+                pts = mask @ base
+            else:
+                choices = [(o,) for o in opts]
+                pts = base
+            self.questions.append(Question(key, opts, multi, choices, pts))
+
+        self.shape = tuple(len(q.choices) for q in self.questions)
+        self.combos = int(np.prod(self.shape)) if self.shape else 0
+        cap = env_int("E2E_DIAGNOSE_MAX_COMBOS", DEFAULT_MAX_COMBOS)
+        if self.combos > cap:
+            raise ValueError(f"too many answer combinations: {self.combos} > {cap}")
+
+        self.thresholds: List[Tuple[str, int, int]] = []
+        if self.diagnose_type == "axis_point":
+            for name, rng in (params.get("axis_thresholds") or {}).items():
+                if isinstance(rng, list) and len(rng) == 2:
+                    self.thresholds.append((_result_name(name), int(rng[0]), int(rng[1])))
+            self.results = [t[0] for t in self.thresholds]
+        else:
+            self.results = [_result_name(a) for a in self.axes]
+        declared = params.get("result_names")
+        self.expected_results = [_result_name(x) for x in declared] if declared else list(self.results)
+
+        # 全パターンの合計点 (combos, axes) → 結果番号
+        totals = np.zeros((1, n_axes), dtype=np.int64)
+        for q in self.questions:
+            totals = (totals[:, None, :] + q.points[None, :, :]).reshape(-1, n_axes)
+        self.totals = totals
+        self.table, self.tied = self._resolve(totals)
+
+    def _resolve(self, totals: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(N, axes) → (結果番号 (N,)：該当なしは -1, 同点で決めたか (N,))"""
+        n = totals.shape[0]
+        if self.diagnose_type == "axis_point":
+            if not self.thresholds:
+                return np.full(n, -1, dtype=np.int32), np.zeros(n, dtype=bool)
+            t = totals[:, 0][:, None]
+            lo = np.array([x[1] for x in self.thresholds])[None, :]
+            hi = np.array([x[2] for x in self.thresholds])[None, :]
+            inside = (t >= lo) & (t <= hi)
+            idx = np.where(inside.any(axis=1), inside.argmax(axis=1), -1).astype(np.int32)
+            return idx, np.zeros(n, dtype=bool)
+        if not self.axes:
+            return np.full(n, -1, dtype=np.int32), np.zeros(n, dtype=bool)
+        cand = totals == totals.max(axis=1, keepdims=True)
+        # 軸は tie_breaker 順に並べてあるので、最初の最大が答え
+        return cand.argmax(axis=1).astype(np.int32), cand.sum(axis=1) > 1
+
+    # ---------------- 引く ----------------
+    def score(self, answers: Dict[str, Any]) -> np.ndarray:
+        """回答1つぶんの合計点（表に無い選択肢は 0 点）"""
+        total = np.zeros(len(self.axes), dtype=np.int64)
+        for q in self.questions:
+            a = answers.get(q.key)
+            if a is None:
+                continue
+            for o in (a if isinstance(a, (list, tuple)) else [a]):
+                if o in q.options:
+                    total += q.points[q.choices.index((o,))]
+        return total
+
+    def expected_result(self, answers: Dict[str, Any] | None) -> Optional[str]:
+        answers = answers or {}
+        idx = [q.choice_index(answers.get(q.key)) for q in self.questions]
+        if self.questions and all(i is not None for i in idx):
+            r = int(self.table[np.ravel_multi_index(tuple(idx), self.shape)])
+        else:
+            r = int(self._resolve(self.score(answers)[None, :])[0][0])
+        return self.results[r] if r >= 0 else None
+
+    # ---------------- 全体 ----------------
+    def answer_paths(self) -> List[Dict[str, Any]]:
+        """全回答パターン（表の並び＝先頭の設問から順なので、隣同士は共通の先頭が長い）"""
+        return [
+            {q.key: (list(c) if q.multi else c[0]) for q, c in zip(self.questions, combo)}
+            for combo in itertools.product(*(q.choices for q in self.questions))
+        ]
+
+    def report(self) -> ScoringReport:
+        counts = np.bincount(self.table[self.table >= 0], minlength=len(self.results))
+        dist = {name: int(counts[i]) for i, name in enumerate(self.results)}
+        tied_by = {}
+        if self.tied.any():
+            tc = np.bincount(self.table[self.tied & (self.table >= 0)], minlength=len(self.results))
+            tied_by = {name: int(tc[i]) for i, name in enumerate(self.results) if tc[i]}
+        return ScoringReport(
+            diagnose_type=self.diagnose_type,
+            combos=self.combos,
+            distribution=dist,
+            unreachable=[r for r in self.expected_results if dist.get(r, 0) == 0],
+            tied=int(self.tied.sum()),
+            unmatched=int((self.table < 0).sum()),
+            tied_by_result=tied_by,
+        )
+
+
+_CACHE: Dict[str, ScoringEngine] = {}
+
+
+def scoring_engine_for(params: Dict[str, Any] | None) -> Optional[ScoringEngine]:
+    """
+    採点できる設定（diagnose_type + answer_points）なら engine を返す。同じ設定は1回だけ作る
+    """
+    params = params or {}
+    dtype = (params.get("diagnose_type") or "").strip().lower()
+    if dtype not in DIAGNOSE_TYPES or not isinstance(params.get("answer_points"), dict):
+        return None
+    key_src = {
+        k: params.get(k)
+        for k in (
+            "diagnose_type", "answer_points", "axis_thresholds", "tie_breaker",
+            "multi_questions", "multi_max_select", "result_names",
+        )
+    }
+    key_src["multi"] = sorted(k for k, v in (params.get("answers") or {}).items() if isinstance(v, list))
+    key = json.dumps(key_src, sort_keys=True, ensure_ascii=False, default=str)
+    eng = _CACHE.get(key)
+    if eng is None:
+        eng = ScoringEngine(params)
+        _CACHE[key] = eng
+    return eng
+
+
+def scoring_reports(scenarios: Sequence[Any]) -> Dict[str, ScoringReport]:
+    """診断シナリオごとの採点レポート（ブラウザを起動する前に見る用）"""
+    out: Dict[str, ScoringReport] = {}
+    for sc in scenarios:
+        if getattr(sc, "content_type", "") != "diagnose":
+            continue
+        eng = scoring_engine_for(sc.lead_params if isinstance(sc.lead_params, dict) else {})
+        if eng is not None:
+            out[sc.id] = eng.report()
+    return out
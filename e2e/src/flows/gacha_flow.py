@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import json
 import os
 import re
 import time
@@ -10,7 +11,18 @@ from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
 from src.core.types import Scenario
 from src.core.artifacts import Artifacts
 from src.core.text import normalize_text
-from src.core.waits import wait_until_src_changes
+from src.core.waits import wait_until_src_changes, wait_for_src_change
+from src.core.fast_render import fast_forward, fast_render_active
+from src.core.dom_snapshot import dom_snapshot
+from src.core.paid_price import PaidPriceTable
+from src.core.block_state import BlockStateTracker, diff
+from src.core.draw_capture import DrawCapture, draw_capture_config, same_asset
+from src.core.draw_forcing import DrawForcer, forced_results_for
+from src.core.asset_check import asset_check_enabled, collect_image_urls, validate_assets
+from src.core.image_match import content_match, image_match_mode
+from src.core.link_check import LinkTarget, check_reachability, link_check_mode, open_links_in_new_tabs
+from src.core import run_profile as RP
+from src.core.timeout_policy import timed_wait
 from src.selectors import gacha_selectors as S
 from src.selectors import line_selectors as L
 from src.selectors import sns_selectors as N
@@ -18,11 +30,14 @@ from src.selectors import form_selectors as F
 from src.leads.lead_router import apply_lead
 from playwright.sync_api import Page, Locator, TimeoutError as PlaywrightTimeoutError
 from src.core.exceptions import LeadSkipped
+from src.core.checkpoints import Checkpoint, CheckpointRecorder, restore_checkpoint
+from src.flows.prefix_tree import PrefixState, fork_url
 
 
 ALLOWED_RESULT_NAMES = {"結果A", "結果B", "結果C"}
 
-def _maybe_randomize_userid(url: str, lead_params: dict | None = None) -> str:
+def maybe_randomize_userid(url: str, lead_params: dict | None = None) -> str:
+    """reuse_policy: must_reusable 以外は userid をランダム化したURLを返す（prefetch と共用）"""
     params = lead_params or {}
     reuse_policy = (params.get("reuse_policy") or "either").strip()
 
@@ -66,50 +81,124 @@ def _paid_member_login_if_needed(page: Page, artifacts: Artifacts) -> bool:
         pass_input  = page.locator("input[name='password']")
         login_btn   = page.locator("button[type='submit']:has-text('ログイン'), button:has-text('ログイン')")
 
-        email_input.first.wait_for(state="visible", timeout=25000)
-        pass_input.first.wait_for(state="visible", timeout=25000)
+        email_input.first.wait_for(state="visible", timeout=RP.timeout_ms("element"))
+        pass_input.first.wait_for(state="visible", timeout=RP.timeout_ms("element"))
 
-        email_input.first.fill(email, timeout=25000)
-        pass_input.first.fill(password, timeout=25000)
+        email_input.first.fill(email, timeout=RP.timeout_ms("element"))
+        pass_input.first.fill(password, timeout=RP.timeout_ms("element"))
 
-        login_btn.first.click(timeout=25000)
+        login_btn.first.click(timeout=RP.timeout_ms("element"))
 
-        page.get_by_text(S.PAID_CONFIRM_TITLE_TEXT, exact=False).wait_for(timeout=45000)
+        with timed_wait("gacha.paid_confirm", "screen") as t:
+            page.get_by_text(S.PAID_CONFIRM_TITLE_TEXT, exact=False).wait_for(timeout=t)
         return True
     except Exception:
         artifacts.save_debug(page, "paid_member_login_failed")
         return False
 
-def _paid_purchase_and_restrict_check(page: Page, artifacts: Artifacts, purchase_draw_count: int) -> bool:
+PAID_SELECT_SELECTOR = "[data-scope='select'] select"
+PAID_SELECT_OPTION_SELECTOR = "[data-scope='select'] select option"
+
+# 確認画面の金額：ラベルの行（ラベルから親をたどって最初に金額が入っている要素）の金額を読む
+#   ラベル名 → 金額（円・カンマ・¥ を除いた整数）/ ラベルが無い・行に金額が無いなら null
+_PAID_AMOUNTS_JS = """
+(labels) => {
+  const norm = s => (s || '').replace(/\\s+/g, '');
+  const amountOf = t => {
+    const m = norm(t).match(/^[¥￥]?([0-9,]+)円?(\\(税込\\))?$/);
+    return m ? parseInt(m[1].replace(/,/g, ''), 10) : null;
+  };
+  const leaves = Array.from(document.body.querySelectorAll('*')).filter(e => e.children.length === 0);
+  const out = {};
+  for (const label of labels) {
+    out[label] = null;
+    const el = leaves.find(e => norm(e.textContent) === label)
+      || leaves.find(e => norm(e.textContent).startsWith(label));
+    if (!el) continue;
+    // 「購入価格 500円」のように同じ要素に入っている場合
+    const own = amountOf(norm(el.textContent).slice(label.length));
+    if (own !== null) {
+      out[label] = own;
+      continue;
+    }
+    for (let row = el.parentElement; row && row !== document.body; row = row.parentElement) {
+      const hit = Array.from(row.querySelectorAll('*'))
+        .filter(e => e.children.length === 0 && e !== el)
+        .map(e => amountOf(e.textContent))
+        .find(v => v !== null);
+      if (hit !== undefined) {
+        out[label] = hit;
+        break;
+      }
+    }
+  }
+  return out;
+}
+"""
+
+# 購入画面待ちのポーリング（1周で読み込み待ち + 間隔。全体の上限は呼び出し側の timeout_sec）
+# 画面判定を回す周期なので、プロファイルのタイムアウトとは連動させない
+PAID_POLL_LOAD_MS = 800
+PAID_POLL_INTERVAL_MS = 250
+
+# 「使用済み」トーストの確認。出ないのが普通なので、待つほど毎回の開始が遅くなる
+# （トーストは押下直後に出て数秒で消える）
+USED_TOAST_PROBE_MS = 4000
+
+
+def _paid_purchase_and_restrict_check(
+    page: Page, artifacts: Artifacts, purchase_draw_count: int, lead_params: Dict[str, Any] | None = None
+) -> bool:
     """
     課金パターンA：購入内容の確認 → 5回選択 → 同意 → 購入 → 抽選回数画面で5以外disabled確認
+    金額・購入できる回数は lead_params.paid_price_table（既定 500円 / 50円 / 550円）
+    確認画面・抽選回数画面とも、判定はスナップショット1回ずつ
     """
+    table = PaidPriceTable.from_params(lead_params)
+    if table.allowed_counts is not None and purchase_draw_count not in table.allowed_counts:
+        artifacts.save_debug(page, f"paid_count_not_allowed_{purchase_draw_count}")
+        return False
+
     try:
-        page.get_by_text(S.PAID_CONFIRM_TITLE_TEXT, exact=False).wait_for(timeout=45000)
+        with timed_wait("gacha.paid_confirm", "screen") as t:
+            page.get_by_text(S.PAID_CONFIRM_TITLE_TEXT, exact=False).wait_for(timeout=t)
     except Exception:
         artifacts.save_debug(page, "paid_confirm_not_visible")
         return False
 
-    # 金額の表示確認（存在チェック）
+    # 確認画面（金額の表示 / 購入できる回数）… スナップショット1回で判定
     try:
-        if page.get_by_text("購入価格", exact=False).count() < 1 or page.get_by_text("500円", exact=False).count() < 1:
-            artifacts.save_debug(page, "paid_price_missing_500")
-            return False
-        if page.get_by_text("消費税", exact=False).count() < 1 or page.get_by_text("50円", exact=False).count() < 1:
-            artifacts.save_debug(page, "paid_tax_missing_50")
-            return False
-        if page.get_by_text("支払い金額", exact=False).count() < 1 or page.get_by_text("550円", exact=False).count() < 1:
-            artifacts.save_debug(page, "paid_total_missing_550")
-            return False
+        snap = dom_snapshot(page, [PAID_SELECT_OPTION_SELECTOR])
     except Exception:
         artifacts.save_debug(page, "paid_price_check_failed")
         return False
 
+    # 金額はラベルと同じ行のものだけを見る（別の行に同じ金額があっても通さない）
+    price, tax, total = table.amounts()
+    rows = (("購入価格", price, "price"), ("消費税", tax, "tax"), ("支払い金額", total, "total"))
+    try:
+        shown = page.evaluate(_PAID_AMOUNTS_JS, [label for label, _, _ in rows])
+    except Exception:
+        artifacts.save_debug(page, "paid_price_check_failed")
+        return False
+    for label, amount, tag in rows:
+        if shown.get(label) != amount:
+            artifacts.save_debug(page, f"paid_{tag}_mismatch_{amount}_shown_{shown.get(label)}")
+            return False
+
+    if table.allowed_counts is not None:
+        options = {
+            int(v) for v in (o.attr("value") for o in snap.query(PAID_SELECT_OPTION_SELECTOR)) if v and v.isdigit()
+        }
+        if options != set(table.allowed_counts):
+            artifacts.save_debug(page, "paid_allowed_counts_mismatch")
+            return False
+
     # 回数選択（hidden select を select_option）
     try:
-        hidden_select = page.locator("[data-scope='select'] select")
-        hidden_select.first.wait_for(state="attached", timeout=25000)
-        hidden_select.first.select_option(value=str(purchase_draw_count), timeout=25000)
+        hidden_select = page.locator(PAID_SELECT_SELECTOR)
+        hidden_select.first.wait_for(state="attached", timeout=RP.timeout_ms("element"))
+        hidden_select.first.select_option(value=str(purchase_draw_count), timeout=RP.timeout_ms("element"))
     except Exception:
         artifacts.save_debug(page, "paid_select_drawcount_failed")
         return False
@@ -118,7 +207,7 @@ def _paid_purchase_and_restrict_check(page: Page, artifacts: Artifacts, purchase
     try:
         chk = page.locator("[data-scope='checkbox'][data-part='control']")
         if chk.count() > 0:
-            chk.first.click(timeout=10000, force=True)
+            chk.first.click(timeout=RP.timeout_ms("short"), force=True)
     except Exception:
         artifacts.save_debug(page, "paid_checkbox_click_failed")
         return False
@@ -127,53 +216,57 @@ def _paid_purchase_and_restrict_check(page: Page, artifacts: Artifacts, purchase
     buy_btn = page.locator("button:has-text('ガチャを購入する')")
     
     try:
-        buy_btn.first.wait_for(state="visible", timeout=25000)
+        buy_btn.first.wait_for(state="visible", timeout=RP.timeout_ms("element"))
     except Exception:
         artifacts.save_debug(page, "paid_buy_button_missing")
         return False
 
     # disabled解除を待って押す（取れない場合もあるのでクリックは試す）
     try:
-        page.wait_for_function("(el) => !el.disabled", buy_btn.first, timeout=25000)
+        page.wait_for_function("(el) => !el.disabled", buy_btn.first, timeout=RP.timeout_ms("element"))
     except Exception:
         pass
 
     try:
-        buy_btn.first.click(timeout=25000)
+        buy_btn.first.click(timeout=RP.timeout_ms("element"))
     except Exception:
         try:
-            buy_btn.first.click(timeout=25000, force=True)
+            buy_btn.first.click(timeout=RP.timeout_ms("element"), force=True)
         except Exception:
             artifacts.save_debug(page, "paid_buy_button_click_failed")
             return False
 
     # 抽選回数指定画面（5だけ押せる）
     try:
-        page.get_by_text(S.DRAW_START_TEXT, exact=True).wait_for(timeout=45000)
-        page.get_by_text(str(purchase_draw_count), exact=True).wait_for(timeout=45000)
+        with timed_wait("gacha.paid_after_buy", "screen") as t:
+            page.get_by_text(S.DRAW_START_TEXT, exact=True).wait_for(timeout=t)
+            page.get_by_text(str(purchase_draw_count), exact=True).wait_for(timeout=t)
     except Exception:
         artifacts.save_debug(page, "paid_after_buy_no_drawcount")
         return False
 
-    # 指定回数以外がdisabled
+    # 指定回数以外がdisabled（回数ボタン全部をスナップショット1回で見る）
     try:
-        for n in range(1, 11):
-            btn = page.locator(f"button[value='{n}']")
-            if btn.count() < 1:
-                continue
-            if n == purchase_draw_count:
-                # ここは押下可能想定
-                if btn.first.get_attribute("disabled") is not None:
-                    artifacts.save_debug(page, "paid_target_btn_disabled")
-                    return False
-            else:
-                # disabled想定
-                if btn.first.get_attribute("disabled") is None:
-                    artifacts.save_debug(page, f"paid_other_btn_not_disabled_{n}")
-                    return False
+        buttons = dom_snapshot(page, ["button[value]"]).query("button[value]")
     except Exception:
         artifacts.save_debug(page, "paid_disabled_check_failed")
         return False
+    by_value = {}
+    for b in buttons:
+        by_value.setdefault(b.attr("value"), b)
+    for n in range(1, 11):
+        btn = by_value.get(str(n))
+        if btn is None:
+            continue
+        disabled = btn.attr("disabled") is not None
+        if n == purchase_draw_count and disabled:
+            # ここは押下可能想定
+            artifacts.save_debug(page, "paid_target_btn_disabled")
+            return False
+        if n != purchase_draw_count and not disabled:
+            # disabled想定
+            artifacts.save_debug(page, f"paid_other_btn_not_disabled_{n}")
+            return False
 
     return True
 
@@ -193,10 +286,10 @@ def _wait_paid_screen_ready(page: Page, timeout_sec: float = 30.0) -> str:
 
         # 読み込みが終わるのを少し待つ（SPAなので短いポーリングが安定）
         try:
-            page.wait_for_load_state("domcontentloaded", timeout=800)
+            page.wait_for_load_state("domcontentloaded", timeout=PAID_POLL_LOAD_MS)
         except Exception:
             pass
-        page.wait_for_timeout(250)
+        page.wait_for_timeout(PAID_POLL_INTERVAL_MS)
 
     return "timeout"
 
@@ -208,7 +301,7 @@ def _maybe_handle_paid_gacha_after_lead(page: Page, artifacts: Artifacts, sc: Sc
     purchase_draw_count = int(lead_params.get("purchase_draw_count", sc.draw_count or 5) or 5)
 
     # ★ ここが最重要：読み込み中を吸収してから判定に入る
-    st = _wait_paid_screen_ready(page, timeout_sec=35.0)
+    st = _wait_paid_screen_ready(page, timeout_sec=RP.timeout_sec("screen"))
     if st == "timeout":
         artifacts.save_debug(page, "paid_loading_timeout")
         return page  # ここで落とさず、後段で拾えるようにする（崩さない方針）
@@ -220,7 +313,9 @@ def _maybe_handle_paid_gacha_after_lead(page: Page, artifacts: Artifacts, sc: Sc
 
     # A: 購入内容確認なら購入処理
     if _is_paid_confirm_screen(page):
-        ok = _paid_purchase_and_restrict_check(page, artifacts, purchase_draw_count=purchase_draw_count)
+        ok = _paid_purchase_and_restrict_check(
+            page, artifacts, purchase_draw_count=purchase_draw_count, lead_params=lead_params
+        )
         if not ok:
             return page
 
@@ -232,17 +327,9 @@ def pick_result_name(text: str) -> str:
     return m.group(1) if m else ""
 
 
-def _is_ci() -> bool:
-    return (os.getenv("CI", "") or "").lower() == "true"
-
-
 def _demo_wait(sec_default: float = 0.8) -> None:
-    """ローカル目視用：CIでは待たない"""
-    if _is_ci():
-        return
-    sec = float(os.getenv("PW_DEMO_WAIT", str(sec_default)) or str(sec_default))
-    if sec > 0:
-        time.sleep(sec)
+    """ローカル目視用：demo/debug プロファイルのときだけ待つ"""
+    RP.demo_wait(sec_default)
 
 # ---------------- ① 抽選回数画面：表示チェック（クリックしない） ----------------
 def _assert_draw_count_screen(page: Page, artifacts: Artifacts, sc: Scenario) -> bool:
@@ -264,51 +351,46 @@ def _assert_draw_count_screen(page: Page, artifacts: Artifacts, sc: Scenario) ->
 
     # 抽選回数画面の目印：「スタート」が見える
     try:
-        page.get_by_text(S.DRAW_START_TEXT, exact=True).wait_for(timeout=20000)
+        page.get_by_text(S.DRAW_START_TEXT, exact=True).wait_for(timeout=RP.timeout_ms("action"))
     except PlaywrightTimeoutError:
         artifacts.save_debug(page, "draw_count_screen_not_opened")
         return False
 
+    # 以降の表示チェックは、この時点のスナップショット1回ぶんで判定する
+    snap = dom_snapshot(page)
+
     # 押下したい回数は必ず表示されている（最低条件）
     if sc.draw_count is None:
         artifacts.save_debug(page, "draw_count_missing_in_scenario")
         return False
     must_n = sc.draw_count
-    must_btn = page.get_by_text(str(must_n), exact=True)
-    if must_btn.count() < 1:
+    if not snap.has_text(str(must_n), exact=True):
         artifacts.save_debug(page, f"draw_count_required_missing_{must_n}")
         return False
 
     # expected があれば、その数字が表示されていることをチェック（クリックしない）
     if expected is not None:
         for n in expected:
-            loc = page.get_by_text(str(n), exact=True)
-            if loc.count() < 1:
+            if not snap.has_text(str(n), exact=True):
                 artifacts.save_debug(page, f"draw_count_expected_missing_{n}")
                 return False
 
         if strict:
             # 画面にある “数字ボタン” をざっくり集計して expected と一致するかを確認
             # ※ UIが数字以外も含む場合があるので、あくまで保守的に “1〜10のみ”を抽出
-            present = set()
-            for n in range(1, 11):
-                if page.get_by_text(str(n), exact=True).count() > 0:
-                    present.add(n)
+            present = {n for n in range(1, 11) if snap.has_text(str(n), exact=True)}
             if present != set(expected):
                 artifacts.save_debug(page, "draw_count_present_set_mismatch")
                 return False
 
     # スタートが押下可能であること
-    start_btn = page.get_by_text(S.DRAW_START_TEXT, exact=True)
-    if start_btn.count() < 1:
+    start_btn = snap.find_text(S.DRAW_START_TEXT, exact=True)
+    if not start_btn:
         artifacts.save_debug(page, "start_button_missing")
         return False
-    try:
-        if not start_btn.first.is_enabled():
-            artifacts.save_debug(page, "start_button_disabled")
-            return False
-    except Exception:
-        pass
+    if not start_btn[0].enabled:
+        artifacts.save_debug(page, "start_button_disabled")
+        return False
 
     return True
 
@@ -483,8 +565,9 @@ def _extract_details_strict(page: Page, draw_count: int) -> list[dict]:
     blocks = page.locator(block_sel)
 
     try:
-        blocks.first.wait_for(state="attached", timeout=45000)
-        blocks.first.wait_for(state="visible", timeout=45000)
+        with timed_wait("gacha.detail_blocks", "screen") as t:
+            blocks.first.wait_for(state="attached", timeout=t)
+            blocks.first.wait_for(state="visible", timeout=t)
     except PlaywrightTimeoutError:
         raise PlaywrightTimeoutError(
             f"結果詳細ブロックが表示されません selector='{block_sel}'"
@@ -590,7 +673,7 @@ def _extract_link_items_strict(page: Page) -> List[Dict[str, Any]]:
 def _assert_dots_count(page: Page, artifacts: Artifacts, draw_count: int) -> bool:
     dots = page.locator(S.DOT_BUTTON_SELECTOR)
     try:
-        dots.first.wait_for(timeout=8000)
+        dots.first.wait_for(timeout=RP.timeout_ms("brief"))
     except Exception:
         pass
     if dots.count() != draw_count:
@@ -599,45 +682,59 @@ def _assert_dots_count(page: Page, artifacts: Artifacts, draw_count: int) -> boo
     return True
 
 
-def _assert_links_open_new_tab(page: Page, artifacts: Artifacts, link_items: List[Dict[str, Any]]) -> bool:
-    for li in link_items:
-        a = li["locator"]
-        href = li["href"]
+def _assert_links_open_new_tab(
+    page: Page, artifacts: Artifacts, link_items: List[Dict[str, Any]], lead_params: Dict[str, Any] | None = None
+) -> bool:
+    """
+    結果リンクの確認（lead_params.link_check）
+      - click   : 新規タブで開き、遷移が href に commit したらOK（上限付きでまとめて押す）
+      - request : APIRequestContext で到達性だけ確認
+      - both    : 両方
+    """
+    mode = link_check_mode(lead_params)
 
+    if mode in ("click", "both"):
         _demo_wait(0.4)
-        try:
-            with page.expect_popup(timeout=15000) as pop:
-                a.click()
-            newp = pop.value
-        except Exception:
-            try:
-                with page.context.expect_page(timeout=15000) as pg:
-                    a.click()
-                newp = pg.value
-            except Exception:
-                artifacts.save_debug(page, f"link_open_failed_{li['index']}")
+        targets = [LinkTarget(key=str(li["index"]), locator=li["locator"], href=li["href"]) for li in link_items]
+        for r in open_links_in_new_tabs(page, targets):
+            if not r.ok:
+                tag = "link_open_failed" if r.error == "popup_not_opened" else "link_url_mismatch"
+                artifacts.save_debug(page, f"{tag}_{r.key}")
                 return False
+        _demo_wait(0.5)
 
-        try:
-            newp.wait_for_load_state("domcontentloaded", timeout=20000)
-        except Exception:
-            pass
+    if mode in ("request", "both"):
+        reach = check_reachability([li["href"] for li in link_items])
+        for li in link_items:
+            ok, status = reach.get(li["href"], (False, 0))
+            if not ok:
+                artifacts.save_debug(page, f"link_unreachable_{li['index']}_{status}")
+                return False
 
-        cur = newp.url or ""
-        if href and (href not in cur) and (not cur.startswith(href)):
-            artifacts.save_debug(page, f"link_url_mismatch_{li['index']}")
-            try:
-                newp.close()
-            except Exception:
-                pass
-            return False
+    return True
 
-        _demo_wait(0.5)
-        try:
-            newp.close()
-        except Exception:
-            pass
 
+def _assert_result_assets(
+    page: Page, artifacts: Artifacts, lead_params: Dict[str, Any] | None, extra_urls: List[str] | None = None
+) -> bool:
+    """
+    結果画面の画像（カード/サムネ/結果詳細/リッチテキスト画像）が実際に取得できること
+    status / content-type / 画像サイズを確認（lead_params.asset_check: false で無効）
+    """
+    if not asset_check_enabled(lead_params):
+        return True
+    try:
+        urls = collect_image_urls(page) + list(extra_urls or [])
+    except Exception:
+        artifacts.save_debug(page, "asset_collect_failed")
+        return False
+    bad = [r for r in validate_assets(urls) if not r.ok]
+    if bad:
+        artifacts.path("asset_errors.json").write_text(
+            json.dumps([r.__dict__ for r in bad], ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+        artifacts.save_debug(page, "asset_invalid")
+        return False
     return True
 
 
@@ -664,52 +761,44 @@ def _assert_use_flow_all_results(page: Page, artifacts, detail_blocks, detail_na
         artifacts.save_debug(page, "use_detail_names_len_mismatch")
         return False
 
-    # 押下済みフラグ
-    used_flags = [False] * n
+    # 全ブロックのボタン状態を1往復で撮り、押下前後の差分で判定する
+    tracker = BlockStateTracker(detail_blocks)
+    states = tracker.snapshot()
 
     for i in range(n):
-        # DOM更新対策：毎回取り直す
-        it = detail_blocks.nth(i)
         target_name = detail_names[i]
+        before = states
 
-        # --- 「今すぐつかう」ボタンを、ブロック自身→親(1段)→親(2段) の順で探す ---
-        # （あなたのケース：css-1xhi066 の 1つ上に button がいる）
-        # --- 「今すぐつかう」ボタン探索：子孫(button優先) → 親(1段) → 親(2段) ---
-        # --- 「今すぐつかう」ボタン探索：子孫(button優先) → 親(1段) → 親(2段) ---
-        cand = it.locator("button:has-text('今すぐつかう'), [role='button']:has-text('今すぐつかう')")
-        if cand.count() < 1:
-            cand = it.locator("xpath=..").locator("button:has-text('今すぐつかう'), [role='button']:has-text('今すぐつかう')")
-        if cand.count() < 1:
-            cand = it.locator("xpath=../..").locator("button:has-text('今すぐつかう'), [role='button']:has-text('今すぐつかう')")
-
-        if cand.count() < 1:
+        # 「今すぐつかう」ボタン（ブロック→親(1段)→親(2段) のどこにあるかはスナップショットで分かる）
+        if not before[i].usable:
             artifacts.save_debug(page, f"use_btn_missing_{i+1}")
             return False
-
-
+        cand = tracker.use_button(i, before[i])
 
         # クリックできるように
         try:
-            cand.first.scroll_into_view_if_needed(timeout=5000)
+            cand.scroll_into_view_if_needed(timeout=RP.timeout_ms("short"))
         except Exception:
             pass
         page.wait_for_timeout(slow_ms)
 
         # 押下
         try:
-            cand.first.click(timeout=15000)
+            cand.click(timeout=RP.timeout_ms("click"))
         except Exception:
             # div拾ってる可能性もあるので force
             try:
-                cand.first.click(timeout=15000, force=True)
+                cand.click(timeout=RP.timeout_ms("click"), force=True)
             except Exception:
                 artifacts.save_debug(page, f"use_btn_click_failed_{i+1}")
                 return False
+        fast_forward(page)
 
         # --- モーダル確認 ---
         modal = page.locator(S.RESULT_MODAL_SELECTOR)
         try:
-            modal.first.wait_for(state="visible", timeout=15000)
+            with timed_wait("use.modal_open", "click") as t:
+                modal.first.wait_for(state="visible", timeout=t)
         except PlaywrightTimeoutError:
             artifacts.save_debug(page, f"use_modal_not_visible_{i+1}")
             return False
@@ -738,79 +827,46 @@ def _assert_use_flow_all_results(page: Page, artifacts, detail_blocks, detail_na
 
         # 「つかう」押下
         modal.locator(S.RESULT_MODAL_USE_BUTTON_SELECTOR).first.click()
+        fast_forward(page)
 
         # モーダルが閉じる
         try:
-            modal.first.wait_for(state="hidden", timeout=15000)
+            modal.first.wait_for(state="hidden", timeout=RP.timeout_ms("click"))
         except PlaywrightTimeoutError:
             # hidden にならない実装もあるため detached も見る
             try:
-                modal.first.wait_for(state="detached", timeout=5000)
+                modal.first.wait_for(state="detached", timeout=RP.timeout_ms("short"))
             except PlaywrightTimeoutError:
                 artifacts.save_debug(page, f"use_modal_not_closed_{i+1}")
                 return False
 
-        # --- 押下した対象だけが使用済みになること ---
-        # DOM更新対策で取り直す
-        it2 = detail_blocks.nth(i)
-
-        # 「使用済み」ボタンを（ブロック→親→親）で探す
-        used_loc = it2.locator("button:has-text('使用済み'), [role='button']:has-text('使用済み')")
-        if used_loc.count() < 1:
-            used_loc = it2.locator("xpath=..").locator("button:has-text('使用済み'), [role='button']:has-text('使用済み')")
-        if used_loc.count() < 1:
-            used_loc = it2.locator("xpath=../..").locator("button:has-text('使用済み'), [role='button']:has-text('使用済み')")
-
-
-        # 出るまで待つ（文言変化が遅い場合）
+        # --- 押下した対象が「使用済み」になるまで待つ（文言変化が遅い場合） ---
         try:
-            used_loc.first.wait_for(state="visible", timeout=20000)
+            with timed_wait("use.marked_used", "action") as t:
+                states = tracker.wait_until(i, lambda st: st.used, timeout_ms=t)
         except PlaywrightTimeoutError:
             artifacts.save_debug(page, f"not_marked_used_{i+1}")
             return False
+        if len(states) != n:
+            artifacts.save_debug(page, f"use_detail_blocks_changed_{i+1}")
+            return False
 
         # 押下不可（disabled/クリック不可）を確認
-        try:
-            if used_loc.first.is_enabled():
-                artifacts.save_debug(page, f"used_still_enabled_{i+1}")
-                return False
-        except Exception:
-            # is_enabled が例外でも、とりあえず見えていればOKに寄せる
-            pass
-
-        used_flags[i] = True
-        page.wait_for_timeout(slow_ms)
+        if not states[i].used_disabled:
+            artifacts.save_debug(page, f"used_still_enabled_{i+1}")
+            return False
 
-        # --- 他の未押下が「今すぐつかう」のまま ---
-        # --- 他の未押下が「今すぐつかう」のまま ---
-        for j in range(n):
-            if used_flags[j]:
+        # --- 差分：変わったのは押下したブロックだけ（他は「今すぐつかう」のまま / 使用済みのまま） ---
+        for j in diff(before, states):
+            if j == i:
                 continue
-
-            other = detail_blocks.nth(j)
-
-            # 「今すぐつかう」探す（ブロック→親→親）
-            other_use = other.locator(S.DETAIL_USE_BUTTON_SELECTOR)
-            if other_use.count() < 1:
-                other_use = other.locator("xpath=..").locator(S.DETAIL_USE_BUTTON_SELECTOR)
-            if other_use.count() < 1:
-                other_use = other.locator("xpath=../..").locator(S.DETAIL_USE_BUTTON_SELECTOR)
-
-            if other_use.count() < 1:
-                # もし「使用済み」になっていたら、別原因（他まで使用済み化）
-                other_used = other.locator(S.USED_BUTTON_SELECTOR)
-                if other_used.count() < 1:
-                    other_used = other.locator("xpath=..").locator(S.USED_BUTTON_SELECTOR)
-                if other_used.count() < 1:
-                    other_used = other.locator("xpath=../..").locator(S.USED_BUTTON_SELECTOR)
-
-                if other_used.count() > 0:
-                    artifacts.save_debug(page, f"unexpected_used_{i+1}_affects_{j+1}")
-                    return False
-
-                artifacts.save_debug(page, f"other_should_be_usable_{i+1}_but_{j+1}_missing")
+            if states[j].used and not before[j].used:
+                artifacts.save_debug(page, f"unexpected_used_{i+1}_affects_{j+1}")
                 return False
+            artifacts.save_debug(page, f"other_should_be_usable_{i+1}_but_{j+1}_missing")
+            return False
 
+        page.wait_for_timeout(slow_ms)
 
     return True
 
@@ -905,7 +961,7 @@ def _click_play_again_to_top(page: Page, artifacts: Artifacts, top_start_text: s
     _demo_wait(0.4)
     btn.click()
     try:
-        page.get_by_text(top_start_text, exact=True).wait_for(timeout=20000)
+        page.get_by_text(top_start_text, exact=True).wait_for(timeout=RP.timeout_ms("action"))
     except PlaywrightTimeoutError:
         artifacts.save_debug(page, f"top_not_returned_{normalize_text(top_start_text)}")
         return False
@@ -925,9 +981,9 @@ def _attempt_start_gacha_and_observe(
     _demo_wait(0.4)
     page.get_by_text(start_text, exact=True).click()
 
-    if _toast_used_shown(page, lead_params, timeout_ms=4000):
+    if _toast_used_shown(page, lead_params, timeout_ms=USED_TOAST_PROBE_MS):
         return "used"
-    if _drawcount_screen_visible(page, timeout_ms=15000):
+    if _drawcount_screen_visible(page, timeout_ms=RP.timeout_ms("click")):
         return "proceed"
     return "unknown"
 
@@ -939,9 +995,9 @@ def _ensure_userid_def_can_proceed(
 ) -> bool:
     _demo_wait(0.4)
 
-    new_url = _maybe_randomize_userid(base_url, lead_params)
+    new_url = maybe_randomize_userid(base_url, lead_params)
 
-    page.goto(new_url, wait_until="domcontentloaded", timeout=45000)
+    page.goto(new_url, wait_until="domcontentloaded", timeout=RP.timeout_ms("nav"))
     out = _attempt_start_gacha_and_observe(page, lead_params)
     if out != "proceed":
         artifacts.save_debug(page, "userid_random_still_blocked")
@@ -1026,238 +1082,482 @@ def _assert_single_start_screen(page: Page, artifacts: Artifacts) -> bool:
       - ここで 1〜10 は表示されない
     """
     try:
-        page.get_by_text("抽選スタート", exact=True).wait_for(timeout=20000)
+        page.get_by_text("抽選スタート", exact=True).wait_for(timeout=RP.timeout_ms("action"))
     except PlaywrightTimeoutError:
         artifacts.save_debug(page, "single_start_screen_not_opened")
         return False
 
     # 1〜10が見えていないこと（単発の条件）
     # ※ ページ内に別の数字が出る可能性があるなら、より狭い領域で絞り込みに変更可
+    snap = dom_snapshot(page)
     for n in range(1, 11):
-        if page.get_by_text(str(n), exact=True).count() > 0:
+        if snap.has_text(str(n), exact=True):
             artifacts.save_debug(page, f"single_should_not_show_number_{n}")
             return False
 
     return True
 
 
+# ---------------- checkpoint（リトライ時の途中再開） ----------------
+BULK_STEPS = ["start", "lead", "draw_count", "cards", "thumbs", "details", "links", "use_flow", "play_again"]
+SINGLE_STEPS = ["start", "lead", "single_start", "details", "links", "use_flow", "play_again"]
+
+# 失敗しても副作用なく再実行できるステップ（購入・抽選・今すぐつかう は含めない）
+REPLAYABLE_STEPS = {"thumbs", "details", "links", "play_again"}
+
+
+def _wait_next_card(page: Page, card: Locator, src: str) -> None:
+    """カードを押したあと、次のカード（src が変わる）まで待つ"""
+    if fast_render_active(page):
+        # アニメーション無しなので、src が変わった時点で次へ
+        wait_for_src_change(page, S.CARD_IMAGE_SELECTOR, src, timeout_ms=RP.timeout_ms("action"))
+    else:
+        wait_until_src_changes(card, src, timeout_sec=RP.timeout_sec("action"))
+
+
+def _collect_draw_results_from_network(
+    page: Page, artifacts: Artifacts, capture: DrawCapture, card: Locator, draw_count: int
+) -> List[Dict[str, str]] | None:
+    """
+    抽選APIのレスポンスから結果を取り、カードは「スキップ」で飛ばす（1枚ずつめくらない）
+    capture はここで外す（呼び出し側も finally で外す）
+    """
+    try:
+        with timed_wait("gacha.draw_api", "action") as t:
+            results = capture.results(draw_count, timeout_ms=t)
+    finally:
+        capture.detach()
+    if results is None:
+        artifacts.save_debug(page, "draw_api_not_captured")
+        return None
+
+    for i, r in enumerate(results):
+        if r["name"] not in ALLOWED_RESULT_NAMES:
+            artifacts.save_debug(page, f"draw_api_name_invalid_{i+1}")
+            return None
+
+    # 1枚目に表示中のカードとレスポンスの先頭が一致すること
+    if not same_asset((card.get_attribute("src") or "").strip(), results[0]["src"]):
+        artifacts.save_debug(page, "draw_api_first_card_mismatch")
+        return None
+
+    if draw_count >= 2:
+        try:
+            page.get_by_text(S.CARD_SKIP_TEXT, exact=True).first.click(timeout=RP.timeout_ms("click"))
+        except Exception:
+            # スキップが押せない実装なら、検証なしでめくるだけ（1枚ごとに次のカードを待つ）
+            for i in range(draw_count):
+                src = (card.get_attribute("src") or "").strip()
+                card.click()
+                fast_forward(page)
+                if i < draw_count - 1:
+                    _wait_next_card(page, card, src)
+    else:
+        card.click()
+        fast_forward(page)
+    return results
+
+
+def _srcs_match(a: List[str], b: List[str], image_match: str, src_match) -> List[bool]:
+    """位置ごとの画像一致（src 文字列 or 画像の中身）"""
+    if image_match == "content":
+        return content_match(a, b)
+    return [src_match(x, y) for x, y in zip(a, b)]
+
+
+def _assert_forced_results(
+    page: Page, artifacts: Artifacts, forcer: DrawForcer, card_results: List[Dict[str, str]]
+) -> bool:
+    """差し替えが効いて、画面（またはレスポンス）の並びが forced と一致すること"""
+    forcer.detach()
+    reason = forcer.failure()
+    if reason:
+        artifacts.save_debug(page, f"forced_{reason}")
+        return False
+    if [r["name"] for r in card_results] != forcer.forced:
+        artifacts.save_debug(page, "forced_results_mismatch")
+        return False
+    return True
+
+
+def ck_begin(ckpt: CheckpointRecorder | None, step: str) -> None:
+    """ステップ開始を記録（ckpt 無しなら何もしない。diagnose_flow と共用）"""
+    if ckpt is not None:
+        ckpt.begin(step)
+
+
+def ck_commit(ckpt: CheckpointRecorder | None, step: str, page: Page, **outputs: Any) -> None:
+    """ステップ完了を checkpoint に記録（ckpt 無しなら何もしない）"""
+    if ckpt is not None:
+        ckpt.commit(step, page, **outputs)
+
+
+def ck_done(resume: Checkpoint | None, steps: List[str], step: str) -> bool:
+    """resume 位置までに完了済みのステップなら True（= 今回はスキップ）"""
+    if resume is None:
+        return False
+    return steps.index(step) <= steps.index(resume.step)
+
+
+def resume_from_checkpoint(
+    page: Page,
+    artifacts: Artifacts,
+    ckpt: CheckpointRecorder | None,
+    block_sel: str,
+    steps: List[str],
+) -> Checkpoint | None:
+    """
+    前回の失敗ステップが再実行可能なら、直前の checkpoint（URL + storage_state）を復元する。
+    ✅ 再開できるのは checkpoint〜失敗ステップが全て再実行可能なとき（= 結果画面の checkpoint）だけ
+    結果画面が復元できなければ None（前回分は破棄して最初からやり直し）。
+    """
+    if ckpt is None:
+        return None
+    cp = ckpt.resume_point(REPLAYABLE_STEPS, steps)
+    if cp is None:
+        ckpt.reset()
+        return None
+
+    try:
+        restore_checkpoint(page, cp, timeout_ms=RP.timeout_ms("nav"))
+        page.locator(block_sel).first.wait_for(state="visible", timeout=RP.timeout_ms("action"))
+    except Exception:
+        artifacts.save_debug(page, f"resume_failed_{cp.step}")
+        ckpt.reset()
+        return None
+    return cp
+
+
+def _lead_already_satisfied(page: Page, timeout_ms: int | None = None) -> bool:
+    """
+    共有プレフィックスから分岐したとき、リードを通過済みで抽選画面が出ているか。
+    （出ていなければ通常どおり apply_lead する）
+    """
+    if timeout_ms is None:
+        timeout_ms = RP.timeout_ms("brief")
+    try:
+        page.get_by_text(S.DRAW_START_TEXT, exact=True).or_(
+            page.get_by_text(S.SINGLE_DRAW_START_TEXT, exact=True)
+        ).first.wait_for(timeout=timeout_ms)
+        return True
+    except Exception:
+        return False
+
+
 # ---------------- メイン ----------------
-def run_gacha(sc: Scenario, page: Page, artifacts: Artifacts) -> bool:
+def run_gacha(
+    sc: Scenario,
+    page: Page,
+    artifacts: Artifacts,
+    ckpt: CheckpointRecorder | None = None,
+    prefix: PrefixState | None = None,
+    start_url: str | None = None,
+) -> bool:
+    """
+    start_url があれば、page はそのURLを読み込み済み（先読み）として goto を省く。
+    """
     if sc.draw_count is None:
         raise ValueError("gacha scenario requires draw_count")
 
     draw_count = sc.draw_count
     lead_params = sc.lead_params if isinstance(sc.lead_params, dict) else {}
     gacha_mode = (lead_params.get("gacha_mode") or "bulk").lower()
+    steps = SINGLE_STEPS if gacha_mode == "single" else BULK_STEPS
 
-    try:
-        lead_params = sc.lead_params if isinstance(sc.lead_params, dict) else {}
-        url = _maybe_randomize_userid(sc.url, lead_params)
-        page.goto(url, wait_until="domcontentloaded", timeout=45000)
-        page.get_by_text(S.START_GACHA_BTN_TEXT, exact=True).click()
+    # draw_source: network → 抽選APIのレスポンスを正とする（画像URLはクエリを無視して比較）
+    capture_cfg = draw_capture_config(lead_params)
+    src_match = same_asset if capture_cfg is not None else (lambda a, b: a == b)
+    # image_match: content → カード/サムネ/詳細を画像の中身（pHash）で突き合わせる
+    image_match = image_match_mode(lead_params)
 
-        # リード適用（noneならそのまま）
-        try:
-            page = apply_lead(sc, page, artifacts)
-        except LeadSkipped:
-            artifacts.save_debug(page, "lead_skipped")
-            return True  # CAPTCHA等で続行不可なら落とさない方針
-        
-        # ★課金ガチャの場合だけ、購入フローをここで消化（単発/一括ロジックは崩さない）
-        page = _maybe_handle_paid_gacha_after_lead(page, artifacts, sc)
+    try:
+        block_sel = S.DETAIL_BLOCK_SELECTOR_SINGLE if (gacha_mode == "single" or draw_count == 1) else S.DETAIL_BLOCK_SELECTOR_MULTI
+        resume = resume_from_checkpoint(page, artifacts, ckpt, block_sel, steps)
+
+        if resume is None:
+            lead_params = sc.lead_params if isinstance(sc.lead_params, dict) else {}
+            ck_begin(ckpt, "start")
+            if start_url is not None:
+                # 前のシナリオ実行中に先読み済み（goto 不要）
+                url = start_url
+            else:
+                # 共有プレフィックスがあれば、その URL（= リード完了後の状態）から始める
+                url = maybe_randomize_userid(fork_url(prefix.url, sc) if prefix is not None else sc.url, lead_params)
+                with timed_wait("gacha.goto", "nav") as t:
+                    page.goto(url, wait_until="domcontentloaded", timeout=t)
+            page.get_by_text(S.START_GACHA_BTN_TEXT, exact=True).click()
+
+            # リード適用（noneならそのまま）
+            ck_begin(ckpt, "lead")
+            if prefix is None or not _lead_already_satisfied(page):
+                try:
+                    page = apply_lead(sc, page, artifacts)
+                except LeadSkipped:
+                    artifacts.save_debug(page, "lead_skipped")
+                    return True  # CAPTCHA等で続行不可なら落とさない方針
+
+            # ★課金ガチャの場合だけ、購入フローをここで消化（単発/一括ロジックは崩さない）
+            page = _maybe_handle_paid_gacha_after_lead(page, artifacts, sc)
+            ck_commit(ckpt, "lead", page, url=url)
+        else:
+            url = resume.outputs.get("url") or sc.url
 
         # =========================
         # 単発ガチャ分岐（ここだけ追加）
         # =========================
         if gacha_mode == "single":
-            # ① 抽選スタート画面（1〜10が出ない）
-            if not _assert_single_start_screen(page, artifacts):
-                return False
-
-            # ② 抽選スタート押下 → 結果画面へ（カード画面は経由しない）
-            page.get_by_text("抽選スタート", exact=True).click()
-
-            # 結果画面の詳細（単発なので draw_count=1 相当）
-            # ※ カードが無いので card_results との一致チェックはしない
-            try:
-                details = _extract_details_strict(page, draw_count=1)
-            except Exception:
-                artifacts.save_debug(page, "detail_rule_failed_single")
-                raise
-
-            # 単発なのでサムネは出ない想定（出るなら仕様に合わせて緩める）
-            if len(_extract_top_thumbs(page)) != 0:
-                artifacts.save_debug(page, "topthumb_should_not_exist_single")
-                return False
-
-            # リンク
-            try:
-                link_items = _extract_link_items_strict(page)
-            except PlaywrightTimeoutError:
-                artifacts.save_debug(page, "link_rule_failed_single")
-                return False
-
-            # 単発：結果名は1つだけ
-            unique_result_names = [details[0]["name"]]
-            matched_count = {nm: 0 for nm in unique_result_names}
-            for li in link_items:
-                matched = None
-                for nm in unique_result_names:
-                    if nm in li["button_text"]:
-                        matched = nm
-                        break
-                if matched is None:
-                    artifacts.save_debug(page, f"link_not_matched_single_{li['index']}")
+            if not ck_done(resume, steps, "details"):
+                # ① 抽選スタート画面（1〜10が出ない）
+                ck_begin(ckpt, "single_start")
+                if not _assert_single_start_screen(page, artifacts):
                     return False
-                matched_count[matched] += 1
 
-            for nm, cnt in matched_count.items():
-                if cnt < 1:
-                    artifacts.save_debug(page, f"link_count_invalid_single_{nm}_{cnt}")
+                # ② 抽選スタート押下 → 結果画面へ（カード画面は経由しない）
+                page.get_by_text("抽選スタート", exact=True).click()
+
+                # 結果画面の詳細（単発なので draw_count=1 相当）
+                # ※ カードが無いので card_results との一致チェックはしない
+                ck_begin(ckpt, "details")
+                try:
+                    details = _extract_details_strict(page, draw_count=1)
+                except Exception:
+                    artifacts.save_debug(page, "detail_rule_failed_single")
+                    raise
+
+                # 単発なのでサムネは出ない想定（出るなら仕様に合わせて緩める）
+                if len(_extract_top_thumbs(page)) != 0:
+                    artifacts.save_debug(page, "topthumb_should_not_exist_single")
+                    return False
+                if not _assert_result_assets(page, artifacts, lead_params):
+                    return False
+                ck_commit(ckpt, "details", page, url=url, details=details)
+            else:
+                details = resume.outputs["details"]
+
+            if not ck_done(resume, steps, "use_flow"):
+                # リンク
+                ck_begin(ckpt, "links")
+                try:
+                    link_items = _extract_link_items_strict(page)
+                except PlaywrightTimeoutError:
+                    artifacts.save_debug(page, "link_rule_failed_single")
                     return False
 
-            # リンク押下→新規タブ
-            if not _assert_links_open_new_tab(page, artifacts, link_items):
-                return False
+                # 単発：結果名は1つだけ
+                unique_result_names = [details[0]["name"]]
+                matched_count = {nm: 0 for nm in unique_result_names}
+                for li in link_items:
+                    matched = None
+                    for nm in unique_result_names:
+                        if nm in li["button_text"]:
+                            matched = nm
+                            break
+                    if matched is None:
+                        artifacts.save_debug(page, f"link_not_matched_single_{li['index']}")
+                        return False
+                    matched_count[matched] += 1
+
+                for nm, cnt in matched_count.items():
+                    if cnt < 1:
+                        artifacts.save_debug(page, f"link_count_invalid_single_{nm}_{cnt}")
+                        return False
+
+                # リンク押下→新規タブ
+                if not _assert_links_open_new_tab(page, artifacts, link_items, lead_params):
+                    return False
 
-            # 「今すぐつかう」フロー（単発は1件）
-            block_sel = S.DETAIL_BLOCK_SELECTOR_SINGLE
-            detail_blocks = page.locator(block_sel)
-            detail_names = [details[0]["name"]]
+                # 「今すぐつかう」フロー（単発は1件）
+                ck_begin(ckpt, "use_flow")
+                detail_blocks = page.locator(block_sel)
+                detail_names = [details[0]["name"]]
 
-            if not _assert_use_flow_all_results(page, artifacts, detail_blocks, detail_names, slow_ms=400):
-                artifacts.save_debug(page, "use_flow_failed_single")
-                return False
+                if not _assert_use_flow_all_results(page, artifacts, detail_blocks, detail_names, slow_ms=RP.get_run_profile().slow_ms):
+                    artifacts.save_debug(page, "use_flow_failed_single")
+                    return False
+                ck_commit(ckpt, "use_flow", page)
 
             # もう一度あそぶ（reuse_policy）
+            ck_begin(ckpt, "play_again")
             if not _assert_play_again_policy(page, artifacts, url, lead_params):
                 return False
 
+            ck_commit(ckpt, "play_again", page)
             return True
 
         # =========================
-        # ここから下は “一括ガチャ” の既存ロジック（変更なし）
+        # ここから下は “一括ガチャ” の既存ロジック
         # =========================
 
-        # ① 抽選回数画面（表示チェック）
-        if not _assert_draw_count_screen(page, artifacts, sc):
-            return False
+        if not ck_done(resume, steps, "cards"):
+            # ① 抽選回数画面（表示チェック）
+            ck_begin(ckpt, "draw_count")
+            if not _assert_draw_count_screen(page, artifacts, sc):
+                return False
 
-        # ② 抽選回数は固定ではなく sc.draw_count を使う
-        page.get_by_text(str(draw_count), exact=True).click()
-        page.get_by_text(S.DRAW_START_TEXT, exact=True).click()
+            # forced_results: 抽選APIのレスポンスを指定の並びに差し替える
+            forcer = DrawForcer.for_scenario(lead_params)
+            if forcer is not None and len(forcer.forced) != draw_count:
+                raise ValueError(f"forced_results must have draw_count items: {sc.id}")
+            capture = DrawCapture(page, capture_cfg).attach() if capture_cfg is not None else None
+            if forcer is not None:
+                forcer.attach(page)
 
-        # カード待ち
-        card = page.locator(S.CARD_IMAGE_SELECTOR).first
-        try:
-            card.wait_for(timeout=45000)
-        except PlaywrightTimeoutError:
-            artifacts.save_debug(page, "no_card")
-            return False
+            # 抽選APIの監視/差し替えは、途中で return / 例外になっても必ず外す
+            try:
+                # ② 抽選回数は固定ではなく sc.draw_count を使う
+                page.get_by_text(str(draw_count), exact=True).click()
+                page.get_by_text(S.DRAW_START_TEXT, exact=True).click()
+
+                # カード待ち
+                ck_begin(ckpt, "cards")
+                card = page.locator(S.CARD_IMAGE_SELECTOR).first
+                try:
+                    with timed_wait("gacha.card", "screen") as t:
+                        card.wait_for(timeout=t)
+                except PlaywrightTimeoutError:
+                    artifacts.save_debug(page, "no_card")
+                    return False
 
-        # ② カード画面 UI
-        if not _assert_card_screen_ui(page, artifacts, card):
-            return False
+                # ② カード画面 UI
+                if not _assert_card_screen_ui(page, artifacts, card):
+                    return False
 
-        # 追加：ドット数
-        if not _assert_dots_count(page, artifacts, draw_count):
-            return False
+                # 追加：ドット数
+                if not _assert_dots_count(page, artifacts, draw_count):
+                    return False
 
-        # カードめくり結果収集
-        card_results: List[Dict[str, str]] = []
-        for i in range(draw_count):
-            src = (card.get_attribute("src") or "").strip()
-            alt = normalize_text(card.get_attribute("alt") or "")
-            card_name = pick_result_name(alt)
+                # カードめくり結果収集
+                card_results: List[Dict[str, str]] = []
+                if capture is not None:
+                    card_results = _collect_draw_results_from_network(page, artifacts, capture, card, draw_count)
+                    if card_results is None:
+                        return False
+                else:
+                    for i in range(draw_count):
+                        src = (card.get_attribute("src") or "").strip()
+                        alt = normalize_text(card.get_attribute("alt") or "")
+                        card_name = pick_result_name(alt)
+
+                        if card_name not in ALLOWED_RESULT_NAMES:
+                            artifacts.save_debug(page, f"card_name_invalid_{i+1}")
+                            return False
+
+                        card_results.append({"src": src, "name": card_name})
+
+                        _demo_wait(0.2)
+                        card.click()
+                        fast_forward(page)
+                        if i == draw_count - 1:
+                            break
+                        _wait_next_card(page, card, src)
+
+                if forcer is not None and not _assert_forced_results(page, artifacts, forcer, card_results):
+                    return False
+            finally:
+                if capture is not None:
+                    capture.detach()
+                if forcer is not None:
+                    forcer.detach()
 
-            if card_name not in ALLOWED_RESULT_NAMES:
-                artifacts.save_debug(page, f"card_name_invalid_{i+1}")
-                return False
+            ck_commit(ckpt, "cards", page, url=url, card_results=card_results)
+        else:
+            card_results = resume.outputs["card_results"]
+
+        if not ck_done(resume, steps, "thumbs"):
+            # 上部サムネ
+            ck_begin(ckpt, "thumbs")
+            if draw_count >= 2:
+                try:
+                    with timed_wait("gacha.top_thumbs", "element") as t:
+                        page.locator(S.TOP_THUMB_SELECTOR).first.wait_for(timeout=t)
+                except PlaywrightTimeoutError:
+                    artifacts.save_debug(page, "no_topthumb")
+                    return False
 
-            card_results.append({"src": src, "name": card_name})
+                thumb_srcs = _extract_top_thumbs(page)
+                if len(thumb_srcs) != draw_count:
+                    artifacts.save_debug(page, "topthumb_count_mismatch")
+                    return False
 
-            _demo_wait(0.2)
-            card.click()
-            if i == draw_count - 1:
-                break
-            wait_until_src_changes(card, src, timeout_sec=20.0)
+                card_srcs = [x["src"] for x in card_results]
+                if not all(_srcs_match(thumb_srcs, card_srcs, image_match, src_match)):
+                    artifacts.save_debug(page, "topthumb_order_mismatch")
+                    return False
+            else:
+                if len(_extract_top_thumbs(page)) != 0:
+                    artifacts.save_debug(page, "topthumb_should_not_exist")
+                    return False
+            ck_commit(ckpt, "thumbs", page)
 
-        # 上部サムネ
-        if draw_count >= 2:
+        if not ck_done(resume, steps, "details"):
+            # 詳細
+            ck_begin(ckpt, "details")
             try:
-                page.locator(S.TOP_THUMB_SELECTOR).first.wait_for(timeout=25000)
-            except PlaywrightTimeoutError:
-                artifacts.save_debug(page, "no_topthumb")
-                return False
-
-            thumb_srcs = _extract_top_thumbs(page)
-            if len(thumb_srcs) != draw_count:
-                artifacts.save_debug(page, "topthumb_count_mismatch")
-                return False
+                details = _extract_details_strict(page, draw_count)
+            except Exception:
+                artifacts.save_debug(page, "detail_rule_failed")
+                raise
 
-            card_srcs = [x["src"] for x in card_results]
-            if thumb_srcs != card_srcs:
-                artifacts.save_debug(page, "topthumb_order_mismatch")
+            img_ok = _srcs_match([d["img_src"] for d in details], [c["src"] for c in card_results], image_match, src_match)
+            for i in range(draw_count):
+                if not img_ok[i]:
+                    artifacts.save_debug(page, f"detail_img_src_mismatch_{i+1}")
+                    return False
+                if details[i]["name"] != card_results[i]["name"]:
+                    artifacts.save_debug(page, f"detail_name_mismatch_{i+1}")
+                    return False
+            if not _assert_result_assets(page, artifacts, lead_params, [c["src"] for c in card_results]):
                 return False
+            ck_commit(ckpt, "details", page, details=details)
         else:
-            if len(_extract_top_thumbs(page)) != 0:
-                artifacts.save_debug(page, "topthumb_should_not_exist")
-                return False
-
-        # 詳細
-        try:
-            details = _extract_details_strict(page, draw_count)
-        except Exception:
-            artifacts.save_debug(page, "detail_rule_failed")
-            raise
+            details = resume.outputs["details"]
 
-        for i in range(draw_count):
-            if details[i]["img_src"] != card_results[i]["src"]:
-                artifacts.save_debug(page, f"detail_img_src_mismatch_{i+1}")
-                return False
-            if details[i]["name"] != card_results[i]["name"]:
-                artifacts.save_debug(page, f"detail_name_mismatch_{i+1}")
+        if not ck_done(resume, steps, "use_flow"):
+            # リンク
+            ck_begin(ckpt, "links")
+            try:
+                link_items = _extract_link_items_strict(page)
+            except PlaywrightTimeoutError:
+                artifacts.save_debug(page, "link_rule_failed")
                 return False
 
-        # リンク
-        try:
-            link_items = _extract_link_items_strict(page)
-        except PlaywrightTimeoutError:
-            artifacts.save_debug(page, "link_rule_failed")
-            return False
+            unique_result_names = list(dict.fromkeys([x["name"] for x in card_results]))
+            matched_count = {nm: 0 for nm in unique_result_names}
+            for li in link_items:
+                matched = None
+                for nm in unique_result_names:
+                    if nm in li["button_text"]:
+                        matched = nm
+                        break
+                if matched is None:
+                    artifacts.save_debug(page, f"link_not_matched_{li['index']}")
+                    return False
+                matched_count[matched] += 1
 
-        unique_result_names = list(dict.fromkeys([x["name"] for x in card_results]))
-        matched_count = {nm: 0 for nm in unique_result_names}
-        for li in link_items:
-            matched = None
-            for nm in unique_result_names:
-                if nm in li["button_text"]:
-                    matched = nm
-                    break
-            if matched is None:
-                artifacts.save_debug(page, f"link_not_matched_{li['index']}")
-                return False
-            matched_count[matched] += 1
+            for nm, cnt in matched_count.items():
+                if cnt < 1:
+                    artifacts.save_debug(page, f"link_count_invalid_{nm}_{cnt}")
+                    return False
 
-        for nm, cnt in matched_count.items():
-            if cnt < 1:
-                artifacts.save_debug(page, f"link_count_invalid_{nm}_{cnt}")
+            if not _assert_links_open_new_tab(page, artifacts, link_items, lead_params):
                 return False
 
-        if not _assert_links_open_new_tab(page, artifacts, link_items):
-            return False
-
-        block_sel = S.DETAIL_BLOCK_SELECTOR_SINGLE if draw_count == 1 else S.DETAIL_BLOCK_SELECTOR_MULTI
-        detail_blocks = page.locator(block_sel)
-        detail_names = [d["name"] for d in details]
+            ck_begin(ckpt, "use_flow")
+            detail_blocks = page.locator(block_sel)
+            detail_names = [d["name"] for d in details]
 
-        if not _assert_use_flow_all_results(page, artifacts, detail_blocks, detail_names, slow_ms=400):
-            artifacts.save_debug(page, "use_flow_failed")
-            return False
+            # forced_results は画面用に差し替えた結果（ID がサーバーの抽選結果と違う）なので使用処理はしない
+            if forced_results_for(lead_params) is None:
+                if not _assert_use_flow_all_results(page, artifacts, detail_blocks, detail_names, slow_ms=RP.get_run_profile().slow_ms):
+                    artifacts.save_debug(page, "use_flow_failed")
+                    return False
+            ck_commit(ckpt, "use_flow", page)
 
+        ck_begin(ckpt, "play_again")
         if not _assert_play_again_policy(page, artifacts, url, lead_params):
             return False
 
+        ck_commit(ckpt, "play_again", page)
         return True
 
     except Exception:
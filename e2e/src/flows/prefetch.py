@@ -0,0 +1,108 @@
+# e2e/src/flows/prefetch.py
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+from playwright.sync_api import BrowserContext, Page
+
+from src.core import run_profile as RP
+from src.core.types import Scenario
+from src.core.url import with_random_userid
+from src.flows.gacha_flow import maybe_randomize_userid
+
+
+def pipeline_enabled() -> bool:
+    v = (os.getenv("E2E_PIPELINE") or "").strip().lower()
+    return v in ("1", "true", "yes", "y", "on")
+
+
+def entry_url(sc: Scenario) -> str:
+    """各フローが最初に開くURL（userid ランダム化込み）"""
+    params = sc.lead_params if isinstance(sc.lead_params, dict) else {}
+    if sc.content_type == "diagnose":
+        return with_random_userid(sc.url)
+    return maybe_randomize_userid(sc.url, params)
+
+
+# evaluate を待たせないよう、遷移は次のタスクで開始する（同期APIでもブロックしない）
+_NAVIGATE_JS = "url => { setTimeout(() => { window.location.href = url; }, 0); }"
+
+
+@dataclass
+class PreparedPage:
+    scenario_id: str
+    page: Page
+    url: str
+
+
+class ScenarioPrefetcher:
+    """
+    シナリオ k の終了後（trace 保存の直後、リトライも済んでから）に、
+    シナリオ k+1 のタブを作ってトップURLへの遷移を裏で始めておく。
+    読み込みは先に開始した k+1 の trace に記録される。
+    k+1 の開始時に take() で「読み込み済みのページ」として受け取る。
+    """
+
+    def __init__(self):
+        self._prepared: Optional[PreparedPage] = None
+
+    def prepare(self, sc: Scenario, context: BrowserContext) -> None:
+        if self._prepared is not None:
+            if self._prepared.scenario_id == sc.id:
+                return
+            self.discard()
+
+        url = entry_url(sc)
+        p = context.new_page()
+        try:
+            p.evaluate(_NAVIGATE_JS, url)
+        except Exception:
+            try:
+                p.close()
+            except Exception:
+                pass
+            return
+        self._prepared = PreparedPage(scenario_id=sc.id, page=p, url=url)
+
+    def take(self, sc: Scenario, timeout_ms: Optional[int] = None) -> Optional[PreparedPage]:
+        """
+        準備済みなら domcontentloaded まで待って返す。
+        裏の遷移が失敗していたらここで goto し直す（それも失敗なら None）。
+        """
+        if timeout_ms is None:
+            timeout_ms = RP.timeout_ms("nav")
+        prep = self._prepared
+        self._prepared = None
+        if prep is None:
+            return None
+        if prep.scenario_id != sc.id:
+            try:
+                prep.page.close()
+            except Exception:
+                pass
+            return None
+
+        try:
+            prep.page.wait_for_url(lambda u: u != "about:blank", timeout=timeout_ms)
+            prep.page.wait_for_load_state("domcontentloaded", timeout=timeout_ms)
+        except Exception:
+            try:
+                prep.page.goto(prep.url, wait_until="domcontentloaded", timeout=timeout_ms)
+            except Exception:
+                try:
+                    prep.page.close()
+                except Exception:
+                    pass
+                return None
+        return prep
+
+    def discard(self) -> None:
+        if self._prepared is None:
+            return
+        try:
+            self._prepared.page.close()
+        except Exception:
+            pass
+        self._prepared = None
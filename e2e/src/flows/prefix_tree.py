@@ -0,0 +1,163 @@
+# e2e/src/flows/prefix_tree.py
+"""
+共有プレフィックス（URLを開く → 開始 → リード完了）を1回だけ実行する
+
+プレフィックスは1段しかないので、木ではなく「キー → シナリオ群」の平らなグループで持つ。
+  キー = (content_type, userid を除いたURL, lead_type)
+userid を固定で使うシナリオ（reuse_policy: must_reusable）は共有しない
+（元シナリオの userid を引き継ぐと、使用済みの userid で再利用判定をすることになるため）。
+分岐先の URL の userid は、元シナリオのものではなく自分の sc.url のものに差し替える。
+"""
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
+
+from playwright.sync_api import Browser, BrowserContext, Page
+
+from src.core.types import Scenario
+from src.core.checkpoints import CheckpointRecorder
+from src.core.run_profile import apply_context_timeouts, start_tracing
+
+# 共有プレフィックス = 「URLを開く → 開始 → リード完了」まで
+PrefixKey = Tuple[str, str, str]
+
+
+def prefix_sharing_enabled() -> bool:
+    v = (os.getenv("E2E_PREFIX_SHARING") or "").strip().lower()
+    return v in ("1", "true", "yes", "y", "on")
+
+
+def _strip_userid(url: str) -> str:
+    p = urlparse(url)
+    q = parse_qs(p.query)
+    q.pop("userid", None)
+    return urlunparse((p.scheme, p.netloc, p.path, p.params, urlencode(q, doseq=True), p.fragment))
+
+
+def prefix_key(sc: Scenario) -> Optional[PrefixKey]:
+    """
+    プレフィックスを共有できるシナリオならキーを返す。
+      - リードなし      : 共有する意味がない（goto だけ）
+      - 課金ガチャ       : 購入は副作用があるので共有しない
+      - before_result   : リードが結果直前なので、共有できるのはトップだけ
+      - must_reusable   : userid 固定（元シナリオの userid を使い回すことになる）
+    """
+    params = sc.lead_params if isinstance(sc.lead_params, dict) else {}
+    lead_type = (sc.lead_type or "none").lower()
+    if lead_type == "none":
+        return None
+    if bool(params.get("paid_gacha", False)):
+        return None
+    if (params.get("lead_timing") or "before_start").lower() != "before_start":
+        return None
+    if (params.get("reuse_policy") or "either").strip() == "must_reusable":
+        return None
+    return (sc.content_type, _strip_userid(sc.url), lead_type)
+
+
+def fork_url(prefix_url: str, sc: Scenario) -> str:
+    """プレフィックス完了時のURLの userid を、sc.url の userid（無ければ削除）に差し替える"""
+    p = urlparse(prefix_url)
+    q = parse_qs(p.query)
+    q.pop("userid", None)
+    own = parse_qs(urlparse(sc.url).query).get("userid")
+    if own:
+        q["userid"] = own
+    return urlunparse((p.scheme, p.netloc, p.path, p.params, urlencode(q, doseq=True), p.fragment))
+
+
+def build_prefix_groups(scenarios: List[Scenario]) -> Dict[PrefixKey, List[str]]:
+    """
+    プレフィックスキー → そのプレフィックスを共有するシナリオID（2件以上のものだけ）
+    """
+    tree: Dict[PrefixKey, List[str]] = {}
+    for sc in scenarios:
+        k = prefix_key(sc)
+        if k is None:
+            continue
+        tree.setdefault(k, []).append(sc.id)
+    return {k: ids for k, ids in tree.items() if len(ids) >= 2}
+
+
+def order_by_prefix(scenarios: List[Scenario]) -> List[Scenario]:
+    """
+    同じプレフィックスのシナリオが連続するように並べ替える（初出順は維持）
+    """
+    groups: Dict[Any, List[Scenario]] = {}
+    for sc in scenarios:
+        k = prefix_key(sc) or ("__solo__", sc.id)
+        groups.setdefault(k, []).append(sc)
+    out: List[Scenario] = []
+    for members in groups.values():
+        out.extend(members)
+    return out
+
+
+@dataclass
+class PrefixState:
+    """共有プレフィックス完了時点の状態（リード完了直後）"""
+    url: str
+    storage_state: Dict[str, Any] = field(default_factory=dict)
+
+
+class PrefixCache:
+    """
+    プレフィックスを1回だけ実行し、後続シナリオは
+    「保存した storage_state を入れた新しい context + そのURL」から分岐させる。
+
+    - 最初のシナリオは通常どおり実行し、"lead" checkpoint を保存する
+    - 2件目以降は fork_page() で作った新規 context のページで実行する
+    """
+
+    def __init__(self, scenarios: List[Scenario], launch: Callable[[], Browser]):
+        self.groups = build_prefix_groups(scenarios)
+        self._launch = launch
+        self._browser: Optional[Browser] = None
+        self._states: Dict[PrefixKey, PrefixState] = {}
+
+    def _key(self, sc: Scenario) -> Optional[PrefixKey]:
+        k = prefix_key(sc)
+        if k is None or k not in self.groups:
+            return None
+        return k
+
+    def shares(self, sc: Scenario) -> bool:
+        return self._key(sc) is not None
+
+    def state_for(self, sc: Scenario) -> Optional[PrefixState]:
+        k = self._key(sc)
+        if k is None:
+            return None
+        return self._states.get(k)
+
+    def capture(self, sc: Scenario, ckpt: CheckpointRecorder) -> None:
+        k = self._key(sc)
+        if k is None or k in self._states:
+            return
+        for cp in ckpt.checkpoints:
+            if cp.step == "lead":
+                self._states[k] = PrefixState(url=cp.url, storage_state=cp.storage_state)
+                return
+
+    def fork_page(self, state: PrefixState) -> Page:
+        """
+        分岐用の新規 context（本体の context と同じタイムアウト / tracing で。slow_mo は launch 側）
+        trace は呼び出し側で ctx.tracing.stop する
+        """
+        if self._browser is None:
+            self._browser = self._launch()
+        ctx: BrowserContext = self._browser.new_context(storage_state=state.storage_state or None)
+        apply_context_timeouts(ctx)
+        start_tracing(ctx)
+        return ctx.new_page()
+
+    def close(self) -> None:
+        if self._browser is not None:
+            try:
+                self._browser.close()
+            except Exception:
+                pass
+            self._browser = None
@@ -1,37 +1,226 @@
 # e2e/src/flows/runner.py
 from __future__ import annotations
 
+import time
 from pathlib import Path
 from playwright.sync_api import Page
 
 from src.core.types import Scenario
 from src.core.artifacts import Artifacts
-from src.flows.gacha_flow import run_gacha
+from src.core.run_history import RunHistory, RerunReport
+from src.core.run_profile import start_tracing, stop_tracing
+from src.core.checkpoints import CheckpointRecorder
+from src.core.click_engine import set_click_scope
+from src.core.fast_render import apply_fast_render, fast_render_for
+from src.core.state_reset import reset_origin_state, reset_policy_for
+from src.flows.prefix_tree import PrefixCache
+from src.flows.prefetch import ScenarioPrefetcher
 
 from src.flows.gacha_flow import run_gacha
 from src.flows.diagnose_flow import run_diagnose
 
-def run_scenario(sc: Scenario, page: Page, artifacts_base_dir: Path, tracing_stop) -> bool:
+def run_scenario(
+    sc: Scenario,
+    page: Page,
+    artifacts_base_dir: Path,
+    tracing_stop,
+    resume: bool = False,
+    prefix_cache: PrefixCache | None = None,
+    prefetcher: ScenarioPrefetcher | None = None,
+    trace_name: str = "trace.zip",
+) -> bool:
     """
     tracing_stop は conftest から渡される関数。
-    scenario_id ごとに trace.zip を保存する。
+    scenario_id ごとに trace_name（既定 trace.zip）で保存する。
+
+    resume=True（リトライ時）は、前回の checkpoint から再開できるステップなら途中から実行する。
+    prefix_cache があれば、共有プレフィックス（URL + リード）を実行済みのシナリオは
+    保存済み storage_state を入れた新しい context から分岐させる。
+    prefetcher があれば、前のシナリオの終了後に先読みしたページを使う
+    （次シナリオの先読みは run_scenario_with_retry がリトライ後に1回だけ行う）。
     """
     artifacts = Artifacts(base_dir=artifacts_base_dir, scenario_id=sc.id)
+    set_click_scope(sc.id)
+    ckpt = CheckpointRecorder(artifacts.path("checkpoints.json"), resume=resume)
+
+    prefix = prefix_cache.state_for(sc) if (prefix_cache is not None and not resume) else None
+    fork = prefix_cache.fork_page(prefix) if prefix is not None else None
+
+    prepared = None
+    if prefetcher is not None and fork is None and not resume:
+        prepared = prefetcher.take(sc)
+    cur = fork or (prepared.page if prepared is not None else page)
+    start_url = prepared.url if prepared is not None else None
+
+    # シナリオ間の状態持ち越し（cookie / localStorage / 使用済みフラグ等）をオリジン単位で消す
+    # ※ fork（新規context）と checkpoint 再開（状態を復元する）では不要
+    policy = reset_policy_for(sc)
+    if policy is not None and fork is None and prepared is None and not resume:
+        try:
+            reset_origin_state(cur, policy)
+        except Exception:
+            artifacts.save_debug(cur, "state_reset_failed")
+
+    # アニメーション無効化（シナリオ単位 / 実行単位）
+    fr = fast_render_for(sc)
+    if fr is not None:
+        try:
+            apply_fast_render(cur, fr)
+        except Exception:
+            artifacts.save_debug(cur, "fast_render_failed")
 
     ok = False
     try:
         if sc.content_type == "gacha":
-            return run_gacha(sc, page, artifacts)
+            return run_gacha(sc, cur, artifacts, ckpt=ckpt, prefix=prefix, start_url=start_url)
         if sc.content_type == "diagnose":
-            return run_diagnose(sc, page, artifacts)
+            return run_diagnose(sc, cur, artifacts, ckpt=ckpt, prefix=prefix, start_url=start_url)
         else:
-            artifacts.save_debug(page, "unknown_content_type")
+            artifacts.save_debug(cur, "unknown_content_type")
             raise ValueError(f"Unknown content_type: {sc.content_type}")
 
     finally:
+        if prefix_cache is not None and prefix is None:
+            prefix_cache.capture(sc, ckpt)
+        if fork is not None:
+            # 分岐は別 context なので trace もそちらから保存する
+            stop_tracing(fork.context, str(artifacts.path("trace_fork.zip")))
+            try:
+                fork.context.close()
+            except Exception:
+                pass
+        if prepared is not None:
+            try:
+                prepared.page.close()
+            except Exception:
+                pass
         # trace保存（必ず）
         try:
-            trace_path = str(artifacts.path("trace.zip"))
+            trace_path = str(artifacts.path(trace_name))
             tracing_stop(trace_path)
         except Exception:
             pass
+
+
+def _retry_tracing_stop(context):
+    def _stop(path=None):
+        stop_tracing(context, path)
+
+    return _stop
+
+
+def _prefetch_next(
+    page: Page,
+    prefix_cache: PrefixCache | None,
+    prefetcher: ScenarioPrefetcher | None,
+    next_sc: Scenario | None,
+) -> None:
+    """
+    次シナリオの先読み（このシナリオの trace 保存後に1回だけ）。
+    先に次シナリオ用の trace を始めておき、読み込みはそちらに記録させる
+    （conftest の start_tracing がこの trace を引き継ぐ）。
+    次シナリオが状態リセット対象なら、リセット前に読み込んでも意味がないので先読みしない
+    """
+    if prefetcher is None or next_sc is None:
+        return
+    if prefix_cache is not None and prefix_cache.shares(next_sc):
+        return
+    if reset_policy_for(next_sc) is not None:
+        return
+    start_tracing(page.context)
+    try:
+        prefetcher.prepare(next_sc, page.context)
+    except Exception:
+        pass
+
+
+def run_scenario_with_retry(
+    sc: Scenario,
+    page: Page,
+    artifacts_base_dir: Path,
+    tracing_stop,
+    history: RunHistory,
+    report: RerunReport | None = None,
+    prefix_cache: PrefixCache | None = None,
+    prefetcher: ScenarioPrefetcher | None = None,
+    next_sc: Scenario | None = None,
+) -> bool:
+    """
+    失敗したシナリオだけを、そのシナリオのフレーク率から決めた回数まで再実行する。
+    （スイート全体の再実行はしない）
+
+    - リトライは毎回新しいタブで行う（同じ context = 同じプロファイル）
+    - trace は試行ごとに取り直す（trace.zip / trace_retry1.zip …）
+    - 再実行可能なステップで落ちた場合は checkpoint から途中再開する
+    - 結果は history（run間で持ち越し）と report（今回のrunのリトライコスト）に記録
+    - next_sc の先読みはリトライを終えてから1回だけ
+    """
+    budget = history.retry_budget(sc.id)
+
+    attempts = 0
+    first_sec = 0.0
+    rerun_sec = 0.0
+    cur = page
+    last_exc: Exception | None = None
+    ok = False
+
+    stop = tracing_stop
+    while True:
+        attempts += 1
+        t0 = time.time()
+        last_exc = None
+        try:
+            ok = run_scenario(
+                sc,
+                cur,
+                artifacts_base_dir,
+                stop,
+                resume=attempts > 1,
+                prefix_cache=prefix_cache,
+                prefetcher=prefetcher,
+                trace_name="trace.zip" if attempts == 1 else f"trace_retry{attempts - 1}.zip",
+            )
+        except Exception as e:
+            ok = False
+            last_exc = e
+        elapsed = time.time() - t0
+
+        if attempts == 1:
+            first_sec = elapsed
+        else:
+            rerun_sec += elapsed
+
+        if ok or attempts > budget:
+            break
+
+        # 次の試行は新しいタブで（前回の状態を引きずらない）
+        if cur is not page:
+            try:
+                cur.close()
+            except Exception:
+                pass
+        cur = page.context.new_page()
+        # 前の試行の finally で trace は止まっているので取り直す
+        stop = _retry_tracing_stop(page.context) if start_tracing(page.context) else (lambda path=None: None)
+
+    if cur is not page:
+        try:
+            cur.close()
+        except Exception:
+            pass
+
+    # trace は最後の試行の finally で保存済み
+    _prefetch_next(page, prefix_cache, prefetcher, next_sc)
+
+    if ok:
+        outcome = "pass" if attempts == 1 else "flaky"
+    else:
+        outcome = "fail"
+
+    history.record(sc.id, outcome, reruns=attempts - 1, rerun_sec=rerun_sec)
+    if report is not None:
+        report.add(sc.id, outcome, attempts=attempts, first_sec=first_sec, rerun_sec=rerun_sec)
+
+    if last_exc is not None:
+        raise last_exc
+    return ok
@@ -4,6 +4,7 @@ import time
 from playwright.sync_api import Page, TimeoutError as PlaywrightTimeoutError
 
 from src.core.artifacts import Artifacts
+from src.core import run_profile as RP
 from src.core.exceptions import LeadSkipped
 from src.selectors import gacha_selectors as S
 
@@ -63,7 +64,7 @@ def _click_submit_in_iframe(page: Page) -> None:
     btn = fl.locator(HUBSPOT_SUBMIT_SELECTOR).first
     # HubSpotはたまに “label が上に被る/レイアウト揺れ” があるので force も許可
     btn.scroll_into_view_if_needed()
-    btn.click(timeout=25000, force=True)
+    btn.click(timeout=RP.timeout_ms("element"), force=True)
 
 
 def _assert_required_errors_in_iframe(page: Page, expected_min: int = 1) -> None:
@@ -109,8 +110,8 @@ def apply_embed_form_lead(page: Page, artifacts: Artifacts) -> Page:
     # 1) iframe表示確認
     iframe = page.locator(HUBSPOT_IFRAME_SELECTOR).first
     try:
-        iframe.wait_for(state="attached", timeout=20000)
-        iframe.wait_for(state="visible", timeout=20000)
+        iframe.wait_for(state="attached", timeout=RP.timeout_ms("action"))
+        iframe.wait_for(state="visible", timeout=RP.timeout_ms("action"))
     except Exception:
         artifacts.save_debug(page, "embed_form_iframe_not_visible")
         raise AssertionError("埋め込みフォーム(iframe)が表示されません")
@@ -142,7 +143,7 @@ def apply_embed_form_lead(page: Page, artifacts: Artifacts) -> Page:
         raise
 
     # 4) 抽選回数 or CAPTCHA を待つ
-    deadline = time.time() + 25.0
+    deadline = time.time() + RP.timeout_sec("element")
     while time.time() < deadline:
         if _captcha_error_visible(page):
             # CAPTCHAが出たら “進めない” のでテスト都合でSKIP
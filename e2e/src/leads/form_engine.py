@@ -0,0 +1,328 @@
+# e2e/src/leads/form_engine.py
+"""
+フォームリードの入力エンジン（lead_params.form_fields で項目を宣言する）
+
+    form_fields:
+      - label: メールアドレス          # FormControl をラベル文言で探す（省略時はページ全体）
+        type: text                     # text / phone / select / checkbox / radio / file
+        env: FORM_TEST_EMAIL           # 値は環境変数 → value の順
+        value: test@example.com
+        required: true                 # 必須バッジ / 未入力エラーを確認する
+      - label: 電話番号
+        type: phone
+        names: [mobilePhoneId, carrierNumber, identifierNumber]   # name 指定（分割入力など）
+        value: "080-1234-5678"
+      - type: checkbox
+        selector: "[data-scope='checkbox'][data-part='root']"     # 要素を直接指定
+        value: [規約に同意]            # 項目の文言（省略時は先頭1つ）
+
+  - resolve()         : evaluate 1回で全項目の要素を探して印（data-e2e-field）を付け、
+                        見つからない項目 / 必須バッジの有無を返す
+  - required_errors() : 未入力エラーが出ていない必須項目（再描画に備えて解決し直してから evaluate 1回）
+  - fill_all()        : テキスト/select はネイティブ setter + input/change、チェック/ラジオは
+                        項目の click をまとめて evaluate 1回で入れ、結果も1回で確認する
+                        （確認で外れた項目だけ Playwright の fill / click で入れ直す）
+項目数が増えても往復回数は増えない。
+"""
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List
+
+from playwright.sync_api import Page
+
+from src.core.click_engine import confirm_click, smart_click
+from src.core.timeout_policy import timed_wait
+from src.selectors import form_selectors as FS
+
+FIELD_TYPES = ("text", "phone", "select", "checkbox", "radio", "file")
+
+# type ごとの既定の対象要素（label があればその FormControl 内、無ければページ全体から探す）
+_TARGETS = {
+    "text": "input.chakra-input, textarea",
+    "phone": "input",
+    "select": "select",
+    "checkbox": "[data-scope='checkbox'][data-part='root']",
+    "radio": "[data-scope='radio-group'][data-part='item']",
+    "file": "input[type='file']",
+}
+
+_RESOLVE_JS = """
+(a) => {
+  const norm = s => (s || '').replace(/\\s+/g, ' ').trim();
+  document.querySelectorAll('[data-e2e-field], [data-e2e-ctrl]').forEach(e => {
+    e.removeAttribute('data-e2e-field');
+    e.removeAttribute('data-e2e-ctrl');
+  });
+  const controls = Array.from(document.querySelectorAll(a.controlSelector));
+
+  return a.fields.map((f, i) => {
+    let scope = document;
+    let ctrl = null;
+    if (f.label) {
+      ctrl = controls.find(c => norm(c.textContent).includes(f.label));
+      if (!ctrl) return { found: false, badge: false };
+      scope = ctrl;
+    }
+
+    let els;
+    if (f.names && f.names.length) {
+      const q = n => `[name="${CSS.escape(n)}"]`;
+      els = f.names.map(n => scope.querySelector(q(n)) || document.querySelector(q(n)));
+    } else {
+      let all = Array.from(scope.querySelectorAll(f.selector));
+      if (f.type === 'checkbox' || f.type === 'radio') {
+        const want = (f.items || []);
+        all = want.length
+          ? want.map(w => all.find(e => norm(e.textContent).includes(w)))
+          : all.slice(0, 1);
+      } else if (f.type === 'phone') {
+        all = all.slice(0, Math.max(1, f.parts));
+      } else {
+        all = all.slice(0, 1);
+      }
+      els = all;
+    }
+    if (!els.length || els.some(e => !e)) return { found: false, badge: false };
+
+    els.forEach((e, k) => e.setAttribute('data-e2e-field', `${i}-${k}`));
+    ctrl = ctrl || els[0].closest(a.controlSelector);
+    if (ctrl) ctrl.setAttribute('data-e2e-ctrl', String(i));
+    return { found: true, badge: !!ctrl && norm(ctrl.textContent).includes(a.badgeText) };
+  });
+}
+"""
+
+_REQUIRED_ERRORS_JS = """
+(a) => a.indexes.filter(i => {
+  const c = document.querySelector(`[data-e2e-ctrl="${i}"]`);
+  return !c || !(c.textContent || '').includes(a.errorText);
+})
+"""
+
+_FILL_JS = """
+(ops) => {
+  const setValue = (el, v) => {
+    const proto = el instanceof HTMLTextAreaElement ? HTMLTextAreaElement.prototype
+      : el instanceof HTMLSelectElement ? HTMLSelectElement.prototype
+      : HTMLInputElement.prototype;
+    Object.getOwnPropertyDescriptor(proto, 'value').set.call(el, v);
+    el.dispatchEvent(new Event('input', { bubbles: true }));
+    el.dispatchEvent(new Event('change', { bubbles: true }));
+  };
+  for (const op of ops) {
+    const el = document.querySelector(`[data-e2e-field="${op.key}"]`);
+    if (!el) continue;
+    if (op.kind === 'value') {
+      setValue(el, op.value);
+    } else if (op.kind === 'select') {
+      const v = op.value != null ? op.value
+        : (Array.from(el.options).map(o => o.value).find(v => v.trim() !== '') || '');
+      if (v !== '') setValue(el, v);
+    } else if (op.kind === 'check') {
+      if ((el.getAttribute('data-state') || '') !== 'checked') el.click();
+    }
+  }
+}
+"""
+
+_VERIFY_JS = """
+(ops) => ops.filter(op => {
+  const el = document.querySelector(`[data-e2e-field="${op.key}"]`);
+  if (!el) return true;
+  if (op.kind === 'value') return el.value !== op.value;
+  if (op.kind === 'select') return op.value != null ? el.value !== op.value : el.value.trim() === '';
+  const inp = el.matches('input') ? el : el.querySelector('input');
+  const checked = inp ? inp.checked : (el.getAttribute('data-state') === 'checked');
+  return !checked;
+}).map(op => op.key)
+"""
+
+
+@dataclass(frozen=True)
+class FormField:
+    type: str
+    label: str = ""
+    names: tuple = ()
+    selector: str = ""
+    value: Any = None
+    env: str = ""
+    required: bool = False
+    attach: bool = False
+
+    @property
+    def key(self) -> str:
+        return self.label or ",".join(self.names) or self.selector or self.type
+
+    def resolved_value(self) -> Any:
+        if self.env and os.getenv(self.env) is not None:
+            return os.getenv(self.env)
+        return self.value
+
+    def parts(self) -> List[str]:
+        """phone の分割値（'080-1234-5678' / [080, 1234, 5678]）"""
+        v = self.resolved_value()
+        if v is None:
+            return []
+        if isinstance(v, (list, tuple)):
+            return [str(x) for x in v]
+        return [p for p in str(v).split("-") if p]
+
+    def items(self) -> List[str]:
+        """checkbox / radio で選ぶ項目の文言（省略時は先頭1つ）"""
+        v = self.resolved_value()
+        if v is None or v is True:
+            return []
+        if isinstance(v, (list, tuple)):
+            return [str(x) for x in v]
+        return [str(v)]
+
+
+# form_fields 未指定時（従来のフォームリードと同じ内容）
+DEFAULT_FORM_FIELDS = (
+    FormField(type="text", label="メールアドレス", env="FORM_TEST_EMAIL", value="test@example.com", required=True),
+    FormField(type="text", label="テキスト", env="FORM_TEST_TEXT", value="E2Eテスト", required=True),
+    FormField(
+        type="phone",
+        label="電話番号",
+        names=("mobilePhoneId", "carrierNumber", "identifierNumber"),
+        value="080-1234-5678",
+        required=True,
+    ),
+    FormField(type="select", selector="[data-scope='select'] select"),
+    FormField(type="checkbox"),
+    FormField(type="radio"),
+    FormField(type="file", selector="[data-scope='file-upload'] input[type='file']"),
+)
+
+
+def form_fields_for(lead_params: Dict[str, Any] | None) -> List[FormField]:
+    raw = (lead_params or {}).get("form_fields")
+    if raw is None:
+        return list(DEFAULT_FORM_FIELDS)
+    if not isinstance(raw, list):
+        raise ValueError("form_fields must be a list")
+    out = []
+    for d in raw:
+        t = str(d.get("type", "text")).strip().lower()
+        if t not in FIELD_TYPES:
+            raise ValueError(f"Unknown form field type: {t}")
+        names = d.get("names") or ([d["name"]] if d.get("name") else [])
+        out.append(
+            FormField(
+                type=t,
+                label=str(d.get("label") or ""),
+                names=tuple(str(n) for n in names),
+                selector=str(d.get("selector") or ""),
+                value=d.get("value"),
+                env=str(d.get("env") or ""),
+                required=bool(d.get("required", False)),
+                attach=bool(d.get("attach", False)),
+            )
+        )
+    return out
+
+
+class FormEngine:
+    def __init__(self, page: Page, fields: List[FormField]):
+        self.page = page
+        self.fields = fields
+
+    # ---------------- 解決 / 表示チェック ----------------
+    def resolve(self) -> List[Dict[str, Any]]:
+        """全項目を1回で探す。戻り値は fields と同順の {found, badge}"""
+        spec = [
+            {
+                "type": f.type,
+                "label": f.label,
+                "names": list(f.names),
+                "selector": f.selector or _TARGETS[f.type],
+                "items": f.items() if f.type in ("checkbox", "radio") else [],
+                "parts": len(f.parts()) if f.type == "phone" else 1,
+            }
+            for f in self.fields
+        ]
+        return self.page.evaluate(
+            _RESOLVE_JS,
+            {"fields": spec, "controlSelector": "div.MuiFormControl-root", "badgeText": FS.REQUIRED_BADGE_TEXT},
+        )
+
+    def missing(self, report: List[Dict[str, Any]]) -> List[str]:
+        return [f.key for f, r in zip(self.fields, report) if not r.get("found")]
+
+    def missing_badges(self, report: List[Dict[str, Any]]) -> List[str]:
+        return [f.key for f, r in zip(self.fields, report) if f.required and not r.get("badge")]
+
+    def required_errors(self) -> List[str]:
+        """
+        未入力エラー（必須です）が出ていない必須項目。
+        送信でフォームが再描画されると印（data-e2e-ctrl）が外れるので、解決し直してから見る
+        """
+        idx = [i for i, f in enumerate(self.fields) if f.required]
+        if not idx:
+            return []
+        self.resolve()
+        bad = self.page.evaluate(_REQUIRED_ERRORS_JS, {"indexes": idx, "errorText": FS.REQUIRED_ERROR_TEXT})
+        return [self.fields[i].key for i in bad]
+
+    # ---------------- 入力 ----------------
+    def _ops(self) -> List[Dict[str, Any]]:
+        ops: List[Dict[str, Any]] = []
+        for i, f in enumerate(self.fields):
+            if f.type == "text":
+                v = f.resolved_value()
+                if v is not None:
+                    ops.append({"key": f"{i}-0", "kind": "value", "value": str(v)})
+            elif f.type == "phone":
+                for k, p in enumerate(f.parts()):
+                    ops.append({"key": f"{i}-{k}", "kind": "value", "value": p})
+            elif f.type == "select":
+                v = f.resolved_value()
+                ops.append({"key": f"{i}-0", "kind": "select", "value": None if v is None else str(v)})
+            elif f.type in ("checkbox", "radio"):
+                for k in range(max(1, len(f.items()))):
+                    ops.append({"key": f"{i}-{k}", "kind": "check"})
+        return ops
+
+    def _refill(self, op: Dict[str, Any]) -> None:
+        """まとめて入れて外れた項目だけ、Playwright の操作で入れ直す"""
+        loc = self.page.locator(f"[data-e2e-field='{op['key']}']").first
+        with timed_wait(f"form.refill_{op['kind']}", "action") as t:
+            if op["kind"] == "value":
+                loc.fill(op["value"], timeout=t)
+            elif op["kind"] == "select":
+                if op["value"] is not None:
+                    loc.select_option(value=op["value"], timeout=t)
+                else:
+                    values = loc.evaluate("el => Array.from(el.options).map(o => o.value).filter(v => v.trim() !== '')")
+                    if values:
+                        loc.select_option(value=values[0], timeout=t)
+            else:
+                smart_click(loc, name="form.check_item", timeout_ms=t)
+        if op["kind"] == "check":
+            confirm_click("form.check_item", ok=not self.page.evaluate(_VERIFY_JS, [op]))
+
+    def fill_all(self, artifacts=None) -> None:
+        ops = self._ops()
+        if ops:
+            self.page.evaluate(_FILL_JS, ops)
+            bad = set(self.page.evaluate(_VERIFY_JS, ops))
+            if bad:
+                for op in ops:
+                    if op["key"] in bad:
+                        self._refill(op)
+                still = self.page.evaluate(_VERIFY_JS, [op for op in ops if op["key"] in bad])
+                if still:
+                    raise AssertionError(f"フォーム入力が反映されません: {still}")
+
+        # 添付（attach: true の項目だけ）
+        for i, f in enumerate(self.fields):
+            if f.type != "file" or not f.attach or artifacts is None:
+                continue
+            dummy = Path(artifacts.base_dir) / artifacts.scenario_id / "upload_dummy.txt"
+            dummy.parent.mkdir(parents=True, exist_ok=True)
+            if not dummy.exists():
+                dummy.write_text("dummy", encoding="utf-8")
+            self.page.locator(f"[data-e2e-field='{i}-0']").first.set_input_files(str(dummy))
@@ -28,9 +28,9 @@ def apply_lead(sc: Scenario, page: Page, artifacts: Artifacts, phase: str = "bef
     if lead_type == "line":
         return apply_line_lead(page, artifacts)
     if lead_type == "sns":
-        return apply_sns_lead(page, artifacts)
+        return apply_sns_lead(page, artifacts, lead_params)
     if lead_type == "form":
-        return apply_form_lead(page, artifacts)
+        return apply_form_lead(page, artifacts, lead_params)
     if lead_type == "embed_form":
         return apply_embed_form_lead(page, artifacts)
 
@@ -4,6 +4,10 @@ import os
 from playwright.sync_api import Page, TimeoutError as PlaywrightTimeoutError
 
 from src.core.artifacts import Artifacts
+from src.core import run_profile as RP
+from src.core.click_engine import click_first, confirm_click
+from src.core.screen_watcher import SCREEN_PRIORITY, get_screen_watcher
+from src.core.timeout_policy import timed_wait
 from src.selectors import line_selectors as L
 
 
@@ -12,27 +16,33 @@ def _is_line_domain(url: str) -> bool:
     return ("access.line.me" in u) or ("line.me" in u)
 
 
-def _safe_click(locator, timeout_ms: int = 15000) -> None:
-    locator.first.wait_for(timeout=timeout_ms)
-    try:
-        locator.first.scroll_into_view_if_needed(timeout=timeout_ms)
-    except Exception:
-        pass
+def _find_post_login_gacha_page(context, timeout_sec: float = 90.0) -> Page:
+    """
+    LINEログイン後に戻ってくるページを探す。
+    画面ウォッチャー（各ページから画面の変化が push される）で、描画された時点で拾う。
+    ウォッチャーが入らない/報告が来ない場合は従来の総当たり判定を使う。
+    """
     try:
-        locator.first.click(timeout=timeout_ms)
-        return
+        watcher = get_screen_watcher(context)
     except Exception:
-        pass
+        return _scan_post_login_gacha_page(context, timeout_sec=timeout_sec)
+
     try:
-        locator.first.click(timeout=timeout_ms, force=True)
-        return
-    except Exception:
-        pass
-    locator.first.evaluate("el => el.click()")
+        with watcher.watching():
+            p, _ = watcher.wait_for_screen(
+                SCREEN_PRIORITY,
+                timeout_ms=int(timeout_sec * 1000),
+                exclude=lambda p: _is_line_domain(p.url),
+            )
+        return p
+    except PlaywrightTimeoutError:
+        # レポーターを入れられなかったページ向けに、従来判定で1回だけ見る
+        return _scan_post_login_gacha_page(context, timeout_sec=0)
 
-def _find_post_login_gacha_page(context, timeout_sec: float = 90.0) -> Page:
+
+def _scan_post_login_gacha_page(context, timeout_sec: float = 90.0) -> Page:
     """
-    LINEログイン後に戻ってくるページを探す。
+    全ページ × 画面判定 の総当たり（ウォッチャーが使えないときの従来処理）。
 
     優先順位:
       1) 一括：抽選回数指定画面（1〜10がある画面）
@@ -95,7 +105,7 @@ def _find_post_login_gacha_page(context, timeout_sec: float = 90.0) -> Page:
         except Exception:
             return False
 
-    while time.time() < end:
+    while True:
         pages = list(context.pages)
 
         # 1) 一括（回数指定）を優先
@@ -138,6 +148,8 @@ def _find_post_login_gacha_page(context, timeout_sec: float = 90.0) -> Page:
             except Exception:
                 pass
 
+        if time.time() >= end:
+            break
         time.sleep(0.4)
 
     raise PlaywrightTimeoutError(
@@ -209,29 +221,29 @@ def _handle_line_login_if_needed(line_page, artifacts) -> bool:
 
         try:
             # 入力
-            email_input.first.wait_for(state="visible", timeout=25000)
-            pass_input.first.wait_for(state="visible", timeout=25000)
+            email_input.first.wait_for(state="visible", timeout=RP.timeout_ms("element"))
+            pass_input.first.wait_for(state="visible", timeout=RP.timeout_ms("element"))
 
-            email_input.first.fill(email, timeout=25000)
-            pass_input.first.fill(password, timeout=25000)
+            email_input.first.fill(email, timeout=RP.timeout_ms("element"))
+            pass_input.first.fill(password, timeout=RP.timeout_ms("element"))
 
             # submitボタン（disabled解除を待つ）
             submit_btn = line_page.locator("button[type='submit']:has-text('ログイン'), button:has-text('ログイン')")
-            submit_btn.first.wait_for(state="visible", timeout=25000)
+            submit_btn.first.wait_for(state="visible", timeout=RP.timeout_ms("element"))
 
             # disabled が外れるまで少し待つ（UI実装によっては即外れない）
-            line_page.wait_for_timeout(300)  # 見やすさ & 安定化
+            line_page.wait_for_timeout(RP.settle_ms())  # 見やすさ & 安定化
             try:
                 line_page.wait_for_function(
                     "(el) => !el.disabled",
                     submit_btn.first,
-                    timeout=25000,
+                    timeout=RP.timeout_ms("element"),
                 )
             except Exception:
                 # disabled属性が無い実装もあるので、クリック自体は試す
                 pass
 
-            submit_btn.first.click(timeout=25000)
+            submit_btn.first.click(timeout=RP.timeout_ms("element"))
             return True
 
         except Exception:
@@ -246,8 +258,8 @@ def _handle_line_login_if_needed(line_page, artifacts) -> bool:
         return False
 
     try:
-        login_btn.first.wait_for(state="visible", timeout=25000)
-        login_btn.first.click(timeout=25000)
+        login_btn.first.wait_for(state="visible", timeout=RP.timeout_ms("element"))
+        login_btn.first.click(timeout=RP.timeout_ms("element"))
         return True
     except Exception:
         artifacts.save_debug(line_page, "line_login_click_failed")
@@ -256,7 +268,7 @@ def _handle_line_login_if_needed(line_page, artifacts) -> bool:
 def _click_line_login_trigger(modal: Page, artifacts: Artifacts, page: Page) -> bool:
     """
     あなたのDOMは button ではなく div/img なので、
-    クリック対象を段階的に変えて押し切る。
+    クリック対象を段階的に変えて押し切る（押せた候補は学習して次回の先頭にする）。
     """
     img = modal.locator(L.LINE_LOGIN_IMG_SELECTOR)
     txt = modal.locator(L.LINE_LOGIN_TEXT_SELECTOR)
@@ -281,14 +293,10 @@ def _click_line_login_trigger(modal: Page, artifacts: Artifacts, page: Page) ->
         artifacts.save_debug(page, "line_trigger_not_found")
         return False
 
-    for name, loc in candidates:
-        try:
-            _safe_click(loc, timeout_ms=12000)
-            time.sleep(0.4)
-            return True
-        except Exception:
-            # 次の候補へ
-            continue
+    # 前回までに押せた候補から試す（click_history.json）
+    if click_first("line.login_trigger", candidates, timeout_ms=RP.timeout_ms("short")) is not None:
+        RP.pause(0.4)
+        return True
 
     artifacts.save_debug(page, "line_trigger_click_failed")
     return False
@@ -303,18 +311,30 @@ def apply_line_lead(page: Page, artifacts: Artifacts) -> Page:
     # ① モーダル待ち
     modal = page.locator(L.LINE_MODAL_SELECTOR)
     try:
-        modal.first.wait_for(timeout=25000)
+        with timed_wait("line.modal", "element") as t:
+            modal.first.wait_for(timeout=t)
     except PlaywrightTimeoutError:
         artifacts.save_debug(page, "line_modal_missing")
         return page
 
     # 文言確認
     try:
-        modal.get_by_text(L.LINE_MODAL_TEXT).first.wait_for(timeout=12000)
+        modal.get_by_text(L.LINE_MODAL_TEXT).first.wait_for(timeout=RP.timeout_ms("short"))
     except PlaywrightTimeoutError:
         artifacts.save_debug(page, "line_modal_text_missing")
         return page
 
+    # 戻り先の画面を描画された時点で拾えるよう、ログイン前から戻るまでの間だけウォッチャーで監視する
+    try:
+        watcher = get_screen_watcher(page.context)
+    except Exception:
+        return _login_and_return(page, modal, artifacts)
+    with watcher.watching():
+        return _login_and_return(page, modal, artifacts)
+
+
+def _login_and_return(page: Page, modal, artifacts: Artifacts) -> Page:
+    """② LINEでログイン → ③ ログイン → 抽選画面のページを返す（失敗時は page）"""
     before_pages = set(page.context.pages)
 
     # ② 「LINEでログイン」を押す（buttonでない前提で押し切る）
@@ -323,10 +343,12 @@ def apply_line_lead(page: Page, artifacts: Artifacts) -> Page:
         return page
 
     # LINEページ取得
-    line_page = _get_line_page_after_click(page, before_pages, timeout_sec=20.0)
+    line_page = _get_line_page_after_click(page, before_pages, timeout_sec=RP.timeout_sec("action"))
+    # LINE が開いたときだけ押した候補/段階を確定（開かなければ減点して次回は後ろへ）
+    confirm_click("line.login_trigger", ok=_is_line_domain(line_page.url))
 
     try:
-        line_page.wait_for_load_state("domcontentloaded", timeout=30000)
+        line_page.wait_for_load_state("domcontentloaded", timeout=RP.timeout_ms("nav"))
     except Exception:
         pass
 
@@ -345,7 +367,7 @@ def apply_line_lead(page: Page, artifacts: Artifacts) -> Page:
 
     # 抽選スタート画面へ戻る
     try:
-        draw_page = _find_post_login_gacha_page(page.context, timeout_sec=90.0)
+        draw_page = _find_post_login_gacha_page(page.context, timeout_sec=RP.timeout_sec("long"))
 
         try:
             draw_page.bring_to_front()
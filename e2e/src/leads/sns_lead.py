@@ -1,32 +1,20 @@
 # src/leads/sns_lead.py
 from __future__ import annotations
 
+import os
 import time
-from playwright.sync_api import Page
+from typing import Any, Dict, List
+
+from playwright.sync_api import Page, Route
 
 from src.core.artifacts import Artifacts
+from src.core import run_profile as RP
+from src.core.click_engine import confirm_click, smart_click
+from src.core.timeout_policy import timed_wait
+from src.core.link_check import LinkTarget, open_links_in_new_tabs, url_matches
 from src.selectors import sns_selectors as SS
 
 
-def _safe_click(page: Page, locator, timeout_ms: int = 20000) -> None:
-    locator.first.wait_for(state="attached", timeout=timeout_ms)
-    try:
-        locator.first.scroll_into_view_if_needed(timeout=timeout_ms)
-    except Exception:
-        pass
-    try:
-        locator.first.click(timeout=timeout_ms)
-        return
-    except Exception:
-        pass
-    try:
-        locator.first.click(timeout=timeout_ms, force=True)
-        return
-    except Exception:
-        pass
-    locator.first.evaluate("el => el.click()")
-
-
 def _is_cta_enabled(modal, cta_selector: str) -> bool:
     cta = modal.locator(cta_selector).first
     if cta.count() < 1:
@@ -53,27 +41,6 @@ def _is_cta_enabled(modal, cta_selector: str) -> bool:
     return True
 
 
-def _open_link_in_new_tab(page: Page, a, artifacts: Artifacts, tag: str) -> None:
-    ctx = page.context
-    href = (a.get_attribute("href") or "").strip()
-    if not href:
-        artifacts.save_debug(page, f"{tag}_href_empty")
-        raise AssertionError("SNSリンクhrefが空です")
-
-    with ctx.expect_page(timeout=20000) as pinfo:
-        _safe_click(page, a, timeout_ms=20000)
-
-    newp = pinfo.value
-    try:
-        newp.wait_for_load_state("domcontentloaded", timeout=30000)
-    except Exception:
-        pass
-    try:
-        newp.close()
-    except Exception:
-        pass
-
-
 def _wait_until_checks_ready(modal, expected_green: int, timeout_sec: float = 25.0) -> None:
     """
     最終的に
@@ -100,7 +67,144 @@ def _wait_until_checks_ready(modal, expected_green: int, timeout_sec: float = 25
     )
 
 
-def apply_sns_lead(page: Page, artifacts: Artifacts) -> Page:
+# ---------------- fast モード ----------------
+# gray/green/CTA をページ内で1回で数え、MutationObserver で「整った」瞬間に resolve する
+# timeout=0 なら今の状態をそのまま返す
+_CHECK_STATE_JS = """
+(root, a) => new Promise(resolve => {
+  const ctaEnabled = () => {
+    const cta = Array.from(root.querySelectorAll(a.ctaBase))
+      .find(e => (e.textContent || '').includes(a.ctaText));
+    if (!cta) return false;
+    if ((cta.getAttribute('aria-disabled') || '').trim().toLowerCase() === 'true') return false;
+    if (a.disabledCls && (cta.getAttribute('class') || '').includes(a.disabledCls)) return false;
+    return getComputedStyle(cta).pointerEvents !== 'none';
+  };
+  const state = () => ({
+    gray: root.querySelectorAll(a.gray).length,
+    green: root.querySelectorAll(a.green).length,
+    enabled: ctaEnabled(),
+  });
+  const ready = s => s.gray === 0 && s.green === a.expected && s.enabled;
+
+  const s0 = state();
+  if (a.timeout <= 0 || ready(s0)) { resolve({ ...s0, ready: ready(s0) }); return; }
+
+  let timer = null;
+  const obs = new MutationObserver(() => {
+    const s = state();
+    if (!ready(s)) return;
+    obs.disconnect();
+    clearTimeout(timer);
+    resolve({ ...s, ready: true });
+  });
+  obs.observe(root, { subtree: true, childList: true, attributes: true, attributeFilter: ['class', 'aria-disabled', 'style'] });
+  timer = setTimeout(() => { obs.disconnect(); const s = state(); resolve({ ...s, ready: ready(s) }); }, a.timeout);
+})
+"""
+
+# 全リンクを1回の evaluate でまとめて押す（ポップアップブロックは --disable-popup-blocking で無効。常駐ブラウザも同じ）
+_CLICK_ALL_JS = "els => els.forEach(e => e.click())"
+
+# スタブで返す遷移先（SNS 側は読み込まない）
+_STUB_HTML = "<!doctype html><meta charset='utf-8'><title>e2e sns stub</title>"
+
+
+def _truthy(v: Any) -> bool:
+    if isinstance(v, bool):
+        return v
+    return str(v or "").strip().lower() in ("1", "true", "yes", "y", "on")
+
+
+def sns_mode(lead_params: Dict[str, Any] | None) -> str:
+    """
+    lead_params.sns_mode / E2E_SNS_MODE
+      - tabs : 1件ずつ新規タブで開き、commit を確認（既定）
+      - fast : 全リンクをまとめて押し、出来たタブはすぐ閉じる。チェックの変化は observer で待つ
+    """
+    params = lead_params or {}
+    mode = (params.get("sns_mode") or os.getenv("E2E_SNS_MODE") or "tabs").strip().lower()
+    if mode not in ("tabs", "fast"):
+        raise ValueError(f"Unknown sns_mode: {mode}")
+    return mode
+
+
+def _sns_stub_enabled(lead_params: Dict[str, Any] | None) -> bool:
+    """fast モードで遷移先をスタブ応答にするか（lead_params.sns_stub / E2E_SNS_STUB、既定 true）"""
+    params = lead_params or {}
+    v = params.get("sns_stub")
+    if v is None:
+        v = os.getenv("E2E_SNS_STUB", "true")
+    return _truthy(v)
+
+
+def _check_state(modal, expected_green: int, timeout_ms: int = 0) -> Dict[str, Any]:
+    return modal.first.evaluate(
+        _CHECK_STATE_JS,
+        {
+            "gray": SS.SNS_CHECK_GRAY_SELECTOR,
+            "green": SS.SNS_CHECK_GREEN_SELECTOR,
+            "ctaBase": SS.SNS_CTA_BASE_SELECTOR,
+            "ctaText": SS.SNS_CTA_TEXT,
+            "disabledCls": getattr(SS, "SNS_CTA_DISABLED_CLASS", ""),
+            "expected": expected_green,
+            "timeout": timeout_ms,
+        },
+    )
+
+
+def _wait_until_checks_observed(modal, expected_green: int, timeout_ms: int) -> None:
+    """_wait_until_checks_ready と同じ条件を、ポーリングせず MutationObserver で待つ"""
+    st = _check_state(modal, expected_green, timeout_ms)
+    if not st.get("ready"):
+        raise AssertionError(
+            f"SNS: チェック状態が整いません (expected_green={expected_green}, gray={st.get('gray')}, green={st.get('green')}, cta_enabled={st.get('enabled')})"
+        )
+
+
+def _visit_links_fast(page: Page, links, hrefs: List[str], stub: bool) -> int:
+    """
+    全リンクをまとめて押し、開いたタブは作られた時点で閉じる。
+    戻り値: 開いたタブ数
+    """
+    context = page.context
+    opened: List[Page] = []
+
+    def _on_page(p: Page) -> None:
+        opened.append(p)
+        try:
+            p.close()
+        except Exception:
+            pass
+
+    def _stub(route: Route) -> None:
+        if route.request.resource_type == "document":
+            route.fulfill(status=200, content_type="text/html; charset=utf-8", body=_STUB_HTML)
+        else:
+            route.abort()
+
+    def _is_target(url: str) -> bool:
+        return any(url_matches(h, url) for h in hrefs)
+
+    context.on("page", _on_page)
+    if stub:
+        context.route(_is_target, _stub)
+    try:
+        links.evaluate_all(_CLICK_ALL_JS)
+        end = time.time() + RP.timeout_sec("click")
+        while len(opened) < len(hrefs) and time.time() < end:
+            page.wait_for_timeout(20)
+    finally:
+        context.remove_listener("page", _on_page)
+        if stub:
+            try:
+                context.unroute(_is_target, _stub)
+            except Exception:
+                pass
+    return len(opened)
+
+
+def apply_sns_lead(page: Page, artifacts: Artifacts, lead_params: Dict[str, Any] | None = None) -> Page:
     """
     SNSリード（完成系）
 
@@ -110,11 +214,14 @@ def apply_sns_lead(page: Page, artifacts: Artifacts) -> Page:
         A) 最初から全部緑（gray=0） → CTA押下可能が必須
         B) グレーが残る（gray>0）     → CTA押下不可が必須
            その後、全リンク遷移→全緑→CTA押下可能 になること
+    ✅ lead_params.sns_mode: fast … 全リンクを一括で押し（遷移先はスタブ）、チェックの変化は observer で待つ
     """
+    fast = sns_mode(lead_params) == "fast"
 
     # モーダル待ち
     modal = page.locator(SS.SNS_MODAL_SELECTOR).filter(has_text=SS.SNS_MODAL_TEXT)
-    modal.first.wait_for(state="visible", timeout=45000)
+    with timed_wait("sns.modal", "screen") as t:
+        modal.first.wait_for(state="visible", timeout=t)
 
     # アカウントリンク（3件以上OK）
     links = modal.locator(SS.SNS_ACCOUNT_LINKS_SELECTOR)
@@ -130,9 +237,13 @@ def apply_sns_lead(page: Page, artifacts: Artifacts) -> Page:
         raise AssertionError("SNSモーダル内の「ガチャを回す」CTAが見つかりません")
 
     # 初期状態チェック
-    gray0 = modal.locator(SS.SNS_CHECK_GRAY_SELECTOR).count()
-    green0 = modal.locator(SS.SNS_CHECK_GREEN_SELECTOR).count()
-    enabled0 = _is_cta_enabled(modal, SS.SNS_CTA_SELECTOR)
+    if fast:
+        st0 = _check_state(modal, n)
+        gray0, green0, enabled0 = st0["gray"], st0["green"], st0["enabled"]
+    else:
+        gray0 = modal.locator(SS.SNS_CHECK_GRAY_SELECTOR).count()
+        green0 = modal.locator(SS.SNS_CHECK_GREEN_SELECTOR).count()
+        enabled0 = _is_cta_enabled(modal, SS.SNS_CTA_SELECTOR)
 
     # 「グレーがあるならCTA押下不可」は必須
     if gray0 > 0 and enabled0:
@@ -145,9 +256,25 @@ def apply_sns_lead(page: Page, artifacts: Artifacts) -> Page:
         raise AssertionError(f"SNS: グレー0なのにCTAが無効です (green={green0})")
 
     # ✅ 緑でもグレーでも「全リンク」を新規タブで踏む（要件）
+    #    上限付きでまとめて押し、各タブの遷移が commit した時点で閉じる
+    targets = []
     for i in range(n):
-        _open_link_in_new_tab(page, links.nth(i), artifacts, tag=f"sns_link_{i+1}")
-        time.sleep(0.2)
+        a = links.nth(i)
+        href = (a.get_attribute("href") or "").strip()
+        if not href:
+            artifacts.save_debug(page, f"sns_link_{i+1}_href_empty")
+            raise AssertionError("SNSリンクhrefが空です")
+        targets.append(LinkTarget(key=f"sns_link_{i+1}", locator=a, href=href))
+    if fast:
+        opened = _visit_links_fast(page, links, [t.href for t in targets], _sns_stub_enabled(lead_params))
+        if opened < n:
+            artifacts.save_debug(page, "sns_links_not_opened")
+            raise AssertionError(f"SNSリンクが新規タブで開きません (opened={opened}, expected={n})")
+    else:
+        for r in open_links_in_new_tabs(page, targets, check_url=False):
+            if not r.ok:
+                artifacts.save_debug(page, f"{r.key}_not_opened")
+                raise AssertionError(f"SNSリンクが新規タブで開きません ({r.key})")
 
     # グレーがあったケースは「最終的に全部緑＆CTA有効」へ変化するのが必須
     # 最初から全部緑のケースは「全部緑のまま＆CTA有効」を必須
@@ -155,15 +282,22 @@ def apply_sns_lead(page: Page, artifacts: Artifacts) -> Page:
 
     if gray0 > 0:
         try:
-            _wait_until_checks_ready(modal, expected_green=expected_green, timeout_sec=25.0)
+            if fast:
+                _wait_until_checks_observed(modal, expected_green=expected_green, timeout_ms=RP.timeout_ms("element"))
+            else:
+                _wait_until_checks_ready(modal, expected_green=expected_green, timeout_sec=RP.timeout_sec("element"))
         except Exception:
             artifacts.save_debug(page, "sns_after_visits_not_ready")
             raise
     else:
         # 最初から全緑の場合：状態が崩れていない＆CTA有効のままを確認
-        gray1 = modal.locator(SS.SNS_CHECK_GRAY_SELECTOR).count()
-        green1 = modal.locator(SS.SNS_CHECK_GREEN_SELECTOR).count()
-        enabled1 = _is_cta_enabled(modal, SS.SNS_CTA_SELECTOR)
+        if fast:
+            st1 = _check_state(modal, expected_green)
+            gray1, green1, enabled1 = st1["gray"], st1["green"], st1["enabled"]
+        else:
+            gray1 = modal.locator(SS.SNS_CHECK_GRAY_SELECTOR).count()
+            green1 = modal.locator(SS.SNS_CHECK_GREEN_SELECTOR).count()
+            enabled1 = _is_cta_enabled(modal, SS.SNS_CTA_SELECTOR)
         if gray1 != 0 or green1 != expected_green or not enabled1:
             artifacts.save_debug(page, "sns_all_green_but_changed_after_visits")
             raise AssertionError(
@@ -171,12 +305,21 @@ def apply_sns_lead(page: Page, artifacts: Artifacts) -> Page:
             )
 
     # CTA押下 → 抽選回数画面へ
-    _safe_click(page, cta, timeout_ms=30000)
+    with timed_wait("sns.cta", "nav") as t:
+        smart_click(cta, name="sns.cta", timeout_ms=t, state="attached")
 
     # 遷移が始まる/DOMが切り替わるのを軽く待つ（判定はgacha_flow側で）
     try:
-        page.wait_for_load_state("domcontentloaded", timeout=20000)
+        with timed_wait("sns.cta_loaded", "action") as t:
+            page.wait_for_load_state("domcontentloaded", timeout=t)
     except Exception:
         pass
+    # モーダルが閉じたら CTA の段階を確定（閉じなければ減点）
+    try:
+        with timed_wait("sns.cta_modal_hidden", "action") as t:
+            modal.first.wait_for(state="hidden", timeout=t)
+        confirm_click("sns.cta")
+    except Exception:
+        confirm_click("sns.cta", ok=False)
 
     return page
@@ -16,6 +16,9 @@ SNS_CHECK_GREEN_SELECTOR = "svg[data-testid='CheckCircleIcon'][class*='css-qy6vm
 
 # CTA（ガチャを回す）… MUI Buttonが a[role=button] になってる
 SNS_CTA_SELECTOR = "a[role='button']:has-text('ガチャを回す')"
+# ページ内JS（querySelector）用：:has-text が使えないので要素とテキストに分ける
+SNS_CTA_BASE_SELECTOR = "a[role='button']"
+SNS_CTA_TEXT = "ガチャを回す"
 
 # CTAが無効のときに入りがちなclass（念のため）
 SNS_CTA_DISABLED_CLASS = "Mui-disabled"
@@ -1,10 +1,26 @@
 import pytest
 from src.core.scenario_loader import load_scenarios
-from src.flows.runner import run_scenario
+from src.flows.prefix_tree import order_by_prefix, prefix_sharing_enabled
+from src.flows.runner import run_scenario_with_retry
 
 SCENARIOS = load_scenarios()
+if prefix_sharing_enabled():
+    # 共有プレフィックスのシナリオを連続させる（先頭の1件でプレフィックスを実行）
+    SCENARIOS = order_by_prefix(SCENARIOS)
 
 @pytest.mark.parametrize("sc", SCENARIOS, ids=lambda s: s.id)
-def test_scenario(sc, page, artifacts_base_dir, tracing_stop):
-    ok = run_scenario(sc, page, artifacts_base_dir, tracing_stop)
+def test_scenario(
+    sc, page, artifacts_base_dir, tracing_stop, run_history, rerun_report, prefix_cache, prefetcher, next_scenario
+):
+    ok = run_scenario_with_retry(
+        sc,
+        page,
+        artifacts_base_dir,
+        tracing_stop,
+        run_history,
+        rerun_report,
+        prefix_cache=prefix_cache,
+        prefetcher=prefetcher,
+        next_sc=next_scenario,
+    )
     assert ok, f"Scenario failed: {sc.id} {sc.name}"
@@ -0,0 +1,57 @@
+# e2e/tests/unit/test_asset_check.py
+"""画像ヘッダからのサイズ取得と、検証結果キャッシュ（asset_cache.json）の持ち越し"""
+import io
+import struct
+
+import pytest
+from PIL import Image
+
+from src.core.asset_check import AssetCache, AssetResult, asset_check_enabled, image_dimensions
+
+pytestmark = pytest.mark.unit
+
+
+def _encode(fmt: str, size=(37, 21)) -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", size, (200, 30, 30)).save(buf, format=fmt)
+    return buf.getvalue()
+
+
+@pytest.mark.parametrize("fmt, name", [("PNG", "png"), ("GIF", "gif"), ("JPEG", "jpeg"), ("WEBP", "webp")])
+def test_image_dimensions(fmt, name):
+    assert image_dimensions(_encode(fmt)) == (name, 37, 21)
+
+
+def test_image_dimensions_header_only():
+    # 本体が無くても先頭だけで分かる
+    head = b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR" + struct.pack(">II", 640, 480)
+    assert image_dimensions(head) == ("png", 640, 480)
+
+
+def test_image_dimensions_unknown():
+    assert image_dimensions(b"") is None
+    assert image_dimensions(b"<html></html>") is None
+    assert image_dimensions(_encode("PNG")[:20]) is None
+
+
+def test_asset_check_enabled_lead_params_first(monkeypatch):
+    monkeypatch.setenv("E2E_ASSET_CHECK", "true")
+    assert asset_check_enabled({"asset_check": False}) is False
+    assert asset_check_enabled({"asset_check": "off"}) is False
+    assert asset_check_enabled({}) is True
+
+
+def test_cache_round_trip(tmp_path):
+    path = tmp_path / "asset_cache.json"
+    cache = AssetCache(path)
+    good = AssetResult("https://cdn.example/a.png", 200, "image/png", 10, 10, etag='"abc"')
+    cache.put(good)
+    # 検証できていない / 再検証できない（etag も last_modified も無い）ものは持たない
+    cache.put(AssetResult("https://cdn.example/b.png", 404, "text/html", etag='"x"'))
+    cache.put(AssetResult("https://cdn.example/c.png", 200, "image/png", 10, 10))
+    cache.save()
+
+    again = AssetCache(path)
+    assert again.get(good.url) == good
+    assert again.get("https://cdn.example/b.png") is None
+    assert again.get("https://cdn.example/c.png") is None
@@ -0,0 +1,53 @@
+# e2e/tests/unit/test_checkpoints.py
+"""リトライ時の再開位置（再実行できるステップだけ checkpoint から）"""
+import json
+
+import pytest
+
+from src.core.checkpoints import Checkpoint, CheckpointRecorder
+
+pytestmark = pytest.mark.unit
+
+STEPS = ["top", "lead", "draw", "result", "use"]
+REPLAYABLE = ["lead", "result"]
+
+
+def _failed_at(tmp_path, done, failed):
+    path = tmp_path / "checkpoints.json"
+    rec = CheckpointRecorder(path)
+    for s in done:
+        rec.checkpoints.append(Checkpoint(step=s, url=f"https://example.com/{s}", storage_state={"cookies": []}))
+    rec.begin(failed)
+    # リトライ側は同じ path で resume=True（プロセス内に持った記録から読む）
+    return CheckpointRecorder(path, resume=True)
+
+
+def test_resume_from_last_checkpoint(tmp_path):
+    cp = _failed_at(tmp_path, ["top", "lead", "draw"], "result").resume_point(REPLAYABLE, STEPS)
+    assert cp is not None and cp.step == "draw"
+
+
+def test_side_effect_step_is_not_resumed(tmp_path):
+    assert _failed_at(tmp_path, ["top", "lead", "draw", "result"], "use").resume_point(REPLAYABLE, STEPS) is None
+
+
+def test_unrecorded_side_effect_in_between(tmp_path):
+    # lead の後の draw（副作用あり）が記録されずに result で落ちた
+    assert _failed_at(tmp_path, ["top", "lead"], "result").resume_point(REPLAYABLE, STEPS) is None
+    # steps を渡さなければ並びは見ない
+    assert _failed_at(tmp_path, ["top", "lead"], "result").resume_point(REPLAYABLE).step == "lead"
+
+
+def test_fresh_recorder_discards_previous(tmp_path):
+    _failed_at(tmp_path, ["top"], "lead")
+    rec = CheckpointRecorder(tmp_path / "checkpoints.json")
+    assert rec.resume_point(REPLAYABLE, STEPS) is None
+    assert CheckpointRecorder(tmp_path / "checkpoints.json", resume=True).checkpoints == []
+
+
+def test_artifact_has_no_storage_state(tmp_path):
+    _failed_at(tmp_path, ["top", "lead"], "result")
+    data = json.loads((tmp_path / "checkpoints.json").read_text(encoding="utf-8"))
+    assert data["current"] == "result"
+    assert [c["step"] for c in data["checkpoints"]] == ["top", "lead"]
+    assert all("storage_state" not in c for c in data["checkpoints"])
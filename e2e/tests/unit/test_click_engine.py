@@ -0,0 +1,52 @@
+# e2e/tests/unit/test_click_engine.py
+"""押し方の学習（click_history.json）の並び替えと持ち越し"""
+import pytest
+
+from src.core.click_engine import TIERS, ClickHistory, set_click_scope
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.fixture(autouse=True)
+def _scope():
+    set_click_scope(None)
+    yield
+    set_click_scope(None)
+
+
+def test_order_by_wins(tmp_path):
+    h = ClickHistory(tmp_path / "click_history.json")
+    assert h.order("start", "tier", TIERS) == list(TIERS)
+    h.record("start", "tier", "js")
+    h.record("start", "tier", "js")
+    h.record("start", "tier", "force")
+    assert h.order("start", "tier", TIERS) == ["js", "force", "normal"]
+
+
+def test_scenario_scope_first(tmp_path):
+    h = ClickHistory(tmp_path / "click_history.json")
+    h.record("start", "tier", "force")
+    set_click_scope("sc1")
+    h.record("start", "tier", "js")
+    h.record("start", "tier", "js")
+    assert h.order("start", "tier", TIERS)[0] == "js"
+    set_click_scope("sc2")
+    # 別シナリオは操作名の実績（force 1 / js 2）
+    assert h.order("start", "tier", TIERS)[0] == "js"
+    set_click_scope(None)
+    h2 = ClickHistory(tmp_path / "other.json")
+    h2.record("start", "tier", "force")
+    assert h2.order("start", "tier", TIERS)[0] == "force"
+
+
+def test_save_merges_other_sessions(tmp_path):
+    path = tmp_path / "click_history.json"
+    a = ClickHistory(path)
+    b = ClickHistory(path)
+    a.record("start", "tier", "force")
+    b.record("start", "tier", "js")
+    b.record("start", "tier", "js")
+    a.save()
+    b.save()
+    assert ClickHistory(path).wins == {"start#tier": {"force": 1, "js": 2}}
+    assert not list(tmp_path.glob("*.tmp"))
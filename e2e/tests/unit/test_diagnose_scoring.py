@@ -0,0 +1,79 @@
+# e2e/tests/unit/test_diagnose_scoring.py
+"""診断の採点エンジン（全回答パターンの期待結果・到達確認）"""
+import pytest
+
+from src.flows.diagnose_scoring import ScoringEngine, scoring_engine_for
+
+pytestmark = pytest.mark.unit
+
+
+def _axis_point():
+    return {
+        "diagnose_type": "axis_point",
+        "answer_points": {"q1": {"A": 1, "B": 3}, "q2": {"A": 0, "B": 5}},
+        "axis_thresholds": {"A": [0, 3], "B": [4, 7], "C": [8, 99]},
+    }
+
+
+def test_axis_point_table():
+    eng = ScoringEngine(_axis_point())
+    assert eng.combos == 4
+    assert eng.expected_result({"q1": "A", "q2": "A"}) == "結果A"
+    assert eng.expected_result({"q1": "A", "q2": "B"}) == "結果B"
+    assert eng.expected_result({"q1": "B", "q2": "B"}) == "結果C"
+    rep = eng.report()
+    assert rep.distribution == {"結果A": 2, "結果B": 1, "結果C": 1}
+    assert rep.ok
+
+
+def test_axis_point_unmatched_score():
+    params = _axis_point()
+    params["axis_thresholds"] = {"A": [0, 3], "B": [4, 7]}
+    rep = ScoringEngine(params).report()
+    assert rep.unmatched == 1
+    assert not rep.ok
+
+
+def test_additive_tie_breaker_and_unreachable():
+    eng = ScoringEngine({
+        "diagnose_type": "additive",
+        "answer_points": {
+            "q1": {"A": {"A": 1}, "B": {"B": 1}},
+            "q2": {"A": {"A": 1}, "B": {"B": 1}},
+        },
+        "tie_breaker": ["B", "A"],
+        "result_names": ["A", "B", "C"],
+    })
+    assert eng.axes == ["B", "A"]
+    # 1対1の同点は tie_breaker の先頭（B）
+    assert eng.expected_result({"q1": "A", "q2": "B"}) == "結果B"
+    rep = eng.report()
+    assert rep.distribution == {"結果B": 3, "結果A": 1}
+    assert rep.tied == 2
+    assert rep.unreachable == ["結果C"]
+
+
+def test_multi_answer_subsets():
+    eng = ScoringEngine({
+        "diagnose_type": "axis_point",
+        "answer_points": {"q1": {"A": 1, "B": 2, "C": 4}},
+        "answers": {"q1": ["A", "C"]},
+        "multi_max_select": 2,
+        "axis_thresholds": {"A": [0, 4], "B": [5, 99]},
+    })
+    # A / B / C / AB / AC / BC
+    assert eng.combos == 6
+    assert eng.questions[0].choice_index(["C", "A"]) == eng.questions[0].choices.index(("A", "C"))
+    assert eng.expected_result({"q1": ["C", "A"]}) == "結果B"
+    assert eng.expected_result({"q1": ["B"]}) == "結果A"
+
+
+def test_too_many_combos(monkeypatch):
+    monkeypatch.setenv("E2E_DIAGNOSE_MAX_COMBOS", "3")
+    with pytest.raises(ValueError):
+        ScoringEngine(_axis_point())
+
+
+def test_engine_for_skips_unscored_params():
+    assert scoring_engine_for({"answers": {"q1": "A"}}) is None
+    assert scoring_engine_for(_axis_point()) is scoring_engine_for(_axis_point())
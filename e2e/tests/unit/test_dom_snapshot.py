@@ -0,0 +1,46 @@
+# e2e/tests/unit/test_dom_snapshot.py
+"""スナップショットに対するテキスト判定（get_by_text と同じく内側の要素だけ数える）"""
+import pytest
+
+from src.core.dom_snapshot import MAX_TEXT_LEN, DomSnapshot, SnapElement
+
+pytestmark = pytest.mark.unit
+
+
+def _snap():
+    # <div>（0）
+    #   <p>購入する 500円</p>（1）
+    #     <span>購入する</span>（2）
+    #   <p>長い説明…</p>（3, 切った）
+    #   <p hidden>購入する</p>（4）
+    long = "説明" * MAX_TEXT_LEN
+    return DomSnapshot(
+        url="https://example.com/",
+        texts=[
+            SnapElement("購入する 500円 " + long[:MAX_TEXT_LEN - 10], truncated=True),
+            SnapElement("購入する 500円", parent=0),
+            SnapElement("購入する", parent=1),
+            SnapElement(long[:MAX_TEXT_LEN], truncated=True, parent=0),
+            SnapElement("購入する", visible=False, parent=0),
+        ],
+        matches={},
+    )
+
+
+def test_contains_counts_innermost_only():
+    snap = _snap()
+    assert snap.text_count("購入する") == 2
+    assert snap.text_count("購入する", visible_only=True) == 1
+    assert snap.text_count("500円") == 1
+
+
+def test_exact_skips_truncated():
+    snap = _snap()
+    assert snap.text_count("購入する 500円", exact=True) == 1
+    assert snap.text_count("説明" * (MAX_TEXT_LEN // 2), exact=True) == 0
+
+
+def test_long_node_is_kept():
+    snap = _snap()
+    assert snap.has_text("説明説明")
+    assert snap.missing_texts(["説明", "キャンセル"]) == ["キャンセル"]
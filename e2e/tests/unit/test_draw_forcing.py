@@ -0,0 +1,26 @@
+# e2e/tests/unit/test_draw_forcing.py
+"""抽選結果の差し替え順（全結果 × 全位置の網羅）"""
+import pytest
+
+from src.core.draw_forcing import covering_sequences, forced_results_for, normalize_result_name
+
+pytestmark = pytest.mark.unit
+
+
+def test_covering_sequences_cover_every_position():
+    seqs = covering_sequences(["A", "B", "C"], 4)
+    assert seqs == [list("ABCA"), list("BCAB"), list("CABC")]
+    for pos in range(4):
+        assert {s[pos] for s in seqs} == {"A", "B", "C"}
+
+
+def test_covering_sequences_empty():
+    assert covering_sequences([], 3) == []
+    assert covering_sequences(["A"], 0) == []
+
+
+def test_normalize_result_name():
+    assert normalize_result_name("a") == "結果A"
+    assert normalize_result_name("結果B") == "結果B"
+    assert forced_results_for({"forced_results": ["A", "c"]}) == ["結果A", "結果C"]
+    assert forced_results_for({}) is None
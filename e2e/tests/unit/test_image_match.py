@@ -0,0 +1,59 @@
+# e2e/tests/unit/test_image_match.py
+"""pHash（リサイズ版は近い・別画像は遠い）と phash_cache.json の持ち越し"""
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.core.image_match import DEFAULT_THRESHOLD, PHashCache, _popcount, hamming_matrix, hash_bytes, phash_batch
+
+pytestmark = pytest.mark.unit
+
+
+def _blobs(seed: int) -> Image.Image:
+    """8x8 の乱数を拡大したなめらかな画像（低周波に特徴がある）"""
+    small = np.random.default_rng(seed).random((8, 8)) * 255
+    return Image.fromarray(small.astype(np.uint8)).resize((128, 128), Image.Resampling.BICUBIC)
+
+
+def _png(im: Image.Image) -> bytes:
+    buf = io.BytesIO()
+    im.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def test_resized_copy_is_close_and_other_image_is_far():
+    base = _blobs(0)
+    hs = hash_bytes([_png(base), _png(base.resize((61, 61))), _png(base.resize((300, 300))), _png(_blobs(1))])
+    d = hamming_matrix(np.array(hs[:1], dtype=np.uint64), np.array(hs[1:], dtype=np.uint64))[0]
+    assert d[0] <= DEFAULT_THRESHOLD
+    assert d[1] <= DEFAULT_THRESHOLD
+    assert d[2] > DEFAULT_THRESHOLD
+
+
+def test_undecodable_bytes_are_none():
+    assert hash_bytes([b"not an image", _png(_blobs(2))])[0] is None
+
+
+def test_phash_batch_shapes():
+    assert phash_batch(np.zeros((0, 32, 32), dtype=np.float32)).shape == (0,)
+    imgs = np.random.default_rng(0).random((3, 32, 32), dtype=np.float32)
+    hs = phash_batch(imgs)
+    assert hs.dtype == np.uint64 and hs.shape == (3,)
+    # 1枚ずつでもまとめても同じ
+    assert [int(phash_batch(imgs[i:i + 1])[0]) for i in range(3)] == [int(h) for h in hs]
+
+
+def test_popcount():
+    x = np.array([0, 1, 0xFF, 0xFFFFFFFFFFFFFFFF], dtype=np.uint64)
+    assert _popcount(x).tolist() == [0, 1, 8, 64]
+
+
+def test_cache_round_trip(tmp_path):
+    path = tmp_path / "phash_cache.json"
+    cache = PHashCache(path)
+    cache.put("https://cdn.example/a.png", 0xFFFFFFFFFFFFFFFF)
+    cache.put("https://cdn.example/b.png", 1)
+    cache.save()
+    assert PHashCache(path).hashes == {"https://cdn.example/a.png": 0xFFFFFFFFFFFFFFFF, "https://cdn.example/b.png": 1}
@@ -0,0 +1,34 @@
+# e2e/tests/unit/test_paid_price.py
+"""課金ガチャの価格表（購入価格 / 消費税 / 支払い金額）"""
+import pytest
+
+from src.core.paid_price import PaidPriceTable
+
+pytestmark = pytest.mark.unit
+
+
+def test_default_amounts():
+    t = PaidPriceTable.from_params(None)
+    assert t.amounts() == (500, 50, 550)
+    assert t.amounts(5) == (2500, 250, 2750)
+
+
+@pytest.mark.parametrize("rounding, tax", [("floor", 10), ("round", 11), ("ceil", 11)])
+def test_tax_rounding(rounding, tax):
+    t = PaidPriceTable.from_params({"paid_price_table": {"unit_price": 105, "tax_rounding": rounding}})
+    assert t.amounts() == (105, tax, 105 + tax)
+
+
+def test_price_count_and_allowed_counts():
+    t = PaidPriceTable.from_params({
+        "paid_price_table": {"unit_price": 300, "tax_rate": 0.08, "price_count": 3, "allowed_counts": [1, 3]},
+    })
+    assert t.amounts() == (900, 72, 972)
+    assert t.allowed_counts == (1, 3)
+
+
+def test_invalid_config():
+    with pytest.raises(ValueError):
+        PaidPriceTable.from_params({"paid_price_table": {"tax_rounding": "bankers"}})
+    with pytest.raises(ValueError):
+        PaidPriceTable.from_params({"paid_price_table": [500]})
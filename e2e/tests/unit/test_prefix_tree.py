@@ -0,0 +1,41 @@
+# e2e/tests/unit/test_prefix_tree.py
+"""共有プレフィックスのキーと、分岐先URLの userid 差し替え"""
+import pytest
+
+from src.core.types import Scenario
+from src.flows.prefix_tree import build_prefix_groups, fork_url, prefix_key
+
+pytestmark = pytest.mark.unit
+
+
+def _sc(id, url="https://example.com/g?c=1&userid=u1", lead_type="sns", **params):
+    return Scenario(id=id, content_type="gacha", name=id, url=url, lead_type=lead_type, lead_params=params)
+
+
+def test_key_ignores_userid():
+    a = prefix_key(_sc("a"))
+    b = prefix_key(_sc("b", url="https://example.com/g?c=1&userid=u2"))
+    assert a == b == ("gacha", "https://example.com/g?c=1", "sns")
+
+
+@pytest.mark.parametrize("sc", [
+    _sc("none", lead_type="none"),
+    _sc("paid", paid_gacha=True),
+    _sc("late", lead_timing="before_result"),
+    _sc("fixed", reuse_policy="must_reusable"),
+])
+def test_not_shared(sc):
+    assert prefix_key(sc) is None
+
+
+def test_groups_need_two_scenarios():
+    groups = build_prefix_groups([_sc("a"), _sc("b"), _sc("c", lead_type="line")])
+    assert list(groups.values()) == [["a", "b"]]
+
+
+def test_fork_url_uses_own_userid():
+    prefix_url = "https://example.com/g/play?c=1&userid=u1&step=2"
+    assert fork_url(prefix_url, _sc("b", url="https://example.com/g?userid=u2")) == (
+        "https://example.com/g/play?c=1&step=2&userid=u2"
+    )
+    assert fork_url(prefix_url, _sc("c", url="https://example.com/g")) == "https://example.com/g/play?c=1&step=2"
@@ -0,0 +1,62 @@
+# e2e/tests/unit/test_run_history.py
+"""実行履歴（run_history.json）の保存 → 次セッションでの読み込み（ブラウザ不要）"""
+import pytest
+
+from src.core.run_history import RunHistory
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.fixture(autouse=True)
+def _env(monkeypatch):
+    for k in ("E2E_MAX_RETRIES", "E2E_HISTORY_MIN_RUNS", "E2E_QUARANTINE_FLAKE_RATE", "E2E_QUARANTINE_MIN_RUNS"):
+        monkeypatch.delenv(k, raising=False)
+
+
+def test_save_then_reload(tmp_path):
+    path = tmp_path / "run_history.json"
+    h = RunHistory(path)
+    for outcome in ("pass", "flaky", "flaky", "pass", "flaky"):
+        h.record("sc1", outcome, reruns=1 if outcome == "flaky" else 0, rerun_sec=1.5)
+    h.save()
+
+    again = RunHistory(path)
+    st = again.stats["sc1"]
+    assert st.recent == ["pass", "flaky", "flaky", "pass", "flaky"]
+    assert st.total_runs == 5
+    assert st.total_reruns == 3
+    assert again.retry_budget("sc1") == 2
+    assert again.is_quarantined("sc1") is True
+    # 履歴の無いシナリオは様子見（1回）で quarantine しない
+    assert again.retry_budget("unknown") == 1
+    assert again.is_quarantined("unknown") is False
+
+
+def test_save_merges_other_sessions(tmp_path):
+    path = tmp_path / "run_history.json"
+    a = RunHistory(path)
+    b = RunHistory(path)
+    a.record("sc1", "pass")
+    b.record("sc1", "fail")
+    b.record("sc2", "pass")
+    a.save()
+    b.save()
+
+    merged = RunHistory(path)
+    assert merged.stats["sc1"].recent == ["pass", "fail"]
+    assert merged.stats["sc2"].total_runs == 1
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_save_without_records_does_not_write(tmp_path):
+    path = tmp_path / "run_history.json"
+    RunHistory(path).save()
+    assert not path.exists()
+
+
+def test_broken_file_is_ignored(tmp_path):
+    path = tmp_path / "run_history.json"
+    path.write_text("{broken", encoding="utf-8")
+    h = RunHistory(path)
+    assert h.stats == {}
+    assert h.retry_budget("sc1") == 1
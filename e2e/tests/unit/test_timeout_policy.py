@@ -0,0 +1,62 @@
+# e2e/tests/unit/test_timeout_policy.py
+"""待ちごとの予算（p99 × factor を floor / ceiling で挟む）と保存の持ち越し"""
+import pytest
+
+from src.core.run_profile import timeout_ms
+from src.core.timeout_policy import TimeoutPolicy
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.fixture(autouse=True)
+def _env(monkeypatch):
+    monkeypatch.setenv("E2E_ADAPTIVE_TIMEOUTS", "true")
+    monkeypatch.setenv("E2E_TIMEOUT_FACTOR", "2")
+    monkeypatch.setenv("E2E_TIMEOUT_FLOOR_MS", "500")
+    monkeypatch.setenv("E2E_TIMEOUT_MIN_SAMPLES", "5")
+
+
+def _policy(tmp_path, samples=None):
+    p = TimeoutPolicy(tmp_path / "wait_latency.json")
+    for v in samples or []:
+        p.record("top", v, budget_ms=timeout_ms("action"))
+    return p
+
+
+def test_ceiling_until_enough_samples(tmp_path):
+    p = _policy(tmp_path, [1000] * 4)
+    assert p.budget("top", "action") == timeout_ms("action")
+
+
+def test_learned_budget(tmp_path):
+    p = _policy(tmp_path, [1000] * 9 + [1500])
+    assert p.budget("top", "action") == 3000
+
+
+def test_floor_and_ceiling(tmp_path):
+    assert _policy(tmp_path, [10] * 10).budget("top", "action") == 500
+    assert _policy(tmp_path, [timeout_ms("action")] * 10).budget("top", "action") == timeout_ms("action")
+
+
+def test_nav_and_disabled_use_ceiling(tmp_path, monkeypatch):
+    p = _policy(tmp_path, [1000] * 10)
+    assert p.budget("top", "nav") == timeout_ms("nav")
+    monkeypatch.setenv("E2E_ADAPTIVE_TIMEOUTS", "false")
+    assert TimeoutPolicy(tmp_path / "other.json").budget("top", "action") == timeout_ms("action")
+
+
+def test_timed_out_wait_is_recorded_at_budget(tmp_path):
+    p = _policy(tmp_path)
+    p.record("top", 100, budget_ms=800, timed_out=True)
+    assert p.samples["top"] == [800]
+    assert p.near_misses[0].timed_out
+
+
+def test_save_then_reload_merges(tmp_path):
+    a = _policy(tmp_path, [1000] * 3)
+    b = _policy(tmp_path, [2000] * 2)
+    a.save()
+    b.save()
+    again = TimeoutPolicy(tmp_path / "wait_latency.json")
+    assert sorted(again.samples["top"]) == [1000] * 3 + [2000] * 2
+    assert again.budget("top", "action") == 4000